@@ -0,0 +1,139 @@
+from collections import OrderedDict
+from typing import Dict, Iterable, Set, Tuple
+import threading
+import time
+from langgraph.checkpoint.memory import MemorySaver
+
+class BoundedMemorySaver(MemorySaver):
+    """
+    In-process checkpointer with a retention policy
+    
+    Keeps at most max_checkpoints checkpoints per thread (older ones are dropped
+    together with their pending writes and any channel blobs no remaining
+    checkpoint references), at most max_threads threads (least recently used
+    evicted first), and drops threads idle for longer than ttl_seconds.
+    Pruning edits MemorySaver's storage, writes and blobs dicts directly, so
+    langgraph-checkpoint is pinned in requirements.txt to the version whose
+    layout this was written against.
+    """
+    
+    def __init__(self, max_threads: int = 1000, max_checkpoints: int = 20, ttl_seconds: float = 3600, **kwargs):
+        super().__init__(**kwargs)
+        self.max_threads = max_threads
+        self.max_checkpoints = max_checkpoints
+        self.ttl_seconds = ttl_seconds
+        self.evicted_threads = 0
+        self.pruned_checkpoints = 0
+        # thread_id -> last access (monotonic), least recently used first
+        self.last_used: "OrderedDict[str, float]" = OrderedDict()
+        # Per-thread keys into self.blobs / self.writes so pruning never scans other threads
+        self.thread_blobs: Dict[str, Set[Tuple]] = {}
+        self.thread_writes: Dict[str, Set[Tuple]] = {}
+        self._lock = threading.RLock()
+    
+    def get_tuple(self, config):
+        thread_id = config["configurable"]["thread_id"]
+        with self._lock:
+            if thread_id in self.last_used and self._expired(thread_id, time.monotonic()):
+                self._delete_threads([thread_id])
+            result = super().get_tuple(config)
+            # MemorySaver's defaultdict storage creates an empty entry for unknown threads
+            if thread_id not in self.last_used and not any(self.storage.get(thread_id, {}).values()):
+                self.storage.pop(thread_id, None)
+            return result
+    
+    def put(self, config, checkpoint, metadata, new_versions):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        with self._lock:
+            result = super().put(config, checkpoint, metadata, new_versions)
+            self.thread_blobs.setdefault(thread_id, set()).update(
+                (thread_id, checkpoint_ns, channel, version) for channel, version in new_versions.items()
+            )
+            self._touch(thread_id)
+            self._prune_checkpoints(thread_id, checkpoint_ns)
+            self._evict_threads()
+            return result
+    
+    def put_writes(self, config, writes, task_id, task_path=""):
+        thread_id = config["configurable"]["thread_id"]
+        with self._lock:
+            super().put_writes(config, writes, task_id, task_path)
+            self.thread_writes.setdefault(thread_id, set()).add(
+                (thread_id, config["configurable"].get("checkpoint_ns", ""), config["configurable"]["checkpoint_id"])
+            )
+            self._touch(thread_id)
+    
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            self._delete_threads([thread_id])
+    
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "backend": "memory",
+                "threads": len(self.storage),
+                "checkpoints": sum(len(ns) for thread in self.storage.values() for ns in thread.values()),
+                "blobs": len(self.blobs),
+                "evicted_threads": self.evicted_threads,
+                "pruned_checkpoints": self.pruned_checkpoints,
+                "max_threads": self.max_threads,
+                "max_checkpoints_per_thread": self.max_checkpoints,
+                "ttl_seconds": self.ttl_seconds
+            }
+    
+    def _touch(self, thread_id: str):
+        self.last_used[thread_id] = time.monotonic()
+        self.last_used.move_to_end(thread_id)
+    
+    def _expired(self, thread_id: str, now: float) -> bool:
+        return now - self.last_used[thread_id] > self.ttl_seconds
+    
+    def _prune_checkpoints(self, thread_id: str, checkpoint_ns: str):
+        """Keep only the newest max_checkpoints checkpoints of one thread namespace"""
+        checkpoints = self.storage[thread_id][checkpoint_ns]
+        if len(checkpoints) <= self.max_checkpoints:
+            return
+        
+        # Checkpoint ids are uuid6 and sort chronologically
+        ordered = sorted(checkpoints)
+        for checkpoint_id in ordered[:-self.max_checkpoints]:
+            del checkpoints[checkpoint_id]
+            write_key = (thread_id, checkpoint_ns, checkpoint_id)
+            self.writes.pop(write_key, None)
+            self.thread_writes.get(thread_id, set()).discard(write_key)
+            self.pruned_checkpoints += 1
+        
+        referenced = set()
+        for saved_checkpoint, _, _ in checkpoints.values():
+            versions = self.serde.loads_typed(saved_checkpoint)["channel_versions"]
+            referenced.update((thread_id, checkpoint_ns, channel, version) for channel, version in versions.items())
+        blob_keys = self.thread_blobs.get(thread_id, set())
+        for key in [key for key in blob_keys if key[1] == checkpoint_ns and key not in referenced]:
+            self.blobs.pop(key, None)
+            blob_keys.discard(key)
+    
+    def _evict_threads(self):
+        """Drop idle threads past the TTL, then least recently used ones over max_threads"""
+        now = time.monotonic()
+        expired = []
+        for thread_id in self.last_used:
+            if not self._expired(thread_id, now):
+                break
+            expired.append(thread_id)
+        overflow = len(self.last_used) - len(expired) - self.max_threads
+        if overflow > 0:
+            expired.extend(list(self.last_used)[len(expired):len(expired) + overflow])
+        if expired:
+            self._delete_threads(expired)
+    
+    def _delete_threads(self, thread_ids: Iterable[str]):
+        for thread_id in thread_ids:
+            self.storage.pop(thread_id, None)
+            for key in self.thread_writes.pop(thread_id, ()):
+                self.writes.pop(key, None)
+            for key in self.thread_blobs.pop(thread_id, ()):
+                self.blobs.pop(key, None)
+            if self.last_used.pop(thread_id, None) is not None:
+                self.evicted_threads += 1
+
@@ -1,9 +1,8 @@
 from typing import Literal, List
-from langchain_core.messages import SystemMessage, HumanMessage
+from langchain_core.messages import SystemMessage, HumanMessage, ToolMessage
 from langchain_openai import ChatOpenAI
 from langgraph.graph import StateGraph, END, START
 from langgraph.prebuilt import ToolNode
-from langgraph.checkpoint.memory import MemorySaver
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.documents import Document
 import json
@@ -12,6 +11,7 @@ from app.core.config import settings
 from app.agents.state import AgentState
 from app.agents.tools import retrieve_tool, arxiv_tool, python_interpreter_tool, summarize_section_tool, web_search_tool
 from app.agents.graders import retrieval_grader, hallucination_grader, answer_grader
+from app.agents.checkpointer import BoundedMemorySaver
 
 tools = [retrieve_tool, arxiv_tool, python_interpreter_tool, summarize_section_tool, web_search_tool]
 
@@ -88,7 +88,7 @@ def grade_documents(state: AgentState):
     if not hasattr(last_message, "tool_call_id"):
         return state
         
-    question = messages[0].content
+    question = state.get("question") or messages[0].content
     docs = last_message.content 
     
     params = None
@@ -143,6 +143,9 @@ def grade_documents(state: AgentState):
         updates["documents"] = retrieved_docs
         return updates
 
+    if isinstance(params, list) and all(isinstance(item, dict) for item in params):
+        return grade_chunks(question, params, retrieved_docs, last_message)
+
     score = retrieval_grader.invoke({"question": question, "document": docs})
     grade = score.binary_score
     
@@ -154,6 +157,57 @@ def grade_documents(state: AgentState):
         print("---DECISION: DOCS NOT RELEVANT---")
         return {"is_relevant": False}
 
+def grade_chunks(question: str, items: List[dict], docs: List[Document], tool_message) -> dict:
+    """
+    Grade each retrieved chunk on its own and keep only the relevant ones.
+    
+    Chunks whose raw cross-encoder score clears GRADER_SCORE_THRESHOLD are accepted
+    without an LLM call; the rest are graded concurrently (up to GRADER_MAX_CONCURRENCY).
+    """
+    threshold = settings.GRADER_SCORE_THRESHOLD
+    keep = [False] * len(items)
+    to_grade = []
+    for i, item in enumerate(items):
+        rerank_score = item.get("rerank_score")
+        if threshold is not None and rerank_score is not None and rerank_score >= threshold:
+            keep[i] = True
+        else:
+            to_grade.append(i)
+    
+    if to_grade:
+        scores = retrieval_grader.batch(
+            [{"question": question, "document": items[i].get("content", str(items[i]))} for i in to_grade],
+            config={"max_concurrency": settings.GRADER_MAX_CONCURRENCY},
+            return_exceptions=True
+        )
+        for i, score in zip(to_grade, scores):
+            if isinstance(score, Exception):
+                # A failed grading call should not throw away a possibly relevant chunk
+                print(f"---GRADER ERROR: {score}---")
+                keep[i] = True
+            else:
+                keep[i] = score.binary_score == "yes"
+    
+    kept_items = [item for item, relevant in zip(items, keep) if relevant]
+    print(f"---GRADED {len(items)} CHUNKS: {len(kept_items)} RELEVANT, {len(items) - len(to_grade)} ACCEPTED BY SCORE---")
+    if not kept_items:
+        print("---DECISION: DOCS NOT RELEVANT---")
+        return {"is_relevant": False}
+    
+    updates = {
+        "is_relevant": True,
+        "documents": [doc for doc, relevant in zip(docs, keep) if relevant]
+    }
+    if len(kept_items) < len(items) and getattr(tool_message, "id", None):
+        # Same message id, so add_messages replaces the tool result: the agent only sees relevant chunks
+        updates["messages"] = [ToolMessage(
+            content=json.dumps(kept_items),
+            tool_call_id=tool_message.tool_call_id,
+            name=getattr(tool_message, "name", None),
+            id=tool_message.id
+        )]
+    return updates
+
 def generate(state: AgentState):
     """
     Generate answer
@@ -251,7 +305,7 @@ def grade_generation_v_documents_and_question(state: AgentState):
     print("---CHECK HALLUCINATIONS---")
     
     messages = state["messages"]
-    question = messages[0].content
+    question = state.get("question") or messages[0].content
     for msg in reversed(messages):
         if isinstance(msg, HumanMessage):
             question = msg.content
@@ -323,7 +377,7 @@ def rewrite(state: AgentState):
     """
     print("---TRANSFORM QUERY---")
     messages = state["messages"]
-    question = messages[0].content
+    question = state.get("question") or messages[0].content
     
     msg = [HumanMessage(content=f"Look at the input and try to reason about the underlying semantic intent / meaning. \n Here is the initial question: \n\n {question} \n Formulate an improved question.")]
     
@@ -372,7 +426,7 @@ planner = planner_prompt | structured_llm_planner
 def plan_node(state: AgentState):
     print("---PLANNING---")
     messages = state["messages"]
-    question = messages[0].content
+    question = state.get("question") or messages[0].content
     paper_ids = state.get("paper_ids", [])
     
     if paper_ids:
@@ -439,5 +493,16 @@ workflow.add_conditional_edges(
     }
 )
 
-memory = MemorySaver()
+memory = BoundedMemorySaver(
+    max_threads=settings.CHECKPOINT_MAX_THREADS,
+    max_checkpoints=settings.CHECKPOINT_MAX_PER_THREAD,
+    ttl_seconds=settings.CHECKPOINT_TTL_SECONDS
+)
 app = workflow.compile(checkpointer=memory)
+
+def use_checkpointer(checkpointer):
+    """Recompile the graph against a different checkpointer (e.g. SQLite at startup)"""
+    global app, memory
+    memory = checkpointer
+    app = workflow.compile(checkpointer=checkpointer)
+    return app
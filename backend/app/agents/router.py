@@ -0,0 +1,84 @@
+from typing import Dict, List, Optional
+import re
+import numpy as np
+from app.core.config import settings
+
+# Requests that need a tool other than retrieval, or the planner's multi-step reasoning
+TOOL_PATTERNS = {
+    "external_search": r"\b(arxiv|web|internet|online|google|news|latest|recent papers?|related (papers?|work)|similar papers?|other papers?|state[- ]of[- ]the[- ]art)\b",
+    "computation": r"\b(plot|chart|visuali[sz]e|draw|calculate|compute the|simulate|python|matplotlib)\b",
+    "multi_step": r"\b(compare|contrast|versus|vs\.?|step[- ]by[- ]step|and then|first\b.*\bthen|pros and cons|trade-?offs?)\b",
+}
+
+# Phrasings of tool-heavy requests that the keyword rules can miss
+AGENT_EXEMPLARS = [
+    "find more papers about this topic",
+    "search for follow-up work on this method",
+    "what has happened in this field since the paper was published",
+    "make a figure showing the results in the tables",
+    "work out the numbers reported in the experiments",
+    "how does this paper differ from the approach in the other one",
+]
+
+class QueryRouter:
+    """
+    Decides whether a chat request can skip the planner graph
+    
+    Simple in-corpus questions go straight to retrieve -> rerank -> synthesize.
+    Python mode, follow-ups in an existing thread, requests without selected
+    papers, long or multi-question prompts, tool keywords, and queries close to
+    a tool-heavy exemplar in embedding space go to the full agent graph.
+    """
+    
+    def __init__(self, max_words: int = 40, embedding_threshold: Optional[float] = 0.6):
+        self.max_words = max_words
+        self.embedding_threshold = embedding_threshold
+        self.patterns = {name: re.compile(pattern, re.IGNORECASE) for name, pattern in TOOL_PATTERNS.items()}
+        self._exemplars: Optional[np.ndarray] = None
+    
+    def route(self, query: str, paper_ids: List[str], execution_mode: str = "text", thread_id: Optional[str] = None) -> Dict[str, str]:
+        """
+        Pick a route for a chat request
+        
+        Returns:
+            {route: "fast" | "agent", reason}
+        """
+        if execution_mode == "python":
+            return {"route": "agent", "reason": "python_mode"}
+        if thread_id:
+            return {"route": "agent", "reason": "conversation_followup"}
+        if not paper_ids:
+            return {"route": "agent", "reason": "no_papers_selected"}
+        if len(query.split()) > self.max_words or query.count("?") > 1:
+            return {"route": "agent", "reason": "multi_part_question"}
+        for name, pattern in self.patterns.items():
+            if pattern.search(query):
+                return {"route": "agent", "reason": name}
+        if self.embedding_threshold is not None and self.similarity_to_exemplars(query) >= self.embedding_threshold:
+            return {"route": "agent", "reason": "similar_to_tool_request"}
+        return {"route": "fast", "reason": "simple_retrieval"}
+    
+    def similarity_to_exemplars(self, query: str) -> float:
+        """
+        Highest cosine similarity between the query and the tool-heavy exemplars
+        
+        The query embedding lands in the embedding cache, so the retrieval that
+        follows on the fast path does not encode it again.
+        """
+        from app.core.embeddings import embedding_model
+        
+        if self._exemplars is None:
+            self._exemplars = self._normalize(np.asarray(embedding_model.embed_batch(AGENT_EXEMPLARS, show_progress_bar=False)))
+        query_vector = self._normalize(np.asarray([embedding_model.embed_text(query)]))
+        return float((self._exemplars @ query_vector[0]).max())
+    
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+# Singleton instance
+query_router = QueryRouter(
+    max_words=settings.ROUTER_MAX_WORDS,
+    embedding_threshold=settings.ROUTER_EMBEDDING_THRESHOLD
+)
@@ -0,0 +1,114 @@
+from typing import Dict
+import os
+import time
+import aiosqlite
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+class PrunedSqliteSaver(AsyncSqliteSaver):
+    """
+    SQLite checkpointer that survives restarts, with the same retention policy as BoundedMemorySaver
+    
+    Old checkpoints of a thread are pruned on every write; idle threads (past
+    ttl_seconds, or least recently used over max_threads) are swept at most once
+    per sweep_interval seconds, tracked in a thread_activity side table.
+    """
+    
+    sweep_interval = 60
+    
+    def __init__(self, conn: aiosqlite.Connection, max_threads: int = 1000, max_checkpoints: int = 20, ttl_seconds: float = 3600):
+        super().__init__(conn)
+        self.max_threads = max_threads
+        self.max_checkpoints = max_checkpoints
+        self.ttl_seconds = ttl_seconds
+        self.evicted_threads = 0
+        self.pruned_checkpoints = 0
+        self._last_sweep = 0.0
+        self._retention_ready = False
+    
+    async def setup(self) -> None:
+        await super().setup()
+        if self._retention_ready:
+            return
+        async with self.lock:
+            await self.conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS thread_activity (
+                    thread_id TEXT PRIMARY KEY,
+                    last_used REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_thread_activity_last_used ON thread_activity (last_used);
+                """
+            )
+            await self.conn.commit()
+            self._retention_ready = True
+    
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        result = await super().aput(config, checkpoint, metadata, new_versions)
+        thread_id = str(config["configurable"]["thread_id"])
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        async with self.lock:
+            await self.conn.execute(
+                "INSERT OR REPLACE INTO thread_activity (thread_id, last_used) VALUES (?, ?)",
+                (thread_id, time.time())
+            )
+            # Checkpoint ids are uuid6 and sort chronologically
+            cursor = await self.conn.execute(
+                "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id NOT IN ("
+                "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                "ORDER BY checkpoint_id DESC LIMIT ?)",
+                (thread_id, checkpoint_ns, thread_id, checkpoint_ns, self.max_checkpoints)
+            )
+            if cursor.rowcount > 0:
+                self.pruned_checkpoints += cursor.rowcount
+                await self.conn.execute(
+                    "DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id NOT IN ("
+                    "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?)",
+                    (thread_id, checkpoint_ns, thread_id, checkpoint_ns)
+                )
+            await self.conn.commit()
+        
+        if time.monotonic() - self._last_sweep > self.sweep_interval:
+            self._last_sweep = time.monotonic()
+            await self.sweep()
+        return result
+    
+    async def sweep(self):
+        """Delete threads idle past the TTL and the least recently used ones over max_threads"""
+        async with self.lock:
+            cursor = await self.conn.execute(
+                "SELECT thread_id FROM thread_activity WHERE last_used < ? OR thread_id IN ("
+                "SELECT thread_id FROM thread_activity ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (time.time() - self.ttl_seconds, self.max_threads)
+            )
+            expired = [(row[0],) for row in await cursor.fetchall()]
+            if not expired:
+                return
+            for table in ("checkpoints", "writes", "thread_activity"):
+                await self.conn.executemany(f"DELETE FROM {table} WHERE thread_id = ?", expired)
+            await self.conn.commit()
+            self.evicted_threads += len(expired)
+    
+    async def adelete_thread(self, thread_id: str) -> None:
+        await super().adelete_thread(thread_id)
+        async with self.lock:
+            await self.conn.execute("DELETE FROM thread_activity WHERE thread_id = ?", (str(thread_id),))
+            await self.conn.commit()
+    
+    def stats(self) -> Dict:
+        return {
+            "backend": "sqlite",
+            "evicted_threads": self.evicted_threads,
+            "pruned_checkpoints": self.pruned_checkpoints,
+            "max_threads": self.max_threads,
+            "max_checkpoints_per_thread": self.max_checkpoints,
+            "ttl_seconds": self.ttl_seconds
+        }
+
+async def open_sqlite_checkpointer(path: str, **retention) -> PrunedSqliteSaver:
+    """Open (creating if needed) the checkpoint database; call from a running event loop"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    saver = PrunedSqliteSaver(aiosqlite.connect(path), **retention)
+    await saver.setup()
+    return saver
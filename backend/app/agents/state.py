@@ -6,6 +6,9 @@ class AgentState(TypedDict):
     """The state of the agent in the LangGraph."""
     messages: Annotated[List[BaseMessage], add_messages]
     
+    # The current turn's question (messages accumulate across turns of a thread)
+    question: str
+    
     paper_ids: List[str]
     
     documents: List[Dict[str, Any]]
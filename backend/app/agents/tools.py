@@ -1,39 +1,35 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Annotated
 from langchain_core.tools import tool
+from langgraph.prebuilt import InjectedState
 from app.db.chroma import chroma_db
-from app.core.reranker import reranker
-from app.core.embeddings import embedding_model
-from app.core.config import settings
+from app.core.retrieval import retrieve
+from app.core.executors import run_db
 import arxiv
 
 @tool
-def retrieve_tool(query: str, paper_id: Optional[str] = None) -> List[Dict[str, Any]]:
+async def retrieve_tool(
+    query: str,
+    paper_id: Optional[str] = None,
+    per_paper: Optional[int] = None,
+    state: Annotated[Optional[dict], InjectedState] = None
+) -> List[Dict[str, Any]]:
     """
     Retrieve relevant sections from the uploaded research papers.
     Use this tool when you need to answer a question based on the document context.
+    Searches all papers selected for the conversation at once.
     
     Args:
         query: The search query string.
         paper_id: Optional UUID of a specific paper to restrict search to.
+        per_paper: Optional maximum number of candidate chunks taken from any one paper.
     """
-    print(f"---RETRIEVING: {query} (paper_id={paper_id})---")
+    # The papers selected in the chat request come from the graph state, not from the model
+    paper_ids = list((state or {}).get("paper_ids") or [])
+    if paper_id and (not paper_ids or paper_id in paper_ids):
+        paper_ids = [paper_id]
+    print(f"---RETRIEVING: {query} (paper_ids={paper_ids})---")
     
-    query_embedding = embedding_model.embed_text(query)
-    
-    chunks = chroma_db.query(
-        query_embedding=query_embedding,
-        top_k=settings.TOP_K_RETRIEVAL,
-        paper_id=paper_id
-    )
-    
-    if not chunks:
-        return []
-
-    reranked_chunks = reranker.rerank(
-        query=query,
-        chunks=chunks,
-        top_k=settings.TOP_K_RERANKED
-    )
+    reranked_chunks = await retrieve(query, paper_ids or None, per_paper)
     
     results = []
     for chunk, score in reranked_chunks:
@@ -44,9 +40,10 @@ def retrieve_tool(query: str, paper_id: Optional[str] = None) -> List[Dict[str,
             "section": chunk["section"],
             "paper_id": chunk["paper_id"],
             "score": score,
+            "rerank_score": chunk.get("rerank_score"),
             "chunk_id": chunk["chunk_id"]
         })
-        
+    
     return results
 
 @tool
@@ -174,10 +171,10 @@ def python_interpreter_tool(code: str) -> str:
         })
 
 @tool
-def summarize_section_tool(section_name: str, paper_id: Optional[str] = None) -> str:
+async def summarize_section_tool(section_name: str, paper_id: Optional[str] = None) -> str:
     """
     Summarize a specific section of the research paper(s).
-    Valid section names: 'Abstract', 'Introduction', 'Methods', 'Results', 'Discussion', 'Conclusion'.
+    Valid section names: 'Abstract', 'Introduction', 'Background', 'Methods', 'Results', 'Discussion', 'Conclusion', 'Appendix'.
     
     Args:
         section_name: The name of the section using standard capitalization.
@@ -185,7 +182,7 @@ def summarize_section_tool(section_name: str, paper_id: Optional[str] = None) ->
     """
     print(f"---SUMMARIZING SECTION: {section_name}---")
     
-    chunks = chroma_db.query_section(section_name=section_name, paper_id=paper_id)
+    chunks = await run_db(chroma_db.query_section, section_name=section_name, paper_id=paper_id)
     
     if not chunks:
         return f"No content found for section '{section_name}'."
@@ -199,7 +196,7 @@ def summarize_section_tool(section_name: str, paper_id: Optional[str] = None) ->
     llm = ChatOpenAI(model=settings.OPENAI_MODEL, base_url=settings.OPENAI_API_BASE, api_key=settings.OPENAI_API_KEY, temperature=0)
     msg = HumanMessage(content=f"Synthesize and summarize the following content from the '{section_name}' section of a research paper. \n\n Content: \n {context[:20000]}...") # truncate for safety
     
-    response = llm.invoke([msg])
+    response = await llm.ainvoke([msg])
     summary = response.content
     
     import json
@@ -1,11 +1,16 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Dict, Optional, List
+from typing import Any, Dict, Optional, List
+import json
+import uuid
 from app.core.query_expansion import query_expander
 from app.core.embeddings import embedding_model
 from app.db.chroma import chroma_db
 from app.core.reranker import reranker
 from app.core.answer_synthesis import answer_synthesizer
+from app.core.retrieval import retrieve
+from app.core.executors import run_model
 from app.core.config import settings
 from dotenv import load_dotenv
 load_dotenv()
@@ -16,6 +21,7 @@ class ChatRequest(BaseModel):
     paper_ids: List[str] = []  
     include_reasoning: bool = False
     execution_mode: str = "text" 
+    thread_id: Optional[str] = None  # continue a conversation; a new thread is started when omitted
 
 class ChatResponse(BaseModel):
     answer: str
@@ -24,6 +30,171 @@ class ChatResponse(BaseModel):
     concepts: List[str]
     artifacts: Optional[List[Dict]] = None
     reasoning: Optional[Dict] = None
+    thread_id: Optional[str] = None
+
+def build_initial_state(request: ChatRequest) -> Dict:
+    """Initial LangGraph state for a chat request"""
+    from langchain_core.messages import HumanMessage
+    
+    return {
+        "messages": [HumanMessage(content=request.query)],
+        "question": request.query,
+        "paper_ids": request.paper_ids,  
+        "is_relevant": True,
+        "is_supported": True,
+        "documents": [],
+        "reasoning_trace": [],
+        "citations": [],
+        "artifacts": [],
+        "execution_mode": request.execution_mode,
+        "execution_status": "started",
+        "retry_count": 0,
+        "plan": []
+    }
+
+def build_config(thread_id: str) -> Dict:
+    return {
+        "configurable": {"thread_id": thread_id},  
+        "recursion_limit": 50  
+    }
+
+def build_citation(metadata: Dict, content: str, index: int) -> Dict:
+    """Citation dict from a retrieved document's metadata"""
+    try:
+        score = float(metadata.get("score", 0.0))
+    except (ValueError, TypeError):
+        score = 0.0
+    
+    page = metadata.get("page_number")
+    if page is None:
+        source_str = metadata.get("source", "")
+        if "Page " in source_str:
+            try:
+                page = int(source_str.split("Page ")[1].split(" -")[0])
+            except (ValueError, IndexError):
+                page = None
+    
+    # Get section
+    section = metadata.get("section")
+    if not section:
+        source_str = metadata.get("source", "")
+        if "Section " in source_str:
+            section = source_str.split("Section ")[-1]
+            
+    return {
+        "paper": metadata.get("paper_id") or "unknown",
+        "page": page,
+        "chunk_id": metadata.get("chunk_id") or f"chunk_{index}",
+        "confidence": score,
+        "section": section,
+        "content": content 
+    }
+
+def build_chat_response(final_state: Dict, thread_id: Optional[str] = None, route: Optional[Dict] = None) -> ChatResponse:
+    """Turn the agent's final state into the API response"""
+    messages = final_state["messages"]
+    answer = ""
+    
+    
+    for msg in reversed(messages):
+        
+        if hasattr(msg, 'content') and msg.content:
+            msg_type = type(msg).__name__
+            
+            if 'AI' in msg_type or msg_type == 'AIMessage':
+                answer = msg.content
+                break
+    
+    
+    if not answer:
+        for msg in reversed(messages):
+            if hasattr(msg, 'content') and msg.content and len(msg.content) > 10:
+                answer = msg.content
+                break
+    
+    
+    if not answer:
+        answer = "I apologize, but I was unable to generate a complete response. Please try rephrasing your question."
+        
+    state_docs = final_state.get("documents", [])
+    state_artifacts = final_state.get("artifacts", [])
+    citations = []
+    retrieved_chunks = []
+
+    
+    for i, doc in enumerate(state_docs):
+        citations.append(build_citation(doc.metadata, doc.page_content, i))
+        
+        
+        retrieved_chunks.append({
+            "text": doc.page_content,
+            "index": i + 1
+        })
+    
+    concepts = extract_concepts(answer)
+    
+    
+    if state_artifacts:
+        for art in state_artifacts:
+            if art["type"] == "image":
+                answer += f"\n\n![{art['name']}]({art['path']})"
+    
+    return ChatResponse(
+        answer=answer,
+        citations=citations, 
+        retrieved_chunks=retrieved_chunks,
+        concepts=concepts,
+        artifacts=state_artifacts,
+        reasoning={"steps": final_state.get("plan", []), "route": route},
+        thread_id=thread_id
+    )
+
+async def route_request(request: ChatRequest) -> Dict:
+    """Fast path or full agent graph for this request"""
+    if not settings.QUERY_ROUTER_ENABLED:
+        return {"route": "agent", "reason": "router_disabled"}
+    from app.agents.router import query_router
+    
+    return await run_model(
+        query_router.route,
+        request.query,
+        request.paper_ids,
+        execution_mode=request.execution_mode,
+        thread_id=request.thread_id
+    )
+
+def build_fast_citations(chunks_with_scores: List[tuple]) -> List[Dict]:
+    return [
+        build_citation({**chunk, "score": score}, chunk["text"], i)
+        for i, (chunk, score) in enumerate(chunks_with_scores)
+    ]
+
+def build_fast_response(answer: str, chunks_with_scores: List[tuple], thread_id: str, route: Dict) -> ChatResponse:
+    """API response for the direct retrieve -> rerank -> synthesize path"""
+    return ChatResponse(
+        answer=answer,
+        citations=build_fast_citations(chunks_with_scores),
+        retrieved_chunks=[{"text": chunk["text"], "index": i + 1} for i, (chunk, _) in enumerate(chunks_with_scores)],
+        concepts=extract_concepts(answer),
+        artifacts=[],
+        reasoning={"steps": [], "route": route},
+        thread_id=thread_id
+    )
+
+async def save_fast_turn(agent_app, request: ChatRequest, answer: str, config: Dict):
+    """
+    Record a fast-path turn in the thread's checkpoint
+    
+    Written as if the graph had answered and passed grading, so the checkpoint
+    has nothing left to run and a follow-up on the thread (routed to the agent)
+    sees the question and answer in its messages.
+    """
+    from langchain_core.messages import AIMessage
+    
+    state = build_initial_state(request)
+    state["messages"].append(AIMessage(content=answer))
+    state["execution_status"] = "completed"
+    await agent_app.aupdate_state(config, state, as_node="grade_generation")
 
 @router.post("/query", response_model=ChatResponse)
 async def query_papers(request: ChatRequest) -> ChatResponse:
@@ -32,122 +203,136 @@ async def query_papers(request: ChatRequest) -> ChatResponse:
     """
     try:
         from app.agents.graph import app as agent_app
-        from langchain_core.messages import HumanMessage
-        
-        # Initial state
-        initial_state = {
-            "messages": [HumanMessage(content=request.query)],
-            "paper_ids": request.paper_ids,  
-            "is_relevant": True,
-            "is_supported": True,
-            "documents": [],
-            "reasoning_trace": [],
-            "citations": [],
-            "artifacts": [],
-            "execution_mode": request.execution_mode,
-            "execution_status": "started",
-            "retry_count": 0,
-            "plan": []
-        }
         
+        thread_id = request.thread_id or str(uuid.uuid4())
+        route = await route_request(request)
+        print(f"---ROUTE: {route['route']} ({route['reason']})---")
         
-        config = {
-            "configurable": {"thread_id": "1"},  
-            "recursion_limit": 50  
-        }
-        final_state = await agent_app.ainvoke(initial_state, config=config)
+        if route["route"] == "fast":
+            chunks_with_scores = await retrieve(request.query, request.paper_ids)
+            if chunks_with_scores:
+                result = await answer_synthesizer.synthesize(request.query, chunks_with_scores)
+                await save_fast_turn(agent_app, request, result["answer"], build_config(thread_id))
+                return build_fast_response(result["answer"], chunks_with_scores, thread_id, route)
+            # Nothing in the selected papers: let the agent try its other tools
+            route = {"route": "agent", "reason": "no_fast_path_results"}
         
+        final_state = await agent_app.ainvoke(build_initial_state(request), config=build_config(thread_id))
         
-        messages = final_state["messages"]
-        answer = ""
+        return build_chat_response(final_state, thread_id, route)
         
-        
-        for msg in reversed(messages):
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"Query failed: {str(e)}")
+
+GRAPH_NODES = {"planner", "agent", "tools", "grade_documents", "grade_generation", "rewrite"}
+
+def sse_event(event: str, data: Any) -> str:
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+def tool_output_items(output: Any) -> Any:
+    """Decode a tool's output (ToolMessage or raw value) back into Python data"""
+    content = getattr(output, "content", output)
+    if isinstance(content, str):
+        try:
+            return json.loads(content)
+        except json.JSONDecodeError:
+            return content
+    return content
+
+@router.post("/stream")
+async def stream_query(request: ChatRequest) -> StreamingResponse:
+    """
+    Agentic RAG query streamed as Server-Sent Events
+    
+    Events: thread (the conversation's thread_id), route, step (graph node
+    started), plan, tool_start, tool_end, citations, artifact, token (answer
+    text as generated), final (same payload as /query) and error.
+    """
+    async def event_stream():
+        try:
+            from app.agents.graph import app as agent_app
             
-            if hasattr(msg, 'content') and msg.content:
-                msg_type = type(msg).__name__
-                
-                if 'AI' in msg_type or msg_type == 'AIMessage':
-                    answer = msg.content
-                    break
-        
-        
-        if not answer:
-            for msg in reversed(messages):
-                if hasattr(msg, 'content') and msg.content and len(msg.content) > 10:
-                    answer = msg.content
-                    break
-        
-        
-        if not answer:
-            answer = "I apologize, but I was unable to generate a complete response. Please try rephrasing your question."
+            thread_id = request.thread_id or str(uuid.uuid4())
+            config = build_config(thread_id)
+            yield sse_event("thread", {"thread_id": thread_id})
             
-        state_docs = final_state.get("documents", [])
-        state_artifacts = final_state.get("artifacts", [])
-        citations = []
-        retrieved_chunks = []
-
-        
-        for i, doc in enumerate(state_docs):
+            route = await route_request(request)
+            yield sse_event("route", route)
+            if route["route"] == "fast":
+                yield sse_event("step", {"node": "retrieve"})
+                chunks_with_scores = await retrieve(request.query, request.paper_ids)
+                if chunks_with_scores:
+                    yield sse_event("citations", {"citations": build_fast_citations(chunks_with_scores)})
+                    yield sse_event("step", {"node": "synthesize"})
+                    parts = []
+                    async for text in answer_synthesizer.astream(request.query, chunks_with_scores):
+                        parts.append(text)
+                        yield sse_event("token", {"text": text, "node": "synthesize"})
+                    answer = "".join(parts).strip()
+                    await save_fast_turn(agent_app, request, answer, config)
+                    response = build_fast_response(answer, chunks_with_scores, thread_id, route)
+                    yield sse_event("final", response.model_dump())
+                    return
+                route = {"route": "agent", "reason": "no_fast_path_results"}
+                yield sse_event("route", route)
             
-            try:
-                score = float(doc.metadata.get("score", 0.0))
-            except (ValueError, TypeError):
-                score = 0.0
+            final_state = None
             
-            page = doc.metadata.get("page_number")
-            if page is None:
-                source_str = doc.metadata.get("source", "")
-                if "Page " in source_str:
-                    try:
-                        page = int(source_str.split("Page ")[1].split(" -")[0])
-                    except (ValueError, IndexError):
-                        page = None
+            async for event in agent_app.astream_events(build_initial_state(request), config=config, version="v2"):
+                kind = event["event"]
+                name = event.get("name", "")
+                node = event.get("metadata", {}).get("langgraph_node")
+                data = event.get("data", {})
+                
+                if kind == "on_chain_start" and name in GRAPH_NODES and name == node:
+                    yield sse_event("step", {"node": name})
+                
+                elif kind == "on_chain_end" and name == "planner" and node == "planner":
+                    output = data.get("output") or {}
+                    yield sse_event("plan", {"steps": output.get("plan", [])})
+                
+                elif kind == "on_tool_start":
+                    yield sse_event("tool_start", {"tool": name, "input": data.get("input")})
+                
+                elif kind == "on_tool_end":
+                    yield sse_event("tool_end", {"tool": name})
+                    items = tool_output_items(data.get("output"))
+                    if name == "retrieve_tool" and isinstance(items, list):
+                        citations = [
+                            build_citation(item, item.get("content", ""), i)
+                            for i, item in enumerate(items) if isinstance(item, dict)
+                        ]
+                        yield sse_event("citations", {"citations": citations})
+                    elif isinstance(items, dict) and items.get("artifact"):
+                        yield sse_event("artifact", items["artifact"])
+                
+                elif kind == "on_chat_model_stream" and node == "agent":
+                    chunk = data.get("chunk")
+                    text = getattr(chunk, "content", "")
+                    if isinstance(text, str) and text:
+                        yield sse_event("token", {"text": text, "node": node})
+                
+                elif kind == "on_chain_end" and not event.get("parent_ids"):
+                    final_state = data.get("output")
             
-            # Get section
-            section = doc.metadata.get("section")
-            if not section:
-                source_str = doc.metadata.get("source", "")
-                if "Section " in source_str:
-                    section = source_str.split("Section ")[-1]
-                    
-            citation = {
-                "paper": doc.metadata.get("paper_id") or "unknown",
-                "page": page,
-                "chunk_id": doc.metadata.get("chunk_id") or f"chunk_{i}",
-                "confidence": score,
-                "section": section,
-                "content": doc.page_content 
-            }
-            citations.append(citation)
+            if not isinstance(final_state, dict) or "messages" not in final_state:
+                final_state = (await agent_app.aget_state(config)).values
             
+            yield sse_event("final", build_chat_response(final_state, thread_id, route).model_dump())
             
-            retrieved_chunks.append({
-                "text": doc.page_content,
-                "index": i + 1
-            })
-        
-        concepts = extract_concepts(answer)
-        
-        
-        if state_artifacts:
-            for art in state_artifacts:
-                if art["type"] == "image":
-                    answer += f"\n\n![{art['name']}]({art['path']})"
-        
-        return ChatResponse(
-            answer=answer,
-            citations=citations, 
-            retrieved_chunks=retrieved_chunks,
-            concepts=concepts,
-            artifacts=state_artifacts,
-            reasoning={"steps": final_state.get("plan", [])}
-        )
-        
-    except Exception as e:
-        import traceback
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Query failed: {str(e)}")
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            yield sse_event("error", {"detail": f"Query failed: {str(e)}"})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 def extract_concepts(text: str) -> List[str]:
     """Simple concept extraction from answer text"""
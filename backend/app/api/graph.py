@@ -1,111 +1,73 @@
-from fastapi import APIRouter, HTTPException
-from typing import List, Dict
+from fastapi import APIRouter, HTTPException, Query
+from typing import Dict, List, Optional
 from app.db.chroma import chroma_db
-from collections import Counter
-import re
+from app.db.registry import paper_registry
+from app.core.concepts import ConceptCounter, top_graph
+from app.core.corpus_graph import corpus_graph
+from app.core.executors import run_db
+from app.core.config import settings
 
 router = APIRouter()
 
+def index_stored_paper(paper_id: str) -> Optional[Dict]:
+    """Count concepts from stored chunks, for papers ingested before graphs were kept"""
+    chunks = chroma_db.get_paper_chunks(paper_id)
+    if not chunks:
+        return None
+    
+    concepts = ConceptCounter()
+    for chunk in chunks:
+        concepts.add_text(chunk["text"])
+    corpus_graph.update_paper(paper_id, concepts.chunks)
+    graph = concepts.to_graph(settings.GRAPH_MAX_CONCEPTS)
+    paper_registry.save_graph(paper_id, graph)
+    return graph
+
+@router.get("/corpus")
+async def get_corpus_graph(
+    paper_ids: Optional[List[str]] = Query(None),
+    top_k: int = Query(settings.CORPUS_GRAPH_TOP_K, ge=1, le=settings.CORPUS_GRAPH_MAX_TOP_K),
+    min_weight: int = Query(1, ge=1)
+) -> Dict:
+    """
+    Knowledge graph across papers (all papers, or the given paper_ids)
+    
+    Nodes are the top_k concepts by number of chunks mentioning them; edges
+    with fewer than min_weight co-occurring chunks are dropped.
+    """
+    try:
+        for paper_id in await run_db(paper_registry.papers_without_incidence):
+            await run_db(index_stored_paper, paper_id)
+        
+        return await run_db(corpus_graph.build, paper_ids, top_k, min_weight)
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Graph generation failed: {str(e)}")
+
 @router.get("/{paper_id}")
-async def get_knowledge_graph(paper_id: str) -> Dict:
+async def get_knowledge_graph(
+    paper_id: str,
+    limit: int = Query(settings.GRAPH_DEFAULT_NODES, ge=1, le=settings.GRAPH_MAX_CONCEPTS)
+) -> Dict:
     """
-    Generate knowledge graph for a paper
+    Knowledge graph for a paper
+    
+    Served from the concept co-occurrence counted at ingest; limit is the
+    number of most frequent concepts to return.
     
     Returns nodes and edges for visualization
     """
     try:
+        graph = await run_db(paper_registry.get_graph, paper_id, limit)
+        if graph is None:
+            graph = await run_db(index_stored_paper, paper_id)
         
-        chunks = chroma_db.get_paper_chunks(paper_id)
-        
-        if not chunks:
+        if graph is None:
             raise HTTPException(status_code=404, detail="Paper not found")
         
-        
-        all_concepts = []
-        concept_chunks = {}  
-        
-        for chunk in chunks:
-            concepts = extract_concepts_from_text(chunk["text"])
-            all_concepts.extend(concepts)
-            
-            for concept in concepts:
-                if concept not in concept_chunks:
-                    concept_chunks[concept] = []
-                concept_chunks[concept].append(chunk["chunk_id"])
-        
-        
-        concept_freq = Counter(all_concepts)
-        top_concepts = [concept for concept, _ in concept_freq.most_common(20)]
-        
-        
-        nodes = [
-            {
-                "id": concept,
-                "label": concept,
-                "size": concept_freq[concept],
-                "type": "concept"
-            }
-            for concept in top_concepts
-        ]
-        
-        
-        edges = []
-        edge_set = set()
-        
-        for chunk in chunks:
-            chunk_concepts = [c for c in extract_concepts_from_text(chunk["text"]) if c in top_concepts]
-            
-            
-            for i, concept1 in enumerate(chunk_concepts):
-                for concept2 in chunk_concepts[i+1:]:
-                    edge_key = tuple(sorted([concept1, concept2]))
-                    if edge_key not in edge_set:
-                        edges.append({
-                            "source": concept1,
-                            "target": concept2,
-                            "weight": 1
-                        })
-                        edge_set.add(edge_key)
-                    else:
-                        
-                        for edge in edges:
-                            if (edge["source"] == edge_key[0] and edge["target"] == edge_key[1]) or \
-                               (edge["source"] == edge_key[1] and edge["target"] == edge_key[0]):
-                                edge["weight"] += 1
-                                break
-        
-        return {
-            "nodes": nodes,
-            "edges": edges,
-            "paper_id": paper_id
-        }
-        
+        return {**top_graph(graph, limit), "paper_id": paper_id}
+    
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Graph generation failed: {str(e)}")
-
-def extract_concepts_from_text(text: str) -> List[str]:
-    """Extract technical concepts from text"""
-    
-    concepts = []
-    
-    
-    pattern = r'\b([A-Z][a-z]+(?:\s+[A-Z][a-z]+){1,3})\b'
-    matches = re.findall(pattern, text)
-    concepts.extend(matches)
-    
-    
-    pattern = r'\b([a-z]+-[a-z]+(?:-[a-z]+)*)\b'
-    matches = re.findall(pattern, text.lower())
-    concepts.extend(matches)
-    
-    
-    pattern = r'\b([A-Z]{2,})\b'
-    matches = re.findall(pattern, text)
-    concepts.extend(matches)
-    
-    
-    concepts = [c.strip() for c in concepts if len(c) > 3]
-    
-    return concepts
@@ -1,85 +1,131 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from typing import Dict
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from typing import Dict, Optional
 import os
 import shutil
-from app.core.pdf_parser import PDFParser
-from app.core.chunking import SemanticChunker
-from app.core.embeddings import embedding_model
+from app.core.ingestion import ingestion_jobs, detect_source_id
 from app.db.chroma import chroma_db
+from app.db.registry import paper_registry
+from app.core.corpus_graph import corpus_graph
+from app.core.retrieval_cache import retrieval_cache
+from app.core.executors import run_db
+from app.core.hashing import sha256_file
 from app.core.config import settings
 import uuid
 
 router = APIRouter()
 
-UPLOAD_DIR = "./uploaded_papers"
+UPLOAD_DIR = settings.UPLOAD_DIR
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
+def save_upload(source, path: str) -> str:
+    """Copy an upload to disk in blocks, returning its SHA-256"""
+    with open(path, "wb") as buffer:
+        shutil.copyfileobj(source, buffer, 1 << 20)
+    return sha256_file(path)
+
 @router.post("/upload")
-async def upload_paper(file: UploadFile = File(...)) -> Dict:
+async def upload_paper(file: UploadFile = File(...), paper_id: Optional[str] = Form(None)) -> Dict:
     """
-    Upload and process a research PDF
+    Upload a research PDF and queue it for processing
+    
+    Identical files resolve to the existing paper without any work. Passing
+    paper_id (or uploading a new arXiv version such as 2301.12345v2.pdf)
+    replaces that paper, re-embedding only the chunks whose text changed.
     
-    Returns paper_id and processing stats
+    Returns paper_id and the job_id to poll for progress
     """
     if not file.filename.endswith('.pdf'):
         raise HTTPException(status_code=400, detail="Only PDF files are allowed")
     
-    paper_id = str(uuid.uuid4())
+    upload_path = os.path.join(UPLOAD_DIR, f"{uuid.uuid4()}.upload")
+    file_hash = await run_db(save_upload, file.file, upload_path)
     
-    file_path = os.path.join(UPLOAD_DIR, f"{paper_id}.pdf")
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-    
-    try:
-        pages_data = PDFParser.parse_pdf(file_path)
-        
-        chunker = SemanticChunker(
-            chunk_size=settings.CHUNK_SIZE,
-            overlap=settings.CHUNK_OVERLAP
-        )
-        
-        all_chunks = []
-        for page_data in pages_data:
-            if PDFParser.should_skip_section(page_data["section"]):
-                continue
-            
-            chunks = chunker.chunk_text(
-                text=page_data["text"],
-                page_number=page_data["page_number"],
-                section=page_data["section"],
-                paper_id=paper_id
-            )
-            all_chunks.extend(chunks)
-        
-        chunk_texts = [chunk["text"] for chunk in all_chunks]
-        embeddings = embedding_model.embed_batch(chunk_texts)
-        
-        chroma_db.add_chunks(all_chunks, embeddings)
-        
+    active_job = ingestion_jobs.find_active(file_hash)
+    existing_id = active_job.paper_id if active_job else await run_db(paper_registry.find_by_hash, file_hash)
+    if existing_id:
+        os.remove(upload_path)
         return {
-            "paper_id": paper_id,
+            "job_id": active_job.job_id if active_job else None,
+            "paper_id": existing_id,
             "filename": file.filename,
-            "total_pages": len(pages_data),
-            "total_chunks": len(all_chunks),
-            "status": "success"
+            "status": "duplicate"
         }
-        
-    except Exception as e:
-        if os.path.exists(file_path):
-            os.remove(file_path)
-        raise HTTPException(status_code=500, detail=f"Processing failed: {str(e)}")
+    
+    source_id = detect_source_id(file.filename)
+    if paper_id:
+        if not await run_db(chroma_db.get_chunk_ids, paper_id):
+            os.remove(upload_path)
+            raise HTTPException(status_code=404, detail="Paper not found")
+    elif source_id:
+        paper_id = await run_db(chroma_db.find_paper, source_id=source_id)
+    
+    revision = paper_id is not None
+    if not revision:
+        paper_id = str(uuid.uuid4())
+    
+    final_path = os.path.join(UPLOAD_DIR, f"{paper_id}.pdf")
+    if not revision:
+        os.replace(upload_path, final_path)
+        upload_path = final_path
+        # Listed from now on, not only once a worker picks the job up
+        await run_db(
+            paper_registry.upsert,
+            paper_id,
+            filename=file.filename,
+            status="queued",
+            file_hash=file_hash,
+            source_id=source_id
+        )
+    
+    try:
+        job = ingestion_jobs.submit(
+            upload_path,
+            paper_id,
+            file.filename,
+            final_path=final_path,
+            file_hash=file_hash,
+            source_id=source_id,
+            revision=revision
+        )
+    except RuntimeError as e:
+        if os.path.exists(upload_path):
+            os.remove(upload_path)
+        if not revision:
+            await run_db(paper_registry.delete, paper_id)
+        raise HTTPException(status_code=503, detail=str(e))
+    
+    return {
+        "job_id": job.job_id,
+        "paper_id": paper_id,
+        "filename": file.filename,
+        "status": job.status,
+        "revision": revision
+    }
+
+@router.get("/jobs/{job_id}")
+async def get_ingestion_job(job_id: str) -> Dict:
+    """Report stage and progress of an ingestion job"""
+    job = ingestion_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return job.to_dict()
 
 @router.delete("/paper/{paper_id}")
 async def delete_paper(paper_id: str) -> Dict:
     """Delete a paper and its chunks"""
     try:
-        chroma_db.delete_paper(paper_id)
+        await run_db(chroma_db.delete_paper, paper_id)
+        await run_db(paper_registry.delete, paper_id)
+        corpus_graph.remove_paper(paper_id)
+        retrieval_cache.invalidate_paper(paper_id)
+        await run_db(chroma_db.save_sparse_index)
         
         file_path = os.path.join(UPLOAD_DIR, f"{paper_id}.pdf")
         if os.path.exists(file_path):
             os.remove(file_path)
         
         return {"status": "deleted", "paper_id": paper_id}
-        
+    
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Deletion failed: {str(e)}")
@@ -1,37 +1,58 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Response
 from fastapi.responses import FileResponse
-from typing import List, Dict
+from typing import List, Dict, Optional
 import os
 from app.db.chroma import chroma_db
+from app.db.registry import paper_registry
+from app.core.executors import run_db
+from app.core.warmup import register_existing_papers
+from app.core.config import settings
 
 router = APIRouter()
 
-UPLOAD_DIR = "./uploaded_papers"
+UPLOAD_DIR = settings.UPLOAD_DIR
 
 @router.get("/list")
-async def list_papers() -> List[Dict]:
-    """List all uploaded papers"""
+async def list_papers(
+    response: Response,
+    limit: int = Query(settings.PAPERS_PAGE_SIZE, ge=1, le=settings.PAPERS_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    source_id: Optional[str] = None,
+    q: Optional[str] = None
+) -> List[Dict]:
+    """
+    List papers from the registry, newest first
+    
+    Filters by status, source_id and filename substring (q). The cursor for the
+    next page, if any, is returned in the X-Next-Cursor header.
+    """
     try:
-        papers = []
-        
-        if os.path.exists(UPLOAD_DIR):
-            for filename in os.listdir(UPLOAD_DIR):
-                if filename.endswith('.pdf'):
-                    paper_id = filename.replace('.pdf', '')
-                    
-                    
-                    chunks = chroma_db.get_paper_chunks(paper_id)
-                    
-                    papers.append({
-                        "paper_id": paper_id,
-                        "filename": filename,
-                        "chunks_count": len(chunks)
-                    })
-        
-        return papers
-        
+        await run_db(register_existing_papers)
+        papers, next_cursor = await run_db(
+            paper_registry.list,
+            limit=limit,
+            cursor=cursor,
+            status=status,
+            source_id=source_id,
+            filename=q
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to list papers: {str(e)}")
+    
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return papers
+
+@router.get("/{paper_id}")
+async def get_paper(paper_id: str) -> Dict:
+    """Registry record for one paper"""
+    paper = await run_db(paper_registry.get, paper_id)
+    if paper is None:
+        raise HTTPException(status_code=404, detail="Paper not found")
+    return paper
 
 @router.get("/{paper_id}/download")
 async def download_paper(paper_id: str):
@@ -51,7 +72,14 @@ async def download_paper(paper_id: str):
 async def get_paper_chunks(paper_id: str) -> List[Dict]:
     """Get all chunks for a paper"""
     try:
-        chunks = chroma_db.get_paper_chunks(paper_id)
+        chunks = await run_db(chroma_db.get_paper_chunks, paper_id)
         return chunks
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get chunks: {str(e)}")
+
+@router.get("/{paper_id}/outline")
+async def get_paper_outline(paper_id: str) -> List[Dict]:
+    """Headings found when the paper was parsed, in document order"""
+    if await run_db(paper_registry.get, paper_id) is None:
+        raise HTTPException(status_code=404, detail="Paper not found")
+    return await run_db(paper_registry.get_outline, paper_id)
@@ -1,24 +1,17 @@
-from openai import OpenAI
-from typing import List, Dict
+from openai import AsyncOpenAI
+from typing import AsyncIterator, List, Dict
 from app.core.config import settings
 
-client = OpenAI(api_key=settings.OPENAI_API_KEY)
+client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+
+ERROR_ANSWER = "An error occurred while generating the answer."
 
 class AnswerSynthesizer:
     """Synthesizes answers from retrieved chunks with citations"""
     
     @staticmethod
-    async def synthesize(query: str, chunks_with_scores: List[tuple]) -> Dict:
-        """
-        Generate grounded answer with citations
-        
-        Args:
-            query: User question
-            chunks_with_scores: List of (chunk, confidence_score) tuples
-        
-        Returns:
-            {answer, citations, reasoning}
-        """
+    def _messages(query: str, chunks_with_scores: List[tuple]) -> List[Dict]:
+        """Chat messages asking for an answer grounded in the numbered sources"""
         # Prepare context from chunks
         context_parts = []
         for i, (chunk, score) in enumerate(chunks_with_scores):
@@ -44,13 +37,27 @@ Instructions:
 
 Answer:"""
 
+        return [
+            {"role": "system", "content": "You are a precise research assistant who always cites sources."},
+            {"role": "user", "content": prompt}
+        ]
+    
+    @staticmethod
+    async def synthesize(query: str, chunks_with_scores: List[tuple]) -> Dict:
+        """
+        Generate grounded answer with citations
+        
+        Args:
+            query: User question
+            chunks_with_scores: List of (chunk, confidence_score) tuples
+        
+        Returns:
+            {answer, citations, reasoning}
+        """
         try:
-            response = client.chat.completions.create(
+            response = await client.chat.completions.create(
                 model=settings.OPENAI_MODEL,
-                messages=[
-                    {"role": "system", "content": "You are a precise research assistant who always cites sources."},
-                    {"role": "user", "content": prompt}
-                ],
+                messages=AnswerSynthesizer._messages(query, chunks_with_scores),
                 temperature=0.3,
                 max_tokens=1000
             )
@@ -91,9 +98,31 @@ Answer:"""
         except Exception as e:
             print(f"Answer synthesis failed: {e}")
             return {
-                "answer": "An error occurred while generating the answer.",
+                "answer": ERROR_ANSWER,
                 "citations": [],
                 "retrieved_chunks": []
             }
+    
+    @staticmethod
+    async def astream(query: str, chunks_with_scores: List[tuple]) -> AsyncIterator[str]:
+        """Generate the same answer as synthesize, yielding text deltas as the model produces them"""
+        streamed = False
+        try:
+            stream = await client.chat.completions.create(
+                model=settings.OPENAI_MODEL,
+                messages=AnswerSynthesizer._messages(query, chunks_with_scores),
+                temperature=0.3,
+                max_tokens=1000,
+                stream=True
+            )
+            async for chunk in stream:
+                text = chunk.choices[0].delta.content if chunk.choices else None
+                if text:
+                    streamed = True
+                    yield text
+        except Exception as e:
+            print(f"Answer synthesis failed: {e}")
+            if not streamed:
+                yield ERROR_ANSWER
 
 answer_synthesizer = AnswerSynthesizer()
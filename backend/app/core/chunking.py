@@ -1,81 +1,156 @@
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
+import bisect
+import functools
 import uuid
 import re
+from app.core.config import settings
+from app.core.hashing import sha256_text
+
+# Stand-in for the model tokenizer when it cannot be loaded: words and punctuation marks
+APPROX_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+class TokenCounter:
+    """
+    Token offsets from the embedding model's tokenizer
+    
+    Falls back to counting words and punctuation when the tokenizer cannot be
+    loaded (e.g. offline); WordPiece splits rare words further, so treat that
+    mode as approximate.
+    """
+    
+    def __init__(self, model_name: Optional[str] = None):
+        self.tokenizer = None
+        if model_name:
+            try:
+                from transformers import AutoTokenizer
+                self.tokenizer = AutoTokenizer.from_pretrained(model_name, use_fast=True)
+            except Exception as e:
+                print(f"Could not load tokenizer for {model_name}, approximating token counts: {e}")
+    
+    def counts(self, texts: List[str]) -> List[int]:
+        """Token count of every text, in a single batched call"""
+        if not texts:
+            return []
+        if self.tokenizer is not None:
+            encoded = self.tokenizer(
+                texts,
+                add_special_tokens=False,
+                return_attention_mask=False,
+                return_token_type_ids=False,
+                verbose=False
+            )
+            return [len(ids) for ids in encoded["input_ids"]]
+        return [len(APPROX_TOKEN_PATTERN.findall(text)) for text in texts]
+    
+    def offsets(self, text: str) -> List[Tuple[int, int]]:
+        """Character span of every token of one text"""
+        if self.tokenizer is not None:
+            return self.tokenizer(text, add_special_tokens=False, return_offsets_mapping=True, verbose=False)["offset_mapping"]
+        return [match.span() for match in APPROX_TOKEN_PATTERN.finditer(text)]
+
+@functools.lru_cache(maxsize=None)
+def get_token_counter(model_name: str) -> TokenCounter:
+    return TokenCounter(model_name)
 
 class SemanticChunker:
-    """Sentence-aware chunking with sliding window"""
+    """
+    Sentence-aware chunking with sliding window, sized in model tokens
+    
+    Each page is tokenized once; window ends and overlap starts are found by
+    binary search over prefix sums of sentence token counts. Chunks never
+    exceed max_tokens, so the embedding model does not truncate them, and
+    sentences longer than that are split at token boundaries.
+    """
     
-    def __init__(self, chunk_size: int = 400, overlap: int = 50):
-        self.chunk_size = chunk_size
-        self.overlap = overlap
+    def __init__(self, chunk_size: int = 250, overlap: int = 50,
+                 max_tokens: Optional[int] = None, token_counter: Optional[TokenCounter] = None):
+        if max_tokens is None:
+            # [CLS] and [SEP] take two positions of the model's sequence length
+            max_tokens = settings.EMBEDDING_MAX_TOKENS - 2
+        self.chunk_size = min(chunk_size, max_tokens)
+        self.overlap = min(overlap, self.chunk_size // 2)
+        self.token_counter = token_counter or get_token_counter(settings.EMBEDDING_MODEL)
     
-    def chunk_text(self, text: str, page_number: int, section: str, paper_id: str) -> List[Dict]:
+    def chunk_text(self, text: str, page_number: int, section: str, paper_id: str, first_ordinal: int = 0) -> List[Dict]:
         """
         Create semantic chunks from text
         
+        first_ordinal numbers the chunks after those already taken from the
+        same page, when a page is chunked one section at a time.
+        
         Returns:
             List of chunks with metadata
         """
-        # Split into sentences
-        sentences = self._split_sentences(text)
+        sentences, counts = self._split_sentences(text)
+        if not sentences:
+            return []
         
-        chunks = []
-        current_chunk = []
-        current_length = 0
-        
-        for sentence in sentences:
-            sentence_length = len(sentence.split())
-            
-            # If adding this sentence exceeds chunk size
-            if current_length + sentence_length > self.chunk_size and current_chunk:
-                # Save current chunk
-                chunk_text = " ".join(current_chunk)
-                chunks.append(self._create_chunk(
-                    chunk_text, page_number, section, paper_id
-                ))
-                
-                # Start new chunk with overlap
-                overlap_sentences = self._get_overlap_sentences(current_chunk)
-                current_chunk = overlap_sentences + [sentence]
-                current_length = sum(len(s.split()) for s in current_chunk)
-            else:
-                current_chunk.append(sentence)
-                current_length += sentence_length
+        prefix = [0]
+        for count in counts:
+            prefix.append(prefix[-1] + count)
         
-        # Add remaining chunk
-        if current_chunk:
-            chunk_text = " ".join(current_chunk)
+        chunks = []
+        start = 0
+        while start < len(sentences):
+            # Longest run of sentences from start that fits the budget (every sentence fits on its own)
+            end = max(bisect.bisect_right(prefix, prefix[start] + self.chunk_size) - 1, start + 1)
             chunks.append(self._create_chunk(
-                chunk_text, page_number, section, paper_id
+                " ".join(sentences[start:end]), page_number, section, paper_id, first_ordinal + len(chunks)
             ))
+            if end == len(sentences):
+                break
+            
+            # Carry over the trailing sentences that fit in the overlap, as long as the next
+            # chunk still has room for the sentence at end, and always move forward
+            lowest = max(prefix[end] - self.overlap, prefix[end + 1] - self.chunk_size)
+            start = max(bisect.bisect_left(prefix, lowest, start + 1, end), start + 1)
         
         return chunks
     
-    def _split_sentences(self, text: str) -> List[str]:
-        """Split text into sentences"""
+    def _split_sentences(self, text: str) -> Tuple[List[str], List[int]]:
+        """
+        Split text into sentences and count their tokens
+        
+        Sentences longer than chunk_size are cut into pieces of at most
+        chunk_size tokens.
+        """
         # Simple sentence splitting
         text = text.replace('\n', ' ')
-        sentences = re.split(r'(?<=[.!?])\s+', text)
-        return [s.strip() for s in sentences if s.strip()]
-    
-    def _get_overlap_sentences(self, sentences: List[str]) -> List[str]:
-        """Get last N sentences for overlap"""
-        total_words = 0
-        overlap_sentences = []
-        
-        for sentence in reversed(sentences):
-            word_count = len(sentence.split())
-            if total_words + word_count > self.overlap:
-                break
-            overlap_sentences.insert(0, sentence)
-            total_words += word_count
+        sentences = [s.strip() for s in re.split(r'(?<=[.!?])\s+', text) if s.strip()]
         
-        return overlap_sentences
+        pieces, counts = [], []
+        for sentence, count in zip(sentences, self.token_counter.counts(sentences)):
+            if count <= self.chunk_size:
+                pieces.append(sentence)
+                counts.append(count)
+                continue
+            offsets = self.token_counter.offsets(sentence)
+            first = 0
+            while first < len(offsets):
+                last = min(first + self.chunk_size, len(offsets))
+                # Cut where a token does not continue the previous one, so each piece
+                # re-tokenizes to the same tokens
+                cut = last
+                while last < len(offsets) and cut > first + 1 and offsets[cut][0] == offsets[cut - 1][1]:
+                    cut -= 1
+                if cut == first + 1 and last < len(offsets):
+                    cut = last
+                pieces.append(sentence[offsets[first][0]:offsets[cut - 1][1]])
+                counts.append(cut - first)
+                first = cut
+        return pieces, counts
     
-    def _create_chunk(self, text: str, page_number: int, section: str, paper_id: str) -> Dict:
-        """Create chunk with metadata"""
+    def _create_chunk(self, text: str, page_number: int, section: str, paper_id: str, ordinal: int = 0) -> Dict:
+        """
+        Create chunk with metadata
+        
+        The chunk id is derived from the paper, position and content hash, so
+        re-ingesting the same text yields the same id.
+        """
+        chunk_hash = sha256_text(text)
         return {
-            "chunk_id": str(uuid.uuid4()),
+            "chunk_id": str(uuid.uuid5(uuid.NAMESPACE_URL, f"{paper_id}:{page_number}:{ordinal}:{chunk_hash}")),
+            "chunk_hash": chunk_hash,
             "text": text,
             "page_number": page_number,
             "section": section,
@@ -0,0 +1,87 @@
+from collections import Counter
+from itertools import combinations
+from typing import Dict, List
+import re
+
+def extract_concepts_from_text(text: str) -> List[str]:
+    """Extract technical concepts from text"""
+    
+    concepts = []
+    
+    
+    pattern = r'\b([A-Z][a-z]+(?:\s+[A-Z][a-z]+){1,3})\b'
+    matches = re.findall(pattern, text)
+    concepts.extend(matches)
+    
+    
+    pattern = r'\b([a-z]+-[a-z]+(?:-[a-z]+)*)\b'
+    matches = re.findall(pattern, text.lower())
+    concepts.extend(matches)
+    
+    
+    pattern = r'\b([A-Z]{2,})\b'
+    matches = re.findall(pattern, text)
+    concepts.extend(matches)
+    
+    
+    concepts = [c.strip() for c in concepts if len(c) > 3]
+    
+    return concepts
+
+class ConceptCounter:
+    """
+    Concept frequencies and chunk-level co-occurrence counts for one paper
+    
+    Fed chunk by chunk during ingestion, so the text is only scanned once.
+    Two concepts co-occur when they appear in the same chunk. The distinct
+    concepts of every chunk are kept as well, for the corpus-wide graph.
+    """
+    
+    def __init__(self):
+        self.frequency: Counter = Counter()
+        self.cooccurrence: Counter = Counter()  # (concept_a, concept_b) with a < b -> chunks
+        self.chunks: List[List[str]] = []
+    
+    def add_text(self, text: str):
+        concepts = extract_concepts_from_text(text)
+        distinct = sorted(set(concepts))
+        self.frequency.update(concepts)
+        self.cooccurrence.update(combinations(distinct, 2))
+        self.chunks.append(distinct)
+    
+    def to_graph(self, max_concepts: int = 200) -> Dict:
+        """
+        Compact form kept per paper: the most frequent concepts and the edges among them
+        
+        Returns:
+            {concepts: [[concept, frequency], ...] most frequent first,
+             edges: [[i, j, weight], ...] indices into concepts, heaviest first}
+        """
+        top = sorted(self.frequency.items(), key=lambda item: (-item[1], item[0]))[:max_concepts]
+        index = {concept: i for i, (concept, _) in enumerate(top)}
+        edges = []
+        for (a, b), weight in self.cooccurrence.items():
+            if a in index and b in index:
+                i, j = sorted((index[a], index[b]))
+                edges.append([i, j, weight])
+        edges.sort(key=lambda edge: (-edge[2], edge[0], edge[1]))
+        return {"concepts": [[concept, frequency] for concept, frequency in top], "edges": edges}
+
+def top_graph(graph: Dict, limit: int = 20) -> Dict:
+    """
+    Nodes and edges for the limit most frequent concepts of a stored graph
+    
+    Returns:
+        {nodes, edges} in the shape the frontend renders
+    """
+    concepts = graph["concepts"][:limit]
+    nodes = [
+        {"id": concept, "label": concept, "size": frequency, "type": "concept"}
+        for concept, frequency in concepts
+    ]
+    edges = [
+        {"source": concepts[i][0], "target": concepts[j][0], "weight": weight}
+        for i, j, weight in graph["edges"]
+        if j < limit
+    ]
+    return {"nodes": nodes, "edges": edges}
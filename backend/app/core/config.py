@@ -19,25 +19,131 @@ class Settings(BaseSettings):
     
     # Embedding Model
     EMBEDDING_MODEL: str = "sentence-transformers/all-MiniLM-L6-v2"
+    EMBEDDING_MAX_TOKENS: int = 256  # the model's max sequence length; longer input is truncated
+    
+    # Embedding cache (on-disk SQLite with an in-memory LRU front)
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_PATH: str = "./cache/embeddings.sqlite3"
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 500_000
+    EMBEDDING_CACHE_MEMORY_ENTRIES: int = 10_000
     
     # Reranker Model
     RERANKER_MODEL: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
     
+    # Inference backend for the embedding model and the reranker: "torch", "onnx" (ONNX Runtime) or
+    # "onnx-int8" (dynamically quantized weights). Exports are made on first use and cached.
+    EMBEDDING_BACKEND: str = "torch"
+    RERANKER_BACKEND: str = "torch"
+    ONNX_CACHE_DIR: str = "./cache/onnx"
+    ONNX_THREADS: int = 0  # intra-op threads per ONNX session; 0 lets ONNX Runtime decide
+    
+    # Reranker batching (coalesce pairs from concurrent queries into shared forward passes)
+    RERANK_BATCHING_ENABLED: bool = True
+    RERANK_BATCH_WINDOW_MS: float = 5
+    RERANK_MAX_BATCH_PAIRS: int = 256
+    RERANK_MODEL_BATCH_SIZE: int = 32
+    
+    # Vector store: "chroma" (ChromaDB, HNSW), "flat" (exact search over memory-mapped vectors in
+    # FLAT_STORE_DIR, shared between processes; suits up to a few hundred thousand chunks) or "ivf"
+    # (IVF lists of int8 codes in RAM, float32 vectors on disk for re-scoring; for millions of chunks)
+    VECTOR_STORE: str = "chroma"
+    FLAT_STORE_DIR: str = "./flat_store"
+    
+    # IVF index: IVF_NLIST lists (0 = square root of the chunk count), the IVF_NPROBE nearest are
+    # scanned per query and the best IVF_RESCORE rows by int8 code are re-scored exactly.
+    # Stores with fewer than IVF_MIN_TRAIN chunks are searched exactly.
+    IVF_STORE_DIR: str = "./ivf_store"
+    IVF_NLIST: int = 0
+    IVF_NPROBE: int = 64
+    IVF_RESCORE: int = 200
+    IVF_MIN_TRAIN: int = 10000
+    
     # ChromaDB
     CHROMA_PERSIST_DIR: str = "./chroma_db"
     CHROMA_COLLECTION: str = "research_papers"
     
-    # Chunking params
-    CHUNK_SIZE: int = 400
+    # Uploaded PDFs
+    UPLOAD_DIR: str = "./uploaded_papers"
+    
+    # Paper registry (SQLite, one row per paper, written at ingest)
+    PAPER_REGISTRY_PATH: str = "./cache/papers.sqlite3"
+    PAPERS_PAGE_SIZE: int = 100
+    PAPERS_MAX_PAGE_SIZE: int = 1000
+    
+    # Knowledge graph (concept co-occurrence counted at ingest)
+    GRAPH_MAX_CONCEPTS: int = 200  # concepts kept per paper
+    GRAPH_DEFAULT_NODES: int = 20
+    CORPUS_GRAPH_TOP_K: int = 50
+    CORPUS_GRAPH_MAX_TOP_K: int = 500
+    CORPUS_GRAPH_CACHE_SIZE: int = 64  # cached graphs, one per (paper filter, top_k, min_weight)
+    
+    # Background ingestion
+    INGEST_MAX_WORKERS: int = 2
+    INGEST_MAX_PENDING: int = 100
+    EMBED_BATCH_SIZE: int = 64  # chunks embedded and flushed to the store per micro-batch
+    
+    # Bulk ingestion CLI (python -m app.ingest_bulk)
+    BULK_EMBED_BATCH_SIZE: int = 1024
+    BULK_MANIFEST_PATH: str = "./ingest_manifest.jsonl"
+    
+    # PDF parsing: "layout" finds headings from font size/weight and assigns sections per block,
+    # "keyword" assigns one section per page from keyword hits
+    PDF_SECTION_MODE: str = "layout"
+    
+    # Chunking params (in embedding-model tokens; chunks are capped at EMBEDDING_MAX_TOKENS - 2)
+    CHUNK_SIZE: int = 250
     CHUNK_OVERLAP: int = 50
     
     # Retrieval params
     TOP_K_RETRIEVAL: int = 20
     TOP_K_RERANKED: int = 5
+    # Searches over several papers are one filtered query for TOP_K_RETRIEVAL candidates per paper;
+    # no paper may take more than RETRIEVAL_PER_PAPER_LIMIT of them (0 = no limit)
+    RETRIEVAL_PER_PAPER_LIMIT: int = 20
+    
+    # Retrieval mode: "dense" (vectors only) or "hybrid" (BM25 + dense fused with reciprocal rank fusion)
+    RETRIEVAL_MODE: str = "hybrid"
+    RRF_K: int = 60
+    BM25_INDEX_PATH: str = "./cache/bm25_index.pkl"
+    
+    # Cache of reranked retrieve_tool results (invalidated per paper on ingest/delete)
+    RETRIEVAL_CACHE_ENABLED: bool = True
+    RETRIEVAL_CACHE_MAX_ENTRIES: int = 1024
+    RETRIEVAL_CACHE_TTL_SECONDS: float = 600
+    
+    # Relevance grading of retrieved chunks (one grader call per chunk, run concurrently)
+    GRADER_MAX_CONCURRENCY: int = 8
+    GRADER_SCORE_THRESHOLD: Optional[float] = None  # raw cross-encoder score that skips the LLM grader; None disables
+    
+    # Query router: simple in-corpus questions skip the planner graph
+    QUERY_ROUTER_ENABLED: bool = True
+    ROUTER_MAX_WORDS: int = 40
+    ROUTER_EMBEDDING_THRESHOLD: Optional[float] = 0.6  # similarity to tool-heavy exemplars; None disables
+    
+    # LangGraph checkpointer ("memory" or "sqlite") and its retention policy
+    CHECKPOINTER: str = "memory"
+    CHECKPOINT_DB_PATH: str = "./cache/checkpoints.sqlite3"
+    CHECKPOINT_MAX_THREADS: int = 1000
+    CHECKPOINT_MAX_PER_THREAD: int = 20
+    CHECKPOINT_TTL_SECONDS: float = 3600
     
     # Query expansion
     NUM_QUERY_VARIANTS: int = 3
+    MULTI_QUERY_ENABLED: bool = False  # retrieve with expanded variants (one batched embed + vector search)
+    QUERY_EXPANSION_MODE: str = "local"  # "local" (corpus term neighbours, no LLM) or "llm"
+    QUERY_EXPANSION_CACHE_SIZE: int = 1024  # LRU entries in front of the LLM mode
+    TERM_INDEX_PATH: str = "./cache/term_neighbors.npz"
+    TERM_VOCAB_SIZE: int = 20000
+    TERM_NEIGHBOR_MIN_SIMILARITY: float = 0.6
 
+    # Load models, ChromaDB and the agent graph in the background at startup (otherwise on first use or POST /warmup)
+    WARMUP_ON_STARTUP: bool = True
+    
+    # Executor pools for blocking work called from async handlers
+    MODEL_POOL_SIZE: int = 4   # embedding / reranking / parsing
+    DB_POOL_SIZE: int = 8      # vector store and file I/O
+    LLM_POOL_SIZE: int = 32    # synchronous LLM calls (LangGraph sync nodes)
+    
     # CORS
     ALLOWED_ORIGINS: list[str] = ["http://localhost:5173", "http://localhost:3000"]
     
@@ -0,0 +1,130 @@
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import threading
+import numpy as np
+from scipy import sparse
+from app.core.config import settings
+from app.db.registry import PaperRegistry, paper_registry
+
+class CorpusGraph:
+    """
+    Concept co-occurrence graph across papers
+    
+    Every chunk is a row of a sparse chunk x concept incidence matrix A over a
+    global concept vocabulary. For the papers in a filter, co-occurrence
+    between the top_k most frequent concepts is A_top.T @ A_top, a single
+    sparse product. Results are cached per (paper filter, top_k, min_weight)
+    and the cache is cleared whenever a paper is added or removed.
+    """
+    
+    def __init__(self, registry: PaperRegistry, cache_size: int = 64):
+        self.registry = registry
+        self.cache_size = cache_size
+        self.cache: "OrderedDict[Tuple, Dict]" = OrderedDict()
+        self.incidence: Optional[Dict[str, Tuple[np.ndarray, np.ndarray]]] = None  # paper_id -> (indptr, indices)
+        self.vocabulary: Dict[int, str] = {}
+        self._lock = threading.RLock()
+    
+    def update_paper(self, paper_id: str, chunk_concepts: List[List[str]]):
+        """Store the distinct concepts of each chunk of a paper (see ConceptCounter.chunks)"""
+        ids = self.registry.concept_ids(sorted({concept for concepts in chunk_concepts for concept in concepts}))
+        indptr = np.zeros(len(chunk_concepts) + 1, dtype=np.int32)
+        indptr[1:] = np.cumsum([len(concepts) for concepts in chunk_concepts])
+        indices = np.fromiter((ids[concept] for concepts in chunk_concepts for concept in concepts), dtype=np.int32, count=int(indptr[-1]))
+        self.registry.save_incidence(paper_id, indptr.tobytes(), indices.tobytes())
+        
+        with self._lock:
+            if self.incidence is not None:
+                self.incidence[paper_id] = (indptr, indices)
+                # Replaced rather than updated so a build in progress keeps a consistent copy
+                self.vocabulary = {**self.vocabulary, **{concept_id: concept for concept, concept_id in ids.items()}}
+            self.cache.clear()
+    
+    def remove_paper(self, paper_id: str):
+        with self._lock:
+            if self.incidence is not None:
+                self.incidence.pop(paper_id, None)
+            self.cache.clear()
+    
+    def build(self, paper_ids: Optional[List[str]] = None, top_k: int = 50, min_weight: int = 1) -> Dict:
+        """
+        Graph of the top_k concepts over the selected papers (all papers if None)
+        
+        Returns:
+            {nodes, edges, papers, chunks}; node size is the number of chunks
+            mentioning the concept, edge weight the number of chunks mentioning both
+        """
+        key = (tuple(sorted(set(paper_ids))) if paper_ids else None, top_k, min_weight)
+        with self._lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                return self.cache[key]
+            self._load()
+            selected = [paper_id for paper_id in (key[0] or sorted(self.incidence)) if paper_id in self.incidence]
+            parts = [self.incidence[paper_id] for paper_id in selected]
+            vocabulary = self.vocabulary
+        
+        matrix, chunk_papers = self._incidence_matrix(parts, max(vocabulary, default=0) + 1)
+        frequency = np.asarray(matrix.sum(axis=0)).ravel()
+        top = np.argsort(-frequency, kind="stable")[:top_k]
+        top = top[frequency[top] > 0]
+        
+        columns = matrix[:, top]
+        cooccurrence = sparse.triu(columns.T @ columns, k=1).tocoo()
+        keep = cooccurrence.data >= min_weight
+        rows, cols, weights = cooccurrence.row[keep], cooccurrence.col[keep], cooccurrence.data[keep]
+        order = np.lexsort((cols, rows, -weights))
+        
+        # Papers mentioning each concept: paper x chunk membership times the incidence columns
+        membership = sparse.csr_matrix(
+            (np.ones(len(chunk_papers), dtype=np.int32), (chunk_papers, np.arange(len(chunk_papers)))),
+            shape=(len(parts), len(chunk_papers))
+        )
+        paper_counts = np.asarray(((membership @ columns) > 0).sum(axis=0)).ravel()
+        
+        labels = [vocabulary[int(concept_id)] for concept_id in top]
+        result = {
+            "nodes": [
+                {"id": label, "label": label, "size": int(frequency[concept_id]), "papers": int(paper_counts[i]), "type": "concept"}
+                for i, (label, concept_id) in enumerate(zip(labels, top))
+            ],
+            "edges": [
+                {"source": labels[rows[i]], "target": labels[cols[i]], "weight": int(weights[i])}
+                for i in order
+            ],
+            "papers": len(parts),
+            "chunks": matrix.shape[0]
+        }
+        
+        with self._lock:
+            self.cache[key] = result
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return result
+    
+    @staticmethod
+    def _incidence_matrix(parts: List[Tuple[np.ndarray, np.ndarray]], num_concepts: int) -> Tuple[sparse.csr_matrix, np.ndarray]:
+        """Stack per-paper CSR rows into one chunk x concept matrix, plus each row's paper index"""
+        if not parts:
+            return sparse.csr_matrix((0, num_concepts), dtype=np.int32), np.zeros(0, dtype=np.int64)
+        row_counts = [len(indptr) - 1 for indptr, _ in parts]
+        offsets = np.cumsum([0] + [len(indices) for _, indices in parts[:-1]])
+        indptr = np.concatenate([[0]] + [p[1:] + offset for (p, _), offset in zip(parts, offsets)])
+        indices = np.concatenate([indices for _, indices in parts])
+        matrix = sparse.csr_matrix(
+            (np.ones(len(indices), dtype=np.int32), indices, indptr),
+            shape=(len(indptr) - 1, num_concepts)
+        )
+        return matrix, np.repeat(np.arange(len(parts)), row_counts)
+    
+    def _load(self):
+        if self.incidence is not None:
+            return
+        self.vocabulary = self.registry.vocabulary()
+        self.incidence = {
+            paper_id: (np.frombuffer(indptr, dtype=np.int32), np.frombuffer(indices, dtype=np.int32))
+            for paper_id, (indptr, indices) in self.registry.load_incidence().items()
+        }
+
+# Singleton instance
+corpus_graph = CorpusGraph(paper_registry, cache_size=settings.CORPUS_GRAPH_CACHE_SIZE)
@@ -0,0 +1,170 @@
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import sqlite3
+import threading
+import time
+import os
+import numpy as np
+from app.core.hashing import sha256_text
+
+# Memory hits whose last_used is written back to disk in one batch
+TOUCH_BATCH = 1000
+
+class EmbeddingCache:
+    """
+    Two-level embedding cache keyed by (model, sha256(text))
+    
+    An in-memory LRU sits in front of a SQLite table of float32 vectors. The
+    table is capped at max_entries; once exceeded, the least recently used
+    rows are evicted. Memory hits refresh last_used on disk in batches, so the
+    hottest entries are not the first ones evicted.
+    """
+    
+    def __init__(self, path: str, model_name: str, max_entries: int = 500_000, memory_entries: int = 10_000):
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self.memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.memory_hits = 0
+        self._lock = threading.Lock()
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._conn_lock = threading.Lock()
+        self._disk_entries = 0
+        self._touched: set = set()  # memory hits not yet written back to last_used
+    
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """The SQLite connection, opened (creating the file and table) on first use"""
+        if self._conn is None:
+            with self._conn_lock:
+                if self._conn is None:
+                    self._conn = self._connect()
+        return self._conn
+    
+    def _connect(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, text_hash TEXT NOT NULL, vector BLOB NOT NULL, last_used REAL NOT NULL, "
+            "PRIMARY KEY (model, text_hash))"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)")
+        conn.commit()
+        # Counted once here, then tracked from the rows each insert and eviction changes
+        self._disk_entries = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        return conn
+    
+    def get_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """Return cached vectors aligned with texts (None where missing)"""
+        keys = [sha256_text(text) for text in texts]
+        found: Dict[str, np.ndarray] = {}
+        
+        with self._lock:
+            for key in keys:
+                if key in self.memory:
+                    self.memory.move_to_end(key)
+                    found[key] = self.memory[key]
+                    self.memory_hits += 1
+                    self._touched.add(key)
+            
+            disk_keys = list({key for key in keys if key not in found})
+            now = time.time()
+            # Stay well under SQLite's bound-parameter limit
+            for start in range(0, len(disk_keys), 500):
+                batch = disk_keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self.conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [self.model_name, *batch]
+                ).fetchall()
+                for key, blob in rows:
+                    vector = np.frombuffer(blob, dtype=np.float32)
+                    found[key] = vector
+                    self._remember(key, vector)
+                if rows:
+                    self.conn.executemany(
+                        "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                        [(now, self.model_name, key) for key, _ in rows]
+                    )
+            if disk_keys or len(self._touched) >= TOUCH_BATCH:
+                self._flush_touched(now)
+            self.conn.commit()
+            
+            results = [found.get(key) for key in keys]
+            hits = sum(1 for vector in results if vector is not None)
+            self.hits += hits
+            self.misses += len(results) - hits
+        
+        return results
+    
+    def put_many(self, texts: List[str], vectors) -> None:
+        """Store vectors for texts"""
+        now = time.time()
+        rows = []
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                key = sha256_text(text)
+                vector = np.asarray(vector, dtype=np.float32)
+                self._remember(key, vector)
+                rows.append((self.model_name, key, vector.tobytes(), now))
+            
+            inserted = self.conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (model, text_hash, vector, last_used) VALUES (?, ?, ?, ?)",
+                rows
+            ).rowcount
+            if inserted < len(rows):
+                # Some keys were already stored (e.g. by another process); overwrite them
+                self.conn.executemany(
+                    "UPDATE embeddings SET vector = ?, last_used = ? WHERE model = ? AND text_hash = ?",
+                    [(blob, used, model, key) for model, key, blob, used in rows]
+                )
+            self._disk_entries += inserted
+            if self._disk_entries > self.max_entries:
+                self._flush_touched(now)
+                self._evict()
+            self.conn.commit()
+    
+    def stats(self) -> Dict:
+        self.conn  # counts the rows on disk
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "model": self.model_name,
+                "hits": self.hits,
+                "misses": self.misses,
+                "memory_hits": self.memory_hits,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "memory_entries": len(self.memory),
+                "disk_entries": self._disk_entries,
+                "max_entries": self.max_entries
+            }
+    
+    def _remember(self, key: str, vector: np.ndarray):
+        self.memory[key] = vector
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+    
+    def _flush_touched(self, now: float):
+        """Write last_used for the memory hits since the last flush"""
+        if self._touched:
+            self.conn.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                [(now, self.model_name, key) for key in self._touched]
+            )
+            self._touched.clear()
+    
+    def _evict(self):
+        """Trim the on-disk table back to max_entries, oldest last_used first"""
+        deleted = self.conn.execute(
+            "DELETE FROM embeddings WHERE rowid IN (SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+            (self._disk_entries - self.max_entries,)
+        ).rowcount
+        self._disk_entries -= deleted
@@ -1,22 +1,77 @@
-from sentence_transformers import SentenceTransformer
-from typing import List
+from typing import List, Optional
+import threading
 from app.core.config import settings
+from app.core.embedding_cache import EmbeddingCache
 
 class EmbeddingModel:
-    """Handles text embeddings"""
+    """
+    Handles text embeddings
+    
+    The model (and sentence-transformers itself) is loaded on first use or by
+    load(), so importing the app stays fast.
+    """
     
     def __init__(self):
-        self.model = SentenceTransformer(settings.EMBEDDING_MODEL)
+        self._model = None
+        self._lock = threading.Lock()
+        self.cache: Optional[EmbeddingCache] = None
+        if settings.EMBEDDING_CACHE_ENABLED:
+            self.cache = EmbeddingCache(
+                path=settings.EMBEDDING_CACHE_PATH,
+                # Other backends give slightly different vectors, so they get their own entries
+                model_name=settings.EMBEDDING_MODEL if settings.EMBEDDING_BACKEND == "torch"
+                else f"{settings.EMBEDDING_MODEL}@{settings.EMBEDDING_BACKEND}",
+                max_entries=settings.EMBEDDING_CACHE_MAX_ENTRIES,
+                memory_entries=settings.EMBEDDING_CACHE_MEMORY_ENTRIES
+            )
+    
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    from app.core.onnx_backend import load_model
+                    self._model = load_model(
+                        "sentence_transformer",
+                        settings.EMBEDDING_MODEL,
+                        settings.EMBEDDING_BACKEND,
+                        cache_dir=settings.ONNX_CACHE_DIR,
+                        threads=settings.ONNX_THREADS
+                    )
+        return self._model
+    
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+    
+    def load(self):
+        """Load the model now instead of on the first embedding"""
+        return self.model
     
     def embed_text(self, text: str) -> List[float]:
         """Embed single text"""
-        embedding = self.model.encode(text, convert_to_numpy=True)
-        return embedding.tolist()
+        return self.embed_batch([text], show_progress_bar=False)[0]
+    
+    def embed_batch(self, texts: List[str], show_progress_bar: bool = True) -> List[List[float]]:
+        """Embed multiple texts, only running the model for texts not already cached"""
+        if self.cache is None:
+            embeddings = self.model.encode(texts, convert_to_numpy=True, show_progress_bar=show_progress_bar)
+            return embeddings.tolist()
+        
+        vectors = self.cache.get_many(texts)
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+        
+        if missing:
+            encoded = self.model.encode(missing, convert_to_numpy=True, show_progress_bar=show_progress_bar)
+            self.cache.put_many(missing, encoded)
+            by_text = dict(zip(missing, encoded))
+            vectors = [vector if vector is not None else by_text[text] for text, vector in zip(texts, vectors)]
+        
+        return [vector.tolist() for vector in vectors]
     
-    def embed_batch(self, texts: List[str]) -> List[List[float]]:
-        """Embed multiple texts"""
-        embeddings = self.model.encode(texts, convert_to_numpy=True, show_progress_bar=True)
-        return embeddings.tolist()
+    def cache_stats(self) -> dict:
+        """Hit/miss counters for the embedding cache"""
+        return self.cache.stats() if self.cache else {"enabled": False}
 
 # Singleton instance
 embedding_model = EmbeddingModel()
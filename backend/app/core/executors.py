@@ -0,0 +1,33 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+import asyncio
+import functools
+from app.core.config import settings
+
+# Separate bounded pools so a burst of one kind of blocking work (e.g. reranking)
+# cannot starve the others or the event loop itself.
+model_pool = ThreadPoolExecutor(max_workers=settings.MODEL_POOL_SIZE, thread_name_prefix="model")
+db_pool = ThreadPoolExecutor(max_workers=settings.DB_POOL_SIZE, thread_name_prefix="db")
+llm_pool = ThreadPoolExecutor(max_workers=settings.LLM_POOL_SIZE, thread_name_prefix="llm")
+
+async def _run(pool: ThreadPoolExecutor, fn: Callable, *args, **kwargs) -> Any:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(pool, functools.partial(fn, *args, **kwargs))
+
+async def run_model(fn: Callable, *args, **kwargs) -> Any:
+    """Run CPU-bound model inference (embedding, reranking, PDF parsing) off the event loop"""
+    return await _run(model_pool, fn, *args, **kwargs)
+
+async def run_db(fn: Callable, *args, **kwargs) -> Any:
+    """Run blocking vector store / file I/O off the event loop"""
+    return await _run(db_pool, fn, *args, **kwargs)
+
+def install_default_executor():
+    """
+    Route the loop's default executor to the LLM pool
+
+    LangGraph runs synchronous graph nodes (planner, agent, graders) with
+    run_in_executor(None, ...), so this bounds them with LLM_POOL_SIZE instead
+    of the small interpreter default.
+    """
+    asyncio.get_running_loop().set_default_executor(llm_pool)
@@ -0,0 +1,13 @@
+import hashlib
+
+def sha256_text(text: str) -> str:
+    """Hex SHA-256 of a string"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def sha256_file(path: str, block_size: int = 1 << 20) -> str:
+    """Hex SHA-256 of a file, read in blocks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
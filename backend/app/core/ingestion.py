@@ -0,0 +1,333 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+from datetime import datetime, timezone
+import threading
+import uuid
+import os
+import re
+
+from app.core.pdf_parser import PDFParser
+from app.core.chunking import SemanticChunker
+from app.core.concepts import ConceptCounter
+from app.core.corpus_graph import corpus_graph
+from app.core.embeddings import embedding_model
+from app.db.chroma import chroma_db
+from app.db.registry import paper_registry
+from app.core.retrieval_cache import retrieval_cache
+from app.core.config import settings
+
+
+class IngestionJob:
+    """Progress record for a single paper moving through the ingestion pipeline"""
+    
+    def __init__(self, paper_id: str, filename: str, file_path: str, final_path: Optional[str] = None,
+                 file_hash: Optional[str] = None, source_id: Optional[str] = None, revision: bool = False):
+        self.job_id = str(uuid.uuid4())
+        self.paper_id = paper_id
+        self.filename = filename
+        self.file_path = file_path
+        self.final_path = final_path or file_path
+        self.file_hash = file_hash
+        self.source_id = source_id
+        self.revision = revision
+        self.status = "queued"  # queued | running | completed | failed
+        self.stage = "queued"   # queued | parsing | chunking | embedding | storing | done
+        self.total_pages = 0
+        self.pages_done = 0
+        self.chunks_total = 0
+        self.chunks_embedded = 0
+        self.chunks_reused = 0
+        self.error: Optional[str] = None
+        self.created_at = datetime.now(timezone.utc).isoformat()
+        self.finished_at: Optional[str] = None
+    
+    def to_dict(self) -> Dict:
+        return {
+            "job_id": self.job_id,
+            "paper_id": self.paper_id,
+            "filename": self.filename,
+            "status": self.status,
+            "stage": self.stage,
+            "total_pages": self.total_pages,
+            "pages_done": self.pages_done,
+            "chunks_total": self.chunks_total,
+            "chunks_embedded": self.chunks_embedded,
+            "chunks_reused": self.chunks_reused,
+            "revision": self.revision,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at
+        }
+
+
+def iter_paper_chunks(file_path: str, paper_id: str, chunker: SemanticChunker, job: Optional[IngestionJob] = None,
+                      outline: Optional[List[Dict]] = None) -> Iterator[Dict]:
+    """Stream chunks page by page, skipping sections that should not be embedded; detected headings go to outline"""
+    for page_data in PDFParser.iter_pages(file_path):
+        ordinal = 0
+        for segment in page_data["segments"]:
+            if PDFParser.should_skip_section(segment["section"]):
+                continue
+            chunks = chunker.chunk_text(
+                text=segment["text"],
+                page_number=page_data["page_number"],
+                section=segment["section"],
+                paper_id=paper_id,
+                first_ordinal=ordinal
+            )
+            ordinal += len(chunks)
+            for chunk in chunks:
+                chunk["heading"] = segment["heading"]
+            yield from chunks
+        if outline is not None:
+            outline.extend(page_data["headings"])
+        if job:
+            job.pages_done += 1
+
+
+# arXiv downloads are named like 2301.12345v2.pdf; the version suffix is dropped
+ARXIV_FILENAME_PATTERN = re.compile(r"^(?:arxiv[_:-]?)?(\d{4}\.\d{4,5})(?:v\d+)?\.pdf$", re.IGNORECASE)
+
+
+def detect_source_id(filename: str) -> Optional[str]:
+    """Stable identifier shared by all versions of a paper, if the filename carries one"""
+    match = ARXIV_FILENAME_PATTERN.match(os.path.basename(filename))
+    return f"arxiv:{match.group(1)}" if match else None
+
+
+def embed_chunks(chunks: List[Dict]) -> Tuple[List[List[float]], int]:
+    """
+    Embed chunks, reusing stored vectors for any chunk text already in the index
+    
+    Returns:
+        (embeddings aligned with chunks, number of chunks whose vector was reused)
+    """
+    known = chroma_db.get_embeddings_by_hash([chunk["chunk_hash"] for chunk in chunks])
+    
+    missing = {}
+    for chunk in chunks:
+        if chunk["chunk_hash"] not in known:
+            missing.setdefault(chunk["chunk_hash"], chunk["text"])
+    
+    if missing:
+        vectors = embedding_model.embed_batch(list(missing.values()), show_progress_bar=False)
+        known.update(zip(missing.keys(), vectors))
+    
+    reused = sum(1 for chunk in chunks if chunk["chunk_hash"] not in missing)
+    return [known[chunk["chunk_hash"]] for chunk in chunks], reused
+
+
+def process_paper(file_path: str, paper_id: str, job: Optional[IngestionJob] = None,
+                  file_hash: Optional[str] = None, source_id: Optional[str] = None,
+                  previous_ids: Optional[Set[str]] = None) -> Dict:
+    """
+    Run the parse -> chunk -> embed -> store pipeline for one PDF
+    
+    Pages are streamed out of the PDF and chunks are embedded and written in
+    micro-batches of EMBED_BATCH_SIZE, so peak memory does not grow with the
+    length of the document. When paper_id already has chunks (a revised
+    version), only chunks whose text changed are embedded and chunks that no
+    longer exist are removed afterwards. Concept co-occurrence for the
+    knowledge graph is counted on the same pass. previous_ids (the paper's
+    chunk ids before this run) is read from the store when not given.
+    
+    Returns:
+        {paper_id, total_pages, total_chunks, chunks_reused, text_chars, graph, chunk_concepts, outline}
+    """
+    total_pages = PDFParser.count_pages(file_path)
+    if job:
+        job.total_pages = total_pages
+        job.stage = "parsing"
+    
+    if previous_ids is None:
+        previous_ids = set(chroma_db.get_chunk_ids(paper_id))
+    current_ids = set()
+    
+    chunker = SemanticChunker(
+        chunk_size=settings.CHUNK_SIZE,
+        overlap=settings.CHUNK_OVERLAP
+    )
+    
+    total_chunks = 0
+    total_reused = 0
+    text_chars = 0
+    concepts = ConceptCounter()
+    outline: List[Dict] = []
+    batch: List[Dict] = []
+    
+    def flush():
+        nonlocal total_chunks, total_reused
+        if not batch:
+            return
+        if job:
+            job.stage = "embedding"
+        embeddings, reused = embed_chunks(batch)
+        if job:
+            job.stage = "storing"
+        chroma_db.add_chunks(batch, embeddings)
+        total_chunks += len(batch)
+        total_reused += reused
+        if job:
+            job.chunks_embedded = total_chunks
+            job.chunks_reused = total_reused
+            job.stage = "parsing"
+        batch.clear()
+    
+    for chunk in iter_paper_chunks(file_path, paper_id, chunker, job, outline):
+        chunk["file_hash"] = file_hash
+        chunk["source_id"] = source_id
+        current_ids.add(chunk["chunk_id"])
+        text_chars += len(chunk["text"])
+        concepts.add_text(chunk["text"])
+        batch.append(chunk)
+        if job:
+            job.chunks_total += 1
+        if len(batch) >= settings.EMBED_BATCH_SIZE:
+            flush()
+    flush()
+    
+    chroma_db.delete_chunks(list(previous_ids - current_ids))
+    
+    return {
+        "paper_id": paper_id,
+        "total_pages": total_pages,
+        "total_chunks": total_chunks,
+        "chunks_reused": total_reused,
+        "text_chars": text_chars,
+        "graph": concepts.to_graph(settings.GRAPH_MAX_CONCEPTS),
+        "chunk_concepts": concepts.chunks,
+        "outline": outline
+    }
+
+
+class IngestionJobManager:
+    """Runs ingestion jobs on a bounded worker pool so request handlers return immediately"""
+    
+    def __init__(self, max_workers: int = 2, max_pending: int = 100, history_size: int = 500):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+        self.max_pending = max_pending
+        self.history_size = history_size
+        self.jobs: Dict[str, IngestionJob] = {}
+        self._lock = threading.Lock()
+    
+    def pending_count(self) -> int:
+        with self._lock:
+            return sum(1 for job in self.jobs.values() if job.status in ("queued", "running"))
+    
+    def submit(self, file_path: str, paper_id: str, filename: str, final_path: Optional[str] = None,
+               file_hash: Optional[str] = None, source_id: Optional[str] = None, revision: bool = False) -> IngestionJob:
+        """Queue a PDF for ingestion, raising RuntimeError when the queue is full"""
+        if self.pending_count() >= self.max_pending:
+            raise RuntimeError("Ingestion queue is full, retry later")
+        
+        job = IngestionJob(
+            paper_id=paper_id,
+            filename=filename,
+            file_path=file_path,
+            final_path=final_path,
+            file_hash=file_hash,
+            source_id=source_id,
+            revision=revision
+        )
+        with self._lock:
+            self.jobs[job.job_id] = job
+            self._prune_history()
+        
+        self.executor.submit(self._run, job)
+        return job
+    
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        with self._lock:
+            return self.jobs.get(job_id)
+    
+    def find_active(self, file_hash: str) -> Optional[IngestionJob]:
+        """Return a queued or running job for the same file, if any"""
+        with self._lock:
+            for job in self.jobs.values():
+                if job.file_hash == file_hash and job.status in ("queued", "running"):
+                    return job
+        return None
+    
+    def _run(self, job: IngestionJob):
+        job.status = "running"
+        print(f"---INGEST JOB {job.job_id}: {job.filename}---")
+        previous_ids: Set[str] = set()
+        try:
+            if job.revision:
+                previous_ids = set(chroma_db.get_chunk_ids(job.paper_id))
+            if not job.revision:
+                paper_registry.upsert(
+                    job.paper_id,
+                    filename=job.filename,
+                    status="processing",
+                    file_hash=job.file_hash,
+                    source_id=job.source_id
+                )
+            result = process_paper(
+                job.file_path,
+                job.paper_id,
+                job=job,
+                file_hash=job.file_hash,
+                source_id=job.source_id,
+                previous_ids=previous_ids
+            )
+            if job.final_path != job.file_path:
+                os.replace(job.file_path, job.final_path)
+            paper_registry.upsert(
+                job.paper_id,
+                filename=job.filename,
+                status="ready",
+                file_hash=job.file_hash,
+                source_id=job.source_id,
+                file_size=os.path.getsize(job.final_path),
+                total_pages=result["total_pages"],
+                chunks_count=result["total_chunks"],
+                text_chars=result["text_chars"]
+            )
+            paper_registry.save_graph(job.paper_id, result["graph"])
+            corpus_graph.update_paper(job.paper_id, result["chunk_concepts"])
+            paper_registry.save_outline(job.paper_id, result["outline"])
+            job.stage = "done"
+            job.status = "completed"
+        except Exception as e:
+            print(f"Ingestion failed for {job.filename}: {e}")
+            job.status = "failed"
+            job.error = str(e)
+            # Chunks are flushed incrementally, so drop whatever made it into the store.
+            # A failed revision keeps the previous version's chunk ids and drops only the
+            # new ones, so the paper is not left half old and half new.
+            try:
+                if job.revision:
+                    added = set(chroma_db.get_chunk_ids(job.paper_id)) - previous_ids
+                    chroma_db.delete_chunks(list(added))
+                else:
+                    chroma_db.delete_paper(job.paper_id)
+                    paper_registry.delete(job.paper_id)
+                    corpus_graph.remove_paper(job.paper_id)
+            except Exception as cleanup_error:
+                print(f"Cleanup failed for {job.paper_id}: {cleanup_error}")
+            if os.path.exists(job.file_path):
+                os.remove(job.file_path)
+        finally:
+            retrieval_cache.invalidate_paper(job.paper_id)
+            try:
+                chroma_db.save_sparse_index()
+            except Exception as e:
+                print(f"Saving BM25 index failed: {e}")
+            job.finished_at = datetime.now(timezone.utc).isoformat()
+    
+    def _prune_history(self):
+        """Drop the oldest finished jobs once the history cap is exceeded"""
+        overflow = len(self.jobs) - self.history_size
+        if overflow <= 0:
+            return
+        finished = [job_id for job_id, job in self.jobs.items() if job.status in ("completed", "failed")]
+        for job_id in finished[:overflow]:
+            del self.jobs[job_id]
+
+
+# Singleton instance
+ingestion_jobs = IngestionJobManager(
+    max_workers=settings.INGEST_MAX_WORKERS,
+    max_pending=settings.INGEST_MAX_PENDING
+)
@@ -0,0 +1,191 @@
+from typing import List, Optional, Sequence, Tuple
+import json
+import os
+import re
+import shutil
+import threading
+import numpy as np
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+MODEL_FILE = "model.onnx"
+METADATA_FILE = "onnx_export.json"
+
+_export_lock = threading.Lock()
+
+class OnnxModel:
+    """
+    A sentence-transformers model exported to ONNX, run with ONNX Runtime
+    
+    The graph includes everything after tokenization (pooling and
+    normalization for embedders, the activation for cross-encoders), so
+    outputs match the PyTorch model up to numerical error. encode() and
+    predict() take the arguments EmbeddingModel and the rerank batcher use.
+    """
+    
+    def __init__(self, path: str, threads: int = 0):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+        
+        with open(os.path.join(path, METADATA_FILE)) as f:
+            self.metadata = json.load(f)
+        self.max_length = self.metadata["max_length"]
+        self.tokenizer = AutoTokenizer.from_pretrained(path, use_fast=True)
+        
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(
+            os.path.join(path, MODEL_FILE), sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = [node.name for node in self.session.get_inputs()]
+    
+    def encode(self, texts: List[str], batch_size: int = 32, convert_to_numpy: bool = True,
+               show_progress_bar: bool = False, **kwargs) -> np.ndarray:
+        """Sentence embeddings, one row per text"""
+        outputs = [self._run(texts[i:i + batch_size]) for i in range(0, len(texts), batch_size)]
+        return np.concatenate(outputs) if outputs else np.zeros((0, self.metadata["dimension"]), dtype=np.float32)
+    
+    def predict(self, pairs: Sequence[Tuple[str, str]], batch_size: int = 32,
+                show_progress_bar: bool = False, **kwargs) -> np.ndarray:
+        """Cross-encoder scores, one per (query, text) pair"""
+        outputs = [
+            self._run([query for query, _ in pairs[i:i + batch_size]], [text for _, text in pairs[i:i + batch_size]])
+            for i in range(0, len(pairs), batch_size)
+        ]
+        return np.concatenate(outputs) if outputs else np.zeros(0, dtype=np.float32)
+    
+    def _run(self, texts: List[str], text_pairs: Optional[List[str]] = None) -> np.ndarray:
+        features = self.tokenizer(
+            texts, text_pairs, padding=True, truncation=True, max_length=self.max_length, return_tensors="np"
+        )
+        return self.session.run(None, {name: features[name].astype(np.int64) for name in self.input_names})[0]
+
+def load_model(kind: str, model_name: str, backend: str = "torch", cache_dir: str = "./cache/onnx", threads: int = 0):
+    """
+    The model to run for a backend
+    
+    Returns:
+        SentenceTransformer / CrossEncoder for "torch", otherwise an OnnxModel
+    """
+    if backend == "torch":
+        from sentence_transformers import CrossEncoder, SentenceTransformer
+        return SentenceTransformer(model_name) if kind == "sentence_transformer" else CrossEncoder(model_name)
+    return load_onnx_model(kind, model_name, backend, cache_dir, threads=threads)
+
+def export_path(cache_dir: str, model_name: str, backend: str) -> str:
+    return os.path.join(cache_dir, re.sub(r"[^\w.-]+", "--", model_name.strip("/")), backend)
+
+def load_onnx_model(kind: str, model_name: str, backend: str, cache_dir: str, threads: int = 0) -> OnnxModel:
+    """
+    Load an exported model, exporting (and for onnx-int8 quantizing) it on first use
+    
+    kind is "sentence_transformer" or "cross_encoder". Exports are written to
+    cache_dir/<model>/<backend> and reused across restarts.
+    """
+    if backend not in BACKENDS[1:]:
+        raise ValueError(f"Unknown inference backend: {backend} (expected one of {', '.join(BACKENDS)})")
+    path = export_path(cache_dir, model_name, backend)
+    with _export_lock:
+        if not os.path.exists(os.path.join(path, MODEL_FILE)):
+            fp32_path = export_path(cache_dir, model_name, "onnx")
+            if not os.path.exists(os.path.join(fp32_path, MODEL_FILE)):
+                print(f"---EXPORTING {model_name} TO ONNX---")
+                _write_atomically(fp32_path, lambda tmp: export_model(kind, model_name, tmp))
+            if backend == "onnx-int8":
+                print(f"---QUANTIZING {model_name} TO INT8---")
+                _write_atomically(path, lambda tmp: quantize_model(fp32_path, tmp))
+    return OnnxModel(path, threads=threads)
+
+def export_model(kind: str, model_name: str, path: str):
+    """Export a sentence-transformers model, with its tokenizer, to path"""
+    import torch
+    
+    model, wrapper, max_length, dimension = _torch_wrapper(kind, model_name)
+    wrapper.eval()
+    tokenizer = model.tokenizer
+    sample = ["a short sentence", "a somewhat longer sentence that needs padding in the batch"]
+    # Padded batch (of pairs for a cross-encoder) so the trace covers attention masking
+    pairs = sample[::-1] if kind == "cross_encoder" else None
+    features = tokenizer(sample, pairs, padding=True, truncation=True, max_length=max_length, return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in features]
+    wrapper.input_names = input_names
+    
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["output"] = {0: "batch"}
+    with torch.no_grad():
+        torch.onnx.export(
+            wrapper,
+            tuple(features[name] for name in input_names),
+            os.path.join(path, MODEL_FILE),
+            input_names=input_names,
+            output_names=["output"],
+            dynamic_axes=dynamic_axes,
+            opset_version=17,
+            do_constant_folding=True,
+            dynamo=False
+        )
+    tokenizer.save_pretrained(path)
+    with open(os.path.join(path, METADATA_FILE), "w") as f:
+        json.dump({"kind": kind, "model": model_name, "max_length": max_length, "dimension": dimension}, f)
+
+def quantize_model(fp32_path: str, path: str):
+    """Dynamic int8 quantization of the weights of an exported model"""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    
+    quantize_dynamic(os.path.join(fp32_path, MODEL_FILE), os.path.join(path, MODEL_FILE), weight_type=QuantType.QInt8)
+    for name in os.listdir(fp32_path):
+        if name != MODEL_FILE:
+            shutil.copy(os.path.join(fp32_path, name), path)
+
+def _torch_wrapper(kind: str, model_name: str):
+    """The PyTorch model and a module mapping token tensors to the final output"""
+    import torch
+    
+    if kind == "sentence_transformer":
+        from sentence_transformers import SentenceTransformer
+        
+        model = SentenceTransformer(model_name, device="cpu").eval()
+        
+        class Wrapper(torch.nn.Module):
+            def __init__(self):
+                super().__init__()
+                self.model = model
+            
+            def forward(self, *inputs):
+                return self.model(dict(zip(self.input_names, inputs)))["sentence_embedding"]
+        
+        return model, Wrapper(), model.max_seq_length, model.get_sentence_embedding_dimension()
+    
+    if kind == "cross_encoder":
+        from sentence_transformers import CrossEncoder
+        
+        model = CrossEncoder(model_name, device="cpu")
+        # Named activation_fn from sentence-transformers 4, default_activation_function before
+        activation = getattr(model, "activation_fn", None) or getattr(model, "default_activation_function", None) or torch.nn.Identity()
+        
+        class Wrapper(torch.nn.Module):
+            def __init__(self):
+                super().__init__()
+                self.transformer = model.model
+                self.single_label = model.model.config.num_labels == 1
+            
+            def forward(self, *inputs):
+                scores = activation(self.transformer(**dict(zip(self.input_names, inputs))).logits)
+                return scores[:, 0] if self.single_label else scores
+        
+        return model, Wrapper(), getattr(model, "max_length", None) or 512, None
+    
+    raise ValueError(f"Unknown model kind: {kind}")
+
+def _write_atomically(path: str, write):
+    """Run write(tmp_dir) and move the result to path, so a crash never leaves a partial export"""
+    tmp = f"{path}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    try:
+        write(tmp)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp, path)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
@@ -1,6 +1,133 @@
 import fitz  # PyMuPDF
-from typing import List, Dict, Optional
+from collections import Counter
+from typing import List, Dict, Iterator, Optional
 import re
+from app.core.config import settings
+
+# Canonical section for a heading, first match wins (numbering already stripped, lowercased)
+SECTION_PATTERNS = [
+    ("References", re.compile(r"^(references|bibliography|works cited)\b")),
+    ("Acknowledgments", re.compile(r"^acknowledge?ments?\b")),
+    ("Appendix", re.compile(r"^(appendix|appendices|supplementary)")),
+    ("Abstract", re.compile(r"^abstract\b")),
+    ("Introduction", re.compile(r"^(introduction|overview)\b")),
+    ("Conclusion", re.compile(r"conclusion|concluding|future work|^summary\b")),
+    ("Discussion", re.compile(r"discussion|analysis|ablation|limitation")),
+    ("Results", re.compile(r"experiment|result|evaluation|benchmark")),
+    ("Background", re.compile(r"related work|background|preliminar|prior work")),
+    ("Methods", re.compile(r"method|approach|model|architecture|framework|algorithm|proposed|training")),
+]
+
+HEADING_NUMBER = re.compile(r"^((?:\d+|[A-Z])(?:\.\d+)*|[IVX]+)\.?\s+(?=\S)")
+
+def classify_heading(heading: str) -> Optional[str]:
+    """Canonical section name for a heading, or None for headings that do not start one"""
+    title = HEADING_NUMBER.sub("", heading.strip()).lower().rstrip(".:")
+    for section, pattern in SECTION_PATTERNS:
+        if pattern.search(title):
+            return section
+    return None
+
+class LayoutSectionDetector:
+    """
+    Assigns sections per text block from heading lines, for one document
+    
+    A line is a heading when it matches an entry of the PDF outline on that
+    page, or when it is short and set larger than body text (or bold and
+    standalone / numbered). The body size is the most common font size, by
+    character count, over the pages seen so far. Every heading detected is
+    recorded in outline.
+    """
+    
+    BOLD = 16  # PyMuPDF span flag
+    
+    def __init__(self, toc: Optional[List] = None):
+        self.size_chars: Counter = Counter()
+        self.section = "Body"
+        self.heading: Optional[str] = None
+        self.outline: List[Dict] = []
+        self.toc: Dict[int, set] = {}
+        for level, title, page_number in toc or []:
+            self.toc.setdefault(page_number, set()).add(self._normalize(title))
+    
+    def page_segments(self, page, page_number: int) -> List[Dict]:
+        """
+        Split one page into runs of lines under the same heading
+        
+        Returns:
+            List of {section, heading, text}
+        """
+        blocks = []
+        for block in page.get_text("dict", flags=fitz.TEXTFLAGS_TEXT)["blocks"]:
+            lines = []
+            for line in block.get("lines", []):
+                spans = [span for span in line["spans"] if span["text"]]
+                text = "".join(span["text"] for span in spans)
+                if not text.strip():
+                    continue
+                visible = [span for span in spans if span["text"].strip()]
+                size = max(span["size"] for span in visible)
+                bold = all(span["flags"] & self.BOLD or "bold" in span["font"].lower() for span in visible)
+                first = visible[0]
+                lead = first["text"].strip() if first["flags"] & self.BOLD or "bold" in first["font"].lower() else None
+                lines.append((text, size, bold, lead))
+                self.size_chars[round(size, 1)] += len(text)
+            if lines:
+                blocks.append(lines)
+        
+        body_size = self.size_chars.most_common(1)[0][0] if self.size_chars else 0
+        segments: List[Dict] = []
+        for lines in blocks:
+            for index, (text, size, bold, lead) in enumerate(lines):
+                heading = self._heading(text, size, bold, lead, index, len(lines), page_number, body_size)
+                if heading:
+                    self._enter(heading, page_number)
+                if not segments or (segments[-1]["section"], segments[-1]["heading"]) != (self.section, self.heading):
+                    segments.append({"section": self.section, "heading": self.heading, "lines": []})
+                segments[-1]["lines"].append(text)
+        
+        return [
+            {"section": segment["section"], "heading": segment["heading"], "text": "\n".join(segment["lines"])}
+            for segment in segments
+        ]
+    
+    def _heading(self, text: str, size: float, bold: bool, lead: Optional[str], index: int,
+                 line_count: int, page_number: int, body_size: float) -> Optional[str]:
+        stripped = " ".join(text.split())
+        if self._normalize(stripped) in self.toc.get(page_number, ()):
+            return stripped
+        if index == 0 and lead and lead != stripped and len(lead.split()) <= 3 and classify_heading(lead):
+            # Run-in heading such as a bold "Abstract." followed by body text on the same line
+            return lead.rstrip(".:")
+        if len(stripped) > 100 or len(stripped.split()) > 12 or not any(c.isalpha() for c in stripped):
+            return None
+        if stripped.endswith((",", ";")) or (stripped[0].islower() and not HEADING_NUMBER.match(stripped)):
+            return None
+        if size >= body_size * 1.15:
+            return stripped
+        if bold and index == 0 and size >= body_size * 0.95:
+            if line_count <= 2 or HEADING_NUMBER.match(stripped) or classify_heading(stripped):
+                return stripped
+        return None
+    
+    def _enter(self, heading: str, page_number: int):
+        numbering = HEADING_NUMBER.match(heading)
+        level = numbering.group(1).count(".") + 1 if numbering else 1
+        section = classify_heading(heading)
+        # Subsections and unrecognised headings stay in the enclosing section
+        if section and (level == 1 or section in ("References", "Appendix")):
+            self.section = section
+        self.heading = heading
+        self.outline.append({
+            "page_number": page_number,
+            "level": level,
+            "heading": heading,
+            "section": self.section
+        })
+    
+    @staticmethod
+    def _normalize(title: str) -> str:
+        return HEADING_NUMBER.sub("", " ".join(title.split())).lower().rstrip(".:")
 
 class PDFParser:
     """Extracts text from PDFs with page-level fidelity"""
@@ -11,26 +138,60 @@ class PDFParser:
         Parse PDF and extract text with metadata
         
         Returns:
-            List of dicts with {page_number, text, section}
+            List of dicts with {page_number, text, section, segments}
         """
-        doc = fitz.open(pdf_path)
-        pages_data = []
+        return list(PDFParser.iter_pages(pdf_path))
+    
+    @staticmethod
+    def iter_pages(pdf_path: str, mode: Optional[str] = None) -> Iterator[Dict]:
+        """
+        Stream pages out of the PDF one at a time
         
-        for page_num in range(len(doc)):
-            page = doc[page_num]
-            text = page.get_text()
-            
-            # Detect section headers (simple heuristic)
-            section = PDFParser._detect_section(text, page_num)
-            
-            pages_data.append({
-                "page_number": page_num + 1,
-                "text": text,
-                "section": section
-            })
+        Only the current page's text is held in memory, so callers can
+        process arbitrarily long documents in bounded space. In "layout" mode
+        (PDF_SECTION_MODE) sections come from headings found by font size and
+        weight and can change mid-page; segments holds the page's text split
+        by section, and headings the headings detected on the page. "keyword"
+        mode assigns one section per page from keyword hits.
         
-        doc.close()
-        return pages_data
+        Yields:
+            Dicts with {page_number, text, section, segments, headings}
+        """
+        mode = mode or settings.PDF_SECTION_MODE
+        doc = fitz.open(pdf_path)
+        try:
+            detector = LayoutSectionDetector(doc.get_toc(simple=True)) if mode == "layout" else None
+            for page_num in range(len(doc)):
+                page = doc[page_num]
+                
+                if detector is not None:
+                    headings_before = len(detector.outline)
+                    segments = detector.page_segments(page, page_num + 1)
+                    headings = detector.outline[headings_before:]
+                    text = "\n".join(segment["text"] for segment in segments)
+                    section = segments[0]["section"] if segments else detector.section
+                else:
+                    text = page.get_text()
+                    # Detect section headers (simple heuristic)
+                    section = PDFParser._detect_section(text, page_num)
+                    segments = [{"section": section, "heading": None, "text": text}]
+                    headings = []
+                
+                yield {
+                    "page_number": page_num + 1,
+                    "text": text,
+                    "section": section,
+                    "segments": segments,
+                    "headings": headings
+                }
+        finally:
+            doc.close()
+    
+    @staticmethod
+    def count_pages(pdf_path: str) -> int:
+        """Return the page count without extracting any text"""
+        with fitz.open(pdf_path) as doc:
+            return len(doc)
     
     @staticmethod
     def _detect_section(text: str, page_num: int) -> str:
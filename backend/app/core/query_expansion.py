@@ -1,14 +1,63 @@
-from openai import OpenAI
+from collections import OrderedDict
+from openai import AsyncOpenAI
 from typing import List
+import threading
 from app.core.config import settings
+from app.core.executors import run_model
+from app.core.term_neighbors import term_neighbors
+from app.db.chroma import chroma_db
 
-client = OpenAI(api_key=settings.OPENAI_API_KEY)
+client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
 
 class QueryExpander:
-    """Expands user query into multiple variants for better retrieval"""
+    """
+    Expands user query into multiple variants for better retrieval
     
-    @staticmethod
-    async def expand_query(query: str, num_variants: int = 3) -> List[str]:
+    "local" mode swaps query terms for their embedding neighbours in the corpus
+    vocabulary (no LLM call); "llm" mode asks the chat model and keeps the
+    answers in an LRU so repeated questions are expanded once.
+    """
+    
+    def __init__(self, mode: str = "local", cache_size: int = 1024):
+        self.mode = mode
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[tuple, List[str]]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    async def expand_query(self, query: str, num_variants: int = 3) -> List[str]:
+        """
+        Generate query variants with the configured mode
+        
+        Returns:
+            List of query variants including original
+        """
+        if self.mode == "local":
+            try:
+                return await run_model(self.expand_locally, query, num_variants)
+            except Exception as e:
+                print(f"Local query expansion failed: {e}")
+                return [query]
+        
+        key = (" ".join(query.lower().split()), num_variants)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return list(self._cache[key])
+        
+        variants = await self.expand_with_llm(query, num_variants)
+        if len(variants) > 1:
+            with self._lock:
+                self._cache[key] = variants
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return list(variants)
+    
+    def expand_locally(self, query: str, num_variants: int = 3) -> List[str]:
+        """Swap query terms for corpus neighbours, first catching the term index up with the corpus"""
+        term_neighbors.refresh_if_changed(chroma_db.bm25)
+        return term_neighbors.expand(query, num_variants)
+    
+    async def expand_with_llm(self, query: str, num_variants: int = 3) -> List[str]:
         """
         Generate query variants using LLM
         
@@ -23,7 +72,7 @@ Original Question: {query}
 Provide {num_variants} variants, one per line, without numbering or extra formatting."""
 
         try:
-            response = client.chat.completions.create(
+            response = await client.chat.completions.create(
                 model=settings.OPENAI_MODEL,
                 messages=[
                     {"role": "system", "content": "You are a helpful research assistant."},
@@ -44,4 +93,8 @@ Provide {num_variants} variants, one per line, without numbering or extra format
             print(f"Query expansion failed: {e}")
             return [query]  # Fallback to original
 
-query_expander = QueryExpander()
+# Singleton instance
+query_expander = QueryExpander(
+    mode=settings.QUERY_EXPANSION_MODE,
+    cache_size=settings.QUERY_EXPANSION_CACHE_SIZE
+)
@@ -1,12 +1,139 @@
-from sentence_transformers import CrossEncoder
-from typing import List, Dict, Tuple
+from concurrent.futures import Future
+from typing import List, Dict, Optional, Tuple, TYPE_CHECKING
+import queue
+import threading
+import time
 from app.core.config import settings
 
+if TYPE_CHECKING:
+    from sentence_transformers import CrossEncoder
+
+class RerankBatcher:
+    """
+    Coalesces cross-encoder pairs from concurrent rerank calls into shared forward passes
+    
+    Callers block on a future while a single worker thread collects requests for
+    up to window_ms (or max_pairs pairs), sorts all pairs by token length so each
+    model batch holds similarly sized inputs, scores them, and hands each caller
+    back its own scores in the original order.
+    """
+    
+    def __init__(self, model: "CrossEncoder", window_ms: float = 5, max_pairs: int = 256, batch_size: int = 32):
+        self.model = model
+        self.window = window_ms / 1000
+        self.max_pairs = max_pairs
+        self.batch_size = batch_size
+        self.requests: "queue.Queue[Tuple[List[Tuple[str, str]], Future]]" = queue.Queue()
+        self.forward_passes = 0
+        self.pairs_scored = 0
+        self._worker = threading.Thread(target=self._loop, name="rerank-batcher", daemon=True)
+        self._worker.start()
+    
+    def score(self, pairs: List[Tuple[str, str]]) -> List[float]:
+        """Score (query, text) pairs; safe to call from many threads at once"""
+        if not pairs:
+            return []
+        future: Future = Future()
+        self.requests.put((pairs, future))
+        return future.result()
+    
+    def _loop(self):
+        while True:
+            batch = [self.requests.get()]
+            total = len(batch[0][0])
+            deadline = time.monotonic() + self.window
+            while total < self.max_pairs:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self.requests.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(request)
+                total += len(request[0])
+            self._run(batch)
+    
+    def _run(self, batch: List[Tuple[List[Tuple[str, str]], Future]]):
+        pairs = [pair for request_pairs, _ in batch for pair in request_pairs]
+        try:
+            order = sorted(range(len(pairs)), key=self._token_lengths(pairs).__getitem__)
+            sorted_scores = self.model.predict(
+                [pairs[i] for i in order],
+                batch_size=self.batch_size,
+                show_progress_bar=False
+            )
+            scores = [0.0] * len(pairs)
+            for position, index in enumerate(order):
+                scores[index] = float(sorted_scores[position])
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        
+        self.forward_passes += 1
+        self.pairs_scored += len(pairs)
+        
+        offset = 0
+        for request_pairs, future in batch:
+            future.set_result(scores[offset:offset + len(request_pairs)])
+            offset += len(request_pairs)
+    
+    def _token_lengths(self, pairs: List[Tuple[str, str]]) -> List[int]:
+        """Token counts per pair, falling back to character counts without a tokenizer"""
+        tokenizer = getattr(self.model, "tokenizer", None)
+        if tokenizer is None:
+            return [len(query) + len(text) for query, text in pairs]
+        encoded = tokenizer(
+            [query for query, _ in pairs],
+            [text for _, text in pairs],
+            truncation=True,
+            max_length=getattr(self.model, "max_length", None) or 512
+        )
+        return [len(ids) for ids in encoded["input_ids"]]
+
 class Reranker:
-    """Cross-encoder reranking for retrieved chunks"""
+    """
+    Cross-encoder reranking for retrieved chunks
+    
+    The model and the batching thread start on first use or by load().
+    """
     
     def __init__(self):
-        self.model = CrossEncoder(settings.RERANKER_MODEL)
+        self._model: Optional["CrossEncoder"] = None
+        self.batcher: Optional[RerankBatcher] = None
+        self._lock = threading.Lock()
+    
+    @property
+    def model(self) -> "CrossEncoder":
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    from app.core.onnx_backend import load_model
+                    model = load_model(
+                        "cross_encoder",
+                        settings.RERANKER_MODEL,
+                        settings.RERANKER_BACKEND,
+                        cache_dir=settings.ONNX_CACHE_DIR,
+                        threads=settings.ONNX_THREADS
+                    )
+                    if settings.RERANK_BATCHING_ENABLED:
+                        self.batcher = RerankBatcher(
+                            model,
+                            window_ms=settings.RERANK_BATCH_WINDOW_MS,
+                            max_pairs=settings.RERANK_MAX_BATCH_PAIRS,
+                            batch_size=settings.RERANK_MODEL_BATCH_SIZE
+                        )
+                    self._model = model
+        return self._model
+    
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+    
+    def load(self):
+        """Load the model now instead of on the first rerank"""
+        return self.model
     
     def rerank(self, query: str, chunks: List[Dict], top_k: int = 5) -> List[Tuple[Dict, float]]:
         """
@@ -18,8 +145,12 @@ class Reranker:
         # Prepare pairs for cross-encoder
         pairs = [(query, chunk["text"]) for chunk in chunks]
         
-        # Get scores
-        scores = self.model.predict(pairs)
+        # Get scores (coalesced with concurrent callers when batching is on)
+        model = self.model
+        if self.batcher is not None:
+            scores = self.batcher.score(pairs)
+        else:
+            scores = model.predict(pairs)
         
         # Normalize scores to 0-1 range (confidence)
         min_score = min(scores)
@@ -29,8 +160,11 @@ class Reranker:
             for score in scores
         ]
         
-        # Combine chunks with scores
-        chunk_scores = list(zip(chunks, normalized_scores))
+        # Combine chunks with scores, keeping the raw cross-encoder score for absolute thresholds
+        chunk_scores = [
+            ({**chunk, "rerank_score": float(raw_score)}, score)
+            for chunk, raw_score, score in zip(chunks, scores, normalized_scores)
+        ]
         
         # Sort by score descending
         chunk_scores.sort(key=lambda x: x[1], reverse=True)
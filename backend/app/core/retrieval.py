@@ -0,0 +1,150 @@
+from typing import Dict, List, Optional, Tuple
+import asyncio
+from app.db.chroma import chroma_db
+from app.core.reranker import reranker
+from app.core.embeddings import embedding_model
+from app.core.retrieval_cache import retrieval_cache
+from app.core.query_expansion import query_expander
+from app.core.executors import run_model, run_db
+from app.core.config import settings
+
+def reciprocal_rank_fusion(rankings: List[List[Dict]], k: int = 60, limit: Optional[int] = None) -> List[Dict]:
+    """
+    Merge ranked chunk lists by summing 1 / (k + rank) for each chunk_id
+    
+    Returns:
+        Chunks ordered by fused score, each with an rrf_score
+    """
+    scores: Dict[str, float] = {}
+    chunks: Dict[str, Dict] = {}
+    for ranking in rankings:
+        for rank, chunk in enumerate(ranking, start=1):
+            chunk_id = chunk["chunk_id"]
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (k + rank)
+            chunks.setdefault(chunk_id, chunk)
+    
+    ordered = sorted(scores, key=scores.get, reverse=True)[:limit]
+    return [{**chunks[chunk_id], "rrf_score": scores[chunk_id]} for chunk_id in ordered]
+
+def limit_per_paper(chunks: List[Dict], per_paper: int, limit: int) -> List[Dict]:
+    """First limit chunks of a ranking, keeping at most per_paper chunks from any one paper"""
+    taken: Dict[str, int] = {}
+    kept = []
+    for chunk in chunks:
+        if taken.get(chunk["paper_id"], 0) >= per_paper:
+            continue
+        taken[chunk["paper_id"]] = taken.get(chunk["paper_id"], 0) + 1
+        kept.append(chunk)
+        if len(kept) == limit:
+            break
+    return kept
+
+def candidate_counts(paper_ids: Optional[List[str]], per_paper: Optional[int] = None) -> Tuple[int, int, int]:
+    """
+    (candidates, per-paper limit, results to fetch) for a search over paper_ids
+    
+    Several papers get TOP_K_RETRIEVAL candidates each. When a per-paper limit
+    applies, twice as many results are fetched so papers beyond the dominant
+    one still fill the candidates after capping.
+    """
+    papers = len(paper_ids or [])
+    candidates = settings.TOP_K_RETRIEVAL * max(1, papers)
+    if per_paper is None:
+        per_paper = settings.RETRIEVAL_PER_PAPER_LIMIT
+    if papers < 2 or not per_paper or per_paper >= candidates:
+        return candidates, 0, candidates
+    return candidates, per_paper, candidates * 2
+
+async def dense_search(query_embeddings: List[List[float]], paper_ids: Optional[List[str]] = None,
+                       per_paper: Optional[int] = None) -> List[List[Dict]]:
+    """
+    Vector search for one or more query embeddings; one nearest-first list per embedding
+    
+    All selected papers are searched with one filtered query (paper_id $in
+    paper_ids), capped at per_paper chunks from any one paper.
+    """
+    candidates, per_paper, fetch = candidate_counts(paper_ids, per_paper)
+    rankings = await run_db(
+        chroma_db.query_batch,
+        query_embeddings=query_embeddings,
+        top_k=fetch,
+        paper_ids=paper_ids
+    )
+    if per_paper:
+        rankings = [limit_per_paper(ranking, per_paper, candidates) for ranking in rankings]
+    return rankings
+
+async def keyword_search(query: str, paper_ids: Optional[List[str]] = None, per_paper: Optional[int] = None) -> List[Dict]:
+    """BM25 search over the selected papers, with the same per-paper cap as dense_search"""
+    candidates, per_paper, fetch = candidate_counts(paper_ids, per_paper)
+    chunks = await run_db(chroma_db.keyword_query, query, top_k=fetch, paper_ids=paper_ids)
+    return limit_per_paper(chunks, per_paper, candidates) if per_paper else chunks
+
+async def retrieve(query: str, paper_ids: Optional[List[str]] = None, per_paper: Optional[int] = None) -> List[Tuple[Dict, float]]:
+    """
+    Embed, search and rerank: the pipeline shared by retrieve_tool and the fast path
+    
+    Dense search can be combined with BM25 (RETRIEVAL_MODE=hybrid) and with query
+    variants (MULTI_QUERY_ENABLED); the ranked lists are fused with RRF and the
+    fused candidates are reranked once against the original query. per_paper
+    overrides RETRIEVAL_PER_PAPER_LIMIT when searching several papers.
+    
+    Returns:
+        List of (chunk, score) tuples, best first
+    """
+    cache_key = retrieval_cache.make_key(
+        query,
+        paper_ids,
+        top_k=settings.TOP_K_RETRIEVAL,
+        top_n=settings.TOP_K_RERANKED,
+        mode=settings.RETRIEVAL_MODE,
+        per_paper=settings.RETRIEVAL_PER_PAPER_LIMIT if per_paper is None else per_paper,
+        multi_query=settings.MULTI_QUERY_ENABLED and settings.QUERY_EXPANSION_MODE
+    )
+    cache_generation = retrieval_cache.generation
+    if settings.RETRIEVAL_CACHE_ENABLED:
+        cached = retrieval_cache.get(cache_key)
+        if cached is not None:
+            print("---RETRIEVAL CACHE HIT---")
+            return cached
+    
+    hybrid = settings.RETRIEVAL_MODE == "hybrid"
+    if hybrid:
+        # The keyword search does not need the embedding, so it runs while the query is encoded
+        keyword_ranking = asyncio.ensure_future(keyword_search(query, paper_ids, per_paper))
+    
+    if settings.MULTI_QUERY_ENABLED:
+        queries = list(dict.fromkeys(await query_expander.expand_query(query, settings.NUM_QUERY_VARIANTS)))
+    else:
+        queries = [query]
+    # All variants in one encoder batch and one vector search
+    query_embeddings = await run_model(embedding_model.embed_batch, queries, show_progress_bar=False)
+    
+    rankings = await dense_search(query_embeddings, paper_ids, per_paper)
+    if hybrid:
+        rankings.append(await keyword_ranking)
+    
+    if len(rankings) > 1:
+        # Keep the reranker's workload the same as single-query dense retrieval
+        chunks = reciprocal_rank_fusion(
+            rankings,
+            k=settings.RRF_K,
+            limit=settings.TOP_K_RETRIEVAL * max(1, len(paper_ids or []))
+        )
+    else:
+        chunks = rankings[0]
+    
+    if not chunks:
+        return []
+    
+    reranked_chunks = await run_model(
+        reranker.rerank,
+        query=query,
+        chunks=chunks,
+        top_k=settings.TOP_K_RERANKED
+    )
+    
+    if settings.RETRIEVAL_CACHE_ENABLED:
+        retrieval_cache.set(cache_key, reranked_chunks, generation=cache_generation)
+    
+    return reranked_chunks
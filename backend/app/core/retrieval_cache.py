@@ -0,0 +1,117 @@
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+import copy
+import re
+import threading
+import time
+from app.core.config import settings
+
+class RetrievalCache:
+    """
+    TTL + LRU cache of reranked retrieval results
+    
+    Entries are keyed on the normalized query, the paper filter and the top-k
+    settings. Each entry remembers which papers it was scoped to, so ingesting
+    or deleting a paper only invalidates the entries that could have changed:
+    those scoped to that paper and every corpus-wide (unscoped) entry.
+    """
+    
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.entries: "OrderedDict[Tuple, Tuple[float, Any]]" = OrderedDict()
+        self.by_paper: Dict[str, Set[Tuple]] = {}
+        self.unscoped: Set[Tuple] = set()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        # Bumped on every invalidation so results computed before it are not stored after it
+        self.generation = 0
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        """Lowercase, collapse whitespace and drop trailing punctuation"""
+        query = re.sub(r"\s+", " ", query.strip().lower())
+        return query.rstrip("?!. ")
+    
+    def make_key(self, query: str, paper_ids: Optional[Iterable[str]], **params) -> Tuple:
+        scope = tuple(sorted(set(paper_ids))) if paper_ids else None
+        return (self.normalize_query(query), scope, tuple(sorted(params.items())))
+    
+    def get(self, key: Tuple) -> Optional[Any]:
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None or time.monotonic() - entry[0] > self.ttl_seconds:
+                if entry is not None:
+                    self._discard(key)
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return copy.deepcopy(entry[1])
+    
+    def set(self, key: Tuple, value: Any, generation: Optional[int] = None):
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            if key in self.entries:
+                self._discard(key)
+            self.entries[key] = (time.monotonic(), copy.deepcopy(value))
+            scope = key[1]
+            if scope is None:
+                self.unscoped.add(key)
+            else:
+                for paper_id in scope:
+                    self.by_paper.setdefault(paper_id, set()).add(key)
+            
+            while len(self.entries) > self.max_entries:
+                self._discard(next(iter(self.entries)))
+    
+    def invalidate_paper(self, paper_id: str):
+        """Drop entries that could include results from paper_id"""
+        with self._lock:
+            keys = self.by_paper.pop(paper_id, set()) | self.unscoped
+            for key in keys:
+                self._discard(key)
+            self.invalidations += len(keys)
+            self.generation += 1
+    
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self.entries.clear()
+            self.by_paper.clear()
+            self.unscoped.clear()
+    
+    def stats(self) -> Dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "entries": len(self.entries),
+                "invalidations": self.invalidations,
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds
+            }
+    
+    def _discard(self, key: Tuple):
+        self.entries.pop(key, None)
+        scope = key[1]
+        if scope is None:
+            self.unscoped.discard(key)
+            return
+        for paper_id in scope:
+            keys = self.by_paper.get(paper_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.by_paper[paper_id]
+
+# Singleton instance
+retrieval_cache = RetrievalCache(
+    max_entries=settings.RETRIEVAL_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.RETRIEVAL_CACHE_TTL_SECONDS
+)
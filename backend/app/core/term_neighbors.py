@@ -0,0 +1,168 @@
+from typing import Callable, Dict, List, Optional, Tuple
+import os
+import re
+import threading
+import numpy as np
+from app.core.config import settings
+from app.db.bm25 import BM25Index, tokenize
+
+class TermNeighborIndex:
+    """
+    Embedding neighbours of corpus terms, for LLM-free query expansion
+    
+    The vocabulary comes from the BM25 index's document frequencies: terms that
+    occur in at least min_df chunks but are not near-universal, capped at
+    vocab_size. Each term is embedded once (new terms only on refresh), and
+    query terms are expanded with their nearest vocabulary terms. Expansion
+    refreshes first if the BM25 index changed, so ingestion does no work here
+    unless multi-query retrieval is actually used.
+    """
+    
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        vocab_size: int = 20_000,
+        min_df: int = 2,
+        min_similarity: float = 0.6,
+        embed: Optional[Callable[[List[str]], List[List[float]]]] = None
+    ):
+        self.path = path
+        self.vocab_size = vocab_size
+        self.min_df = min_df
+        self.min_similarity = min_similarity
+        self._embed = embed
+        self.terms: List[str] = []
+        self.vectors = np.zeros((0, 0), dtype=np.float32)
+        self._loaded = False
+        self._version: Optional[int] = None  # BM25Index.version of the last refresh in this process
+        self._lock = threading.Lock()
+    
+    def embed(self, texts: List[str]) -> np.ndarray:
+        if self._embed is None:
+            from app.core.embeddings import embedding_model
+            self._embed = lambda batch: embedding_model.embed_batch(batch, show_progress_bar=False)
+        vectors = np.asarray(self._embed(texts), dtype=np.float32)
+        return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    
+    def refresh(self, bm25: BM25Index):
+        """Recompute the vocabulary from corpus statistics, embedding only terms not seen before"""
+        with self._lock:
+            self._refresh(bm25)
+    
+    def refresh_if_changed(self, bm25: BM25Index):
+        """Refresh unless nothing changed in the BM25 index since the last refresh in this process"""
+        with self._lock:
+            if self._version != bm25.version:
+                self._refresh(bm25)
+    
+    def _refresh(self, bm25: BM25Index):
+        self._load()
+        version = bm25.version
+        vocabulary = self._select_vocabulary(bm25)
+        known = {term: row for row, term in enumerate(self.terms)}
+        new_terms = [term for term in vocabulary if term not in known]
+        new_vectors = self.embed(new_terms) if new_terms else None
+        
+        rows = []
+        for term in vocabulary:
+            if term in known:
+                rows.append(self.vectors[known[term]])
+        if new_vectors is not None:
+            rows.extend(new_vectors)
+        self.terms = [term for term in vocabulary if term in known] + new_terms
+        self.vectors = np.vstack(rows).astype(np.float32) if rows else np.zeros((0, 0), dtype=np.float32)
+        self._save()
+        self._version = version
+    
+    def neighbors(self, terms: List[str], top_n: int = 3) -> Dict[str, List[Tuple[str, float]]]:
+        """Nearest vocabulary terms for each query term, above min_similarity"""
+        with self._lock:
+            self._load()
+            vocabulary, vectors = self.terms, self.vectors
+        if not terms or not vocabulary:
+            return {}
+        
+        similarities = self.embed(terms) @ vectors.T
+        result = {}
+        for term, row in zip(terms, similarities):
+            candidates = np.argsort(-row)[:top_n + 5]
+            result[term] = [
+                (vocabulary[i], float(row[i]))
+                for i in candidates
+                if row[i] >= self.min_similarity and not self._same_word(term, vocabulary[i])
+            ][:top_n]
+        return result
+    
+    def expand(self, query: str, num_variants: int = 3) -> List[str]:
+        """
+        Query variants that each swap one query term for a close corpus term
+        
+        Returns:
+            List of query variants including original
+        """
+        terms = [term for term in dict.fromkeys(tokenize(query)) if len(term) >= 3 and not term.isdigit()]
+        substitutions = []
+        for term, neighbors in self.neighbors(terms).items():
+            substitutions.extend((similarity, term, neighbor) for neighbor, similarity in neighbors)
+        substitutions.sort(reverse=True)
+        
+        variants = [query]
+        for _, term, neighbor in substitutions:
+            if len(variants) > num_variants:
+                break
+            variant = re.sub(rf"(?<![\w-]){re.escape(term)}(?![\w-])", neighbor, query, flags=re.IGNORECASE)
+            if variant not in variants:
+                variants.append(variant)
+        return variants
+    
+    def stats(self) -> Dict:
+        with self._lock:
+            self._load()
+            return {"terms": len(self.terms)}
+    
+    def _select_vocabulary(self, bm25: BM25Index) -> List[str]:
+        document_frequencies = bm25.document_frequencies()
+        total_docs = max(len(bm25), 1)
+        # Terms in most chunks of a large corpus carry no topical signal
+        max_df = total_docs * 0.5 if total_docs >= 20 else total_docs
+        candidates = [
+            (df, term)
+            for term, df in document_frequencies.items()
+            if self.min_df <= df <= max_df and len(term) >= 3 and any(c.isalpha() for c in term)
+        ]
+        candidates.sort(reverse=True)
+        return [term for _, term in candidates[:self.vocab_size]]
+    
+    @staticmethod
+    def _same_word(a: str, b: str) -> bool:
+        """Plural/inflection variants add nothing the embedding search does not already match"""
+        return a == b or a.startswith(b) or b.startswith(a)
+    
+    def _load(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        if self.path and os.path.exists(self.path):
+            try:
+                data = np.load(self.path, allow_pickle=False)
+                self.terms = [str(term) for term in data["terms"]]
+                self.vectors = data["vectors"].astype(np.float32)
+            except Exception as e:
+                print(f"Could not load term index from {self.path}: {e}")
+    
+    def _save(self):
+        if not self.path:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.path}.tmp.npz"
+        np.savez(temp_path, terms=np.array(self.terms, dtype=str), vectors=self.vectors)
+        os.replace(temp_path, self.path)
+
+# Singleton instance
+term_neighbors = TermNeighborIndex(
+    path=settings.TERM_INDEX_PATH,
+    vocab_size=settings.TERM_VOCAB_SIZE,
+    min_similarity=settings.TERM_NEIGHBOR_MIN_SIMILARITY
+)
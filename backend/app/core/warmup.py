@@ -0,0 +1,121 @@
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+import asyncio
+import threading
+import time
+from app.core.config import settings
+from app.core.embeddings import embedding_model
+from app.core.reranker import reranker
+from app.core.executors import run_model, run_db
+from app.db.chroma import chroma_db
+from app.db.registry import paper_registry
+
+_registry_lock = threading.Lock()
+_registry_checked = False
+_agent_graph_loaded = False
+
+def register_existing_papers():
+    """
+    Register papers ingested before the registry existed
+    
+    Runs once per process: at startup in the background, and awaited by the
+    paper list so it is never served from an unfilled registry. The vector
+    store is only opened when the registry is empty.
+    """
+    global _registry_checked
+    if _registry_checked:
+        return
+    with _registry_lock:
+        if _registry_checked:
+            return
+        if paper_registry.count() == 0 and chroma_db.store.count() > 0:
+            added = paper_registry.backfill(chroma_db, settings.UPLOAD_DIR)
+            print(f"---REGISTERED {added} EXISTING PAPERS---")
+        _registry_checked = True
+
+def load_vector_store():
+    """Open the vector store and the BM25 index, registering papers ingested before the registry existed"""
+    chroma_db.load()
+    register_existing_papers()
+
+def load_agent_graph():
+    """Import LangGraph/LangChain and build the LLM clients and the compiled agent graph"""
+    global _agent_graph_loaded
+    from app.agents import graph  # noqa: F401
+    _agent_graph_loaded = True
+
+class Warmup:
+    """
+    Loads models, the vector store and the agent graph in parallel
+    
+    Each component also loads itself on first use; warming up moves that cost
+    from the first request to startup (WARMUP_ON_STARTUP) or to an explicit
+    POST /warmup. The models load on the model pool, the rest on the DB pool.
+    """
+    
+    def __init__(self):
+        # name -> (executor, load, is_loaded)
+        self.components: Dict[str, Tuple[Callable[..., Awaitable], Callable, Callable[[], bool]]] = {
+            "embedding_model": (run_model, embedding_model.load, lambda: embedding_model.loaded),
+            "reranker": (run_model, reranker.load, lambda: reranker.loaded),
+            "vector_store": (run_db, load_vector_store, lambda: chroma_db.loaded),
+            "agent_graph": (run_db, load_agent_graph, lambda: _agent_graph_loaded),
+        }
+        self.loading: set = set()
+        self.errors: Dict[str, str] = {}
+        self.seconds: Dict[str, float] = {}
+        self._task: Optional[asyncio.Task] = None
+    
+    def start(self) -> asyncio.Task:
+        """Start loading in the background, unless a warmup is already running"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self.run())
+        return self._task
+    
+    async def run(self) -> Dict:
+        await asyncio.gather(*[self._load(name) for name in self.components])
+        return self.report()
+    
+    async def _load(self, name: str):
+        run, load, is_loaded = self.components[name]
+        if is_loaded() or name in self.loading:
+            return
+        self.loading.add(name)
+        self.errors.pop(name, None)
+        started = time.perf_counter()
+        try:
+            await run(load)
+            self.seconds[name] = round(time.perf_counter() - started, 3)
+            print(f"---LOADED {name.upper()} IN {self.seconds[name]:.1f}s---")
+        except Exception as e:
+            self.errors[name] = str(e)
+            print(f"---FAILED TO LOAD {name.upper()}: {e}---")
+        finally:
+            self.loading.discard(name)
+    
+    def status(self, name: str) -> str:
+        if self.components[name][2]():
+            return "ready"
+        if name in self.loading:
+            return "loading"
+        return "failed" if name in self.errors else "pending"
+    
+    def ready(self) -> bool:
+        return all(self.status(name) == "ready" for name in self.components)
+    
+    def report(self) -> Dict:
+        """
+        Readiness of every component
+        
+        Returns:
+            {ready, components: {name: {status, seconds, error}}}
+        """
+        return {
+            "ready": self.ready(),
+            "components": {
+                name: {"status": self.status(name), "seconds": self.seconds.get(name), "error": self.errors.get(name)}
+                for name in self.components
+            }
+        }
+
+# Singleton instance
+warmup = Warmup()
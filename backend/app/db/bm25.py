@@ -0,0 +1,298 @@
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import fcntl
+import heapq
+import json
+import math
+import os
+import pickle
+import re
+import threading
+
+TOKEN_PATTERN = re.compile(r"\w+(?:[-.]\w+)*")
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "do", "does", "for", "from", "how", "in", "is",
+    "it", "its", "of", "on", "or", "that", "the", "this", "to", "was", "we", "were", "what", "which",
+    "with", "who", "why", "paper", "section"
+}
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercased terms for exact matching
+    
+    Compound tokens such as "gpt-4", "bleu-4" or "2301.12345" are kept whole and
+    also split into their parts, so both spellings of a name match.
+    """
+    terms = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token not in STOPWORDS:
+            terms.append(token)
+        if "-" in token or "." in token:
+            terms.extend(part for part in re.split(r"[-.]", token) if part and part not in STOPWORDS)
+    return terms
+
+def _changes(record: Dict) -> int:
+    """Number of chunks a log record adds or removes"""
+    return len(record.get("add", ())) + len(record.get("remove", ()))
+
+class BM25Index:
+    """
+    Incrementally updatable BM25 inverted index over chunk texts
+    
+    Maintained next to the vector store: chunks are added on ingest and removed
+    on delete. On disk it is a pickled snapshot plus an append-only JSONL log of
+    the changes since, so save() writes only what changed; the snapshot is
+    rewritten once the log holds more than compact_ratio changes per indexed
+    chunk. Processes sharing the files (the API server and app.ingest_bulk)
+    replay each other's log lines before saving and before searching, under a
+    file lock, so neither overwrites the other's chunks.
+    """
+    
+    def __init__(self, path: Optional[str] = None, k1: float = 1.5, b: float = 0.75, compact_ratio: float = 0.5):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.compact_ratio = compact_ratio
+        self.postings: Dict[str, Dict[str, int]] = {}  # term -> {chunk_id: term frequency}
+        self.doc_terms: Dict[str, Dict[str, int]] = {}  # chunk_id -> {term: term frequency}
+        self.doc_length: Dict[str, int] = {}
+        self.doc_paper: Dict[str, str] = {}
+        self.paper_docs: Dict[str, Set[str]] = {}
+        self.total_length = 0
+        self.version = 0  # bumped on every change, so derived indexes can tell they are out of date
+        self._lock = threading.RLock()
+        # Changes not yet in the log, as log records
+        self._pending: List[Dict] = []
+        # Where this copy is relative to the files: snapshot inode, bytes of log replayed, changes in the log
+        self._snapshot_inode: Optional[int] = None
+        self._log_offset = 0
+        self._log_changes = 0
+    
+    def __len__(self) -> int:
+        return len(self.doc_terms)
+    
+    def add(self, chunks: Iterable[Dict]):
+        """Index (or re-index) chunks with chunk_id, text and paper_id"""
+        record = {"add": [[chunk["chunk_id"], chunk["paper_id"], dict(Counter(tokenize(chunk["text"])))] for chunk in chunks]}
+        with self._lock:
+            self._apply(record)
+            if self.path and _changes(record):
+                self._pending.append(record)
+    
+    def remove(self, chunk_ids: Iterable[str]):
+        record = {"remove": list(chunk_ids)}
+        with self._lock:
+            self._apply(record)
+            if self.path and _changes(record):
+                self._pending.append(record)
+    
+    def remove_paper(self, paper_id: str):
+        with self._lock:
+            self.remove(list(self.paper_docs.get(paper_id, ())))
+    
+    def search(self, query: str, top_k: int = 20, paper_ids: Optional[Iterable[str]] = None) -> List[Tuple[str, float]]:
+        """
+        Score chunks against the query terms
+        
+        Returns:
+            List of (chunk_id, score) tuples, best first
+        """
+        self.refresh()
+        with self._lock:
+            total_docs = len(self.doc_terms)
+            if total_docs == 0:
+                return []
+            allowed = set(paper_ids) if paper_ids else None
+            average_length = self.total_length / total_docs
+            scores: Dict[str, float] = {}
+            
+            for term in set(tokenize(query)):
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (total_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for chunk_id, frequency in postings.items():
+                    if allowed is not None and self.doc_paper[chunk_id] not in allowed:
+                        continue
+                    norm = self.k1 * (1 - self.b + self.b * self.doc_length[chunk_id] / average_length)
+                    scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+            
+            return heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+    
+    def document_frequencies(self) -> Dict[str, int]:
+        """Number of chunks containing each term"""
+        with self._lock:
+            return {term: len(postings) for term, postings in self.postings.items()}
+    
+    def save(self):
+        """Append the changes made since the last save to the log (no-op if there are none)"""
+        if not self.path:
+            return
+        with self._lock, self._file_lock(fcntl.LOCK_EX):
+            self._sync()
+            if not self._pending:
+                return
+            changes = sum(_changes(record) for record in self._pending)
+            if self._log_changes + changes > self.compact_ratio * max(len(self.doc_terms), 1):
+                self._compact()
+                return
+            data = "".join(json.dumps(record) + "\n" for record in self._pending).encode("utf-8")
+            with open(self._log_path, "ab") as log:
+                if log.tell() != self._log_offset:
+                    log.truncate(self._log_offset)  # drop a partial line left by a crashed writer
+                log.write(data)
+            self._log_offset += len(data)
+            self._log_changes += changes
+            self._pending = []
+    
+    def compact(self):
+        """Write this copy as the new snapshot and empty the log, replacing whatever is on disk"""
+        if not self.path:
+            return
+        with self._lock, self._file_lock(fcntl.LOCK_EX):
+            self._compact()
+    
+    def refresh(self):
+        """Pick up changes other processes saved since this copy last read the files"""
+        if not self.path:
+            return
+        try:
+            inode = os.stat(self.path).st_ino
+            log_size = os.path.getsize(self._log_path)
+        except FileNotFoundError:
+            inode, log_size = None, 0
+        if inode == self._snapshot_inode and log_size == self._log_offset:
+            return
+        with self._lock, self._file_lock(fcntl.LOCK_SH):
+            self._sync()
+    
+    @classmethod
+    def load(cls, path: str) -> Optional["BM25Index"]:
+        """Load a saved index, or None if there is none (or it is unreadable)"""
+        if not os.path.exists(path) and not os.path.exists(f"{path}.log"):
+            return None
+        index = cls(path)
+        try:
+            with index._lock, index._file_lock(fcntl.LOCK_SH):
+                index._sync()
+        except Exception as e:
+            print(f"Could not load BM25 index from {path}: {e}")
+            return None
+        return index
+    
+    @property
+    def _log_path(self) -> str:
+        return f"{self.path}.log"
+    
+    @contextmanager
+    def _file_lock(self, mode: int):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(f"{self.path}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, mode)
+            yield
+    
+    def _sync(self):
+        """Replay snapshot and log changes written by other processes, then this copy's unsaved ones (file lock held)"""
+        try:
+            inode = os.stat(self.path).st_ino
+        except FileNotFoundError:
+            inode = None
+        reloaded = inode != self._snapshot_inode
+        if reloaded:
+            self._load_snapshot(inode)
+        try:
+            with open(self._log_path, "rb") as log:
+                log.seek(self._log_offset)
+                data = log.read()
+        except FileNotFoundError:
+            data = b""
+        # Only complete lines; a writer that crashed mid-line leaves a partial one
+        end = data.rfind(b"\n") + 1
+        records = [json.loads(line) for line in data[:end].splitlines()]
+        self._log_offset += end
+        for record in records:
+            self._apply(record)
+            self._log_changes += _changes(record)
+        if reloaded or records:
+            # Unsaved changes were made after anything already on disk, so they win
+            for record in self._pending:
+                self._apply(record)
+    
+    def _load_snapshot(self, inode: Optional[int]):
+        self.postings, self.doc_terms, self.doc_length, self.doc_paper, self.paper_docs = {}, {}, {}, {}, {}
+        self.total_length = 0
+        if inode is not None:
+            with open(self.path, "rb") as f:
+                state = pickle.load(f)
+            self.postings = state["postings"]
+            self.doc_terms = state["doc_terms"]
+            self.doc_paper = state["doc_paper"]
+            self.total_length = state["total_length"]
+            for chunk_id, paper_id in self.doc_paper.items():
+                self.paper_docs.setdefault(paper_id, set()).add(chunk_id)
+                self.doc_length[chunk_id] = sum(self.doc_terms[chunk_id].values())
+        self._snapshot_inode = inode
+        self._log_offset = 0
+        self._log_changes = 0
+        self.version += 1
+    
+    def _compact(self):
+        state = {
+            "postings": self.postings,
+            "doc_terms": self.doc_terms,
+            "doc_paper": self.doc_paper,
+            "total_length": self.total_length
+        }
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, self.path)
+        open(self._log_path, "wb").close()
+        self._snapshot_inode = os.stat(self.path).st_ino
+        self._log_offset = 0
+        self._log_changes = 0
+        self._pending = []
+    
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "chunks": len(self.doc_terms),
+                "papers": len(self.paper_docs),
+                "terms": len(self.postings)
+            }
+    
+    def _apply(self, record: Dict):
+        """Apply one change: {"add": [[chunk_id, paper_id, {term: frequency}], ...]} or {"remove": [chunk_id, ...]}"""
+        for chunk_id, paper_id, terms in record.get("add", ()):
+            if chunk_id in self.doc_terms:
+                self._remove(chunk_id)
+            self.doc_terms[chunk_id] = terms
+            self.doc_length[chunk_id] = sum(terms.values())
+            self.doc_paper[chunk_id] = paper_id
+            self.paper_docs.setdefault(paper_id, set()).add(chunk_id)
+            self.total_length += self.doc_length[chunk_id]
+            for term, frequency in terms.items():
+                self.postings.setdefault(term, {})[chunk_id] = frequency
+        for chunk_id in record.get("remove", ()):
+            if chunk_id in self.doc_terms:
+                self._remove(chunk_id)
+        self.version += 1
+    
+    def _remove(self, chunk_id: str):
+        terms = self.doc_terms.pop(chunk_id)
+        paper_id = self.doc_paper.pop(chunk_id)
+        paper_chunks = self.paper_docs.get(paper_id)
+        if paper_chunks is not None:
+            paper_chunks.discard(chunk_id)
+            if not paper_chunks:
+                del self.paper_docs[paper_id]
+        self.total_length -= self.doc_length.pop(chunk_id)
+        for term in terms:
+            postings = self.postings[term]
+            del postings[chunk_id]
+            if not postings:
+                del self.postings[term]
@@ -1,75 +1,196 @@
-import chromadb
-from chromadb.config import Settings as ChromaSettings
 from typing import List, Dict, Optional
 from app.core.config import settings
-from app.core.embeddings import embedding_model
-import os
+from app.db.bm25 import BM25Index
+from app.db.vector_store import ChromaVectorStore, VectorStore
+import threading
 
 class ChromaDBManager:
-    """Manages ChromaDB vector store"""
+    """
+    Manages the vector store: ChromaDB, the flat memory-mapped index or the IVF index (VECTOR_STORE)
+    
+    The store is opened on first use or by load().
+    """
     
     def __init__(self):
-        # Create persist directory if it doesn't exist
-        os.makedirs(settings.CHROMA_PERSIST_DIR, exist_ok=True)
+        self._store: Optional[VectorStore] = None
+        self._store_lock = threading.Lock()
         
-        self.client = chromadb.PersistentClient(
-            path=settings.CHROMA_PERSIST_DIR,
-            settings=ChromaSettings(anonymized_telemetry=False)
-        )
+        # Sparse keyword index kept in step with the store, loaded on first use
+        self._bm25: Optional[BM25Index] = None
+        self._bm25_lock = threading.Lock()
+    
+    @property
+    def store(self) -> VectorStore:
+        if self._store is None:
+            with self._store_lock:
+                if self._store is None:
+                    self._store = self._open_store()
+        return self._store
+    
+    @property
+    def loaded(self) -> bool:
+        return self._store is not None and self._bm25 is not None
+    
+    def load(self):
+        """Open the store and load the BM25 index now instead of on first use"""
+        return self.store, self.bm25
+    
+    def _open_store(self) -> VectorStore:
+        if settings.VECTOR_STORE == "chroma":
+            return ChromaVectorStore(settings.CHROMA_PERSIST_DIR, settings.CHROMA_COLLECTION)
+        if settings.VECTOR_STORE == "flat":
+            from app.db.flat_store import FlatVectorStore
+            return FlatVectorStore(settings.FLAT_STORE_DIR)
+        if settings.VECTOR_STORE == "ivf":
+            from app.db.ivf_store import IVFVectorStore
+            return IVFVectorStore(
+                settings.IVF_STORE_DIR,
+                nlist=settings.IVF_NLIST,
+                nprobe=settings.IVF_NPROBE,
+                rescore=settings.IVF_RESCORE,
+                min_train=settings.IVF_MIN_TRAIN
+            )
+        raise ValueError(f"Unknown vector store: {settings.VECTOR_STORE} (expected chroma, flat or ivf)")
+    
+    @property
+    def bm25(self) -> BM25Index:
+        if self._bm25 is None:
+            with self._bm25_lock:
+                if self._bm25 is None:
+                    self._bm25 = self._load_bm25()
+        return self._bm25
+    
+    def _load_bm25(self) -> BM25Index:
+        """Load the saved BM25 index, rebuilding it from the vector store if missing or stale"""
+        index = BM25Index.load(settings.BM25_INDEX_PATH)
+        if index is not None and len(index) == self.store.count():
+            return index
         
-        # Get or create collection
-        self.collection = self.client.get_or_create_collection(
-            name=settings.CHROMA_COLLECTION,
-            metadata={"hnsw:space": "cosine"}
-        )
+        print(f"---REBUILDING BM25 INDEX FROM {settings.VECTOR_STORE.upper()} STORE---")
+        index = BM25Index(settings.BM25_INDEX_PATH)
+        offset = 0
+        while True:
+            results = self.store.get(include=["documents", "metadatas"], limit=5000, offset=offset)
+            if not results["ids"]:
+                break
+            index.add(
+                {"chunk_id": chunk_id, "text": text, "paper_id": metadata["paper_id"]}
+                for chunk_id, text, metadata in zip(results["ids"], results["documents"], results["metadatas"])
+            )
+            offset += len(results["ids"])
+        index.compact()
+        return index
+    
+    def save_sparse_index(self):
+        """Persist the BM25 index (no-op if unchanged or never loaded)"""
+        if self._bm25 is not None:
+            self._bm25.save()
+    
+    def save(self):
+        """Persist the BM25 index and anything the vector store holds in memory"""
+        self.save_sparse_index()
+        if self._store is not None:
+            self._store.save()
     
     def add_chunks(self, chunks: List[Dict], embeddings: List[List[float]]):
-        """Add chunks with embeddings to ChromaDB"""
+        """Add (or overwrite) chunks with embeddings in the vector store"""
         ids = [chunk["chunk_id"] for chunk in chunks]
         documents = [chunk["text"] for chunk in chunks]
-        metadatas = [
-            {
+        metadatas = []
+        for chunk in chunks:
+            metadata = {
                 "page_number": chunk["page_number"],
                 "section": chunk["section"],
                 "paper_id": chunk["paper_id"]
             }
-            for chunk in chunks
-        ]
+            # Content hashes drive deduplication; Chroma rejects None values
+            for key in ("chunk_hash", "file_hash", "source_id", "heading"):
+                if chunk.get(key):
+                    metadata[key] = chunk[key]
+            metadatas.append(metadata)
         
-        self.collection.add(
+        self.store.upsert(
             ids=ids,
             embeddings=embeddings,
             documents=documents,
             metadatas=metadatas
         )
+        self.bm25.add(chunks)
     
     def query(self, query_embedding: List[float], top_k: int = 20, paper_id: Optional[str] = None) -> List[Dict]:
-        """Query ChromaDB for similar chunks"""
-        where_filter = {"paper_id": paper_id} if paper_id else None
+        """Query the vector store for similar chunks"""
+        return self.query_batch([query_embedding], top_k=top_k, paper_ids=[paper_id] if paper_id else None)[0]
+    
+    def query_batch(self, query_embeddings: List[List[float]], top_k: int = 20, paper_ids: Optional[List[str]] = None) -> List[List[Dict]]:
+        """
+        Query the vector store with several embeddings in one call; returns one ranked list per embedding
+        
+        paper_ids restricts the search to those papers with a single metadata filter.
+        """
+        where_filter = self._paper_filter(paper_ids)
         
-        results = self.collection.query(
-            query_embeddings=[query_embedding],
+        results = self.store.query(
+            query_embeddings=query_embeddings,
             n_results=top_k,
             where=where_filter
         )
         
         # Format results
+        rankings = []
+        for q in range(len(results["ids"])):
+            chunks = []
+            for i in range(len(results["ids"][q])):
+                chunks.append({
+                    "chunk_id": results["ids"][q][i],
+                    "text": results["documents"][q][i],
+                    "page_number": results["metadatas"][q][i]["page_number"],
+                    "section": results["metadatas"][q][i]["section"],
+                    "paper_id": results["metadatas"][q][i]["paper_id"],
+                    "distance": results["distances"][q][i] if "distances" in results else 0
+                })
+            rankings.append(chunks)
+        
+        return rankings
+    
+    def keyword_query(self, query: str, top_k: int = 20, paper_ids: Optional[List[str]] = None) -> List[Dict]:
+        """Query the BM25 index for exact-term matches"""
+        hits = self.bm25.search(query, top_k=top_k, paper_ids=paper_ids)
+        if not hits:
+            return []
+        
+        results = self.store.get(ids=[chunk_id for chunk_id, _ in hits], include=["documents", "metadatas"])
+        found = {
+            chunk_id: (text, metadata)
+            for chunk_id, text, metadata in zip(results["ids"], results["documents"], results["metadatas"])
+        }
+        
         chunks = []
-        for i in range(len(results["ids"][0])):
+        for chunk_id, score in hits:
+            if chunk_id not in found:
+                continue
+            text, metadata = found[chunk_id]
             chunks.append({
-                "chunk_id": results["ids"][0][i],
-                "text": results["documents"][0][i],
-                "page_number": results["metadatas"][0][i]["page_number"],
-                "section": results["metadatas"][0][i]["section"],
-                "paper_id": results["metadatas"][0][i]["paper_id"],
-                "distance": results["distances"][0][i] if "distances" in results else 0
+                "chunk_id": chunk_id,
+                "text": text,
+                "page_number": metadata["page_number"],
+                "section": metadata["section"],
+                "paper_id": metadata["paper_id"],
+                "bm25_score": score
             })
         
         return chunks
     
+    @staticmethod
+    def _paper_filter(paper_ids: Optional[List[str]]) -> Optional[Dict]:
+        if not paper_ids:
+            return None
+        if len(paper_ids) == 1:
+            return {"paper_id": paper_ids[0]}
+        return {"paper_id": {"$in": list(paper_ids)}}
+    
     def get_paper_chunks(self, paper_id: str) -> List[Dict]:
         """Get all chunks for a specific paper"""
-        results = self.collection.get(
+        results = self.store.get(
             where={"paper_id": paper_id}
         )
         
@@ -87,19 +208,61 @@ class ChromaDBManager:
     
     def delete_paper(self, paper_id: str):
         """Delete all chunks for a paper"""
-        self.collection.delete(
+        self.store.delete(
             where={"paper_id": paper_id}
         )
+        self.bm25.remove_paper(paper_id)
+    
+    def delete_chunks(self, chunk_ids: List[str]):
+        """Delete chunks by id"""
+        if chunk_ids:
+            self.store.delete(ids=chunk_ids)
+            self.bm25.remove(chunk_ids)
+    
+    def get_chunk_ids(self, paper_id: str) -> List[str]:
+        """Get the ids of all chunks for a paper without fetching text or metadata"""
+        results = self.store.get(
+            where={"paper_id": paper_id},
+            include=[]
+        )
+        return results["ids"]
+    
+    def find_paper(self, **metadata) -> Optional[str]:
+        """Return the paper_id of any chunk matching a single metadata field (e.g. file_hash)"""
+        (key, value), = metadata.items()
+        results = self.store.get(
+            where={key: value},
+            limit=1,
+            include=["metadatas"]
+        )
+        if not results["ids"]:
+            return None
+        return results["metadatas"][0]["paper_id"]
+    
+    def get_embeddings_by_hash(self, chunk_hashes: List[str]) -> Dict[str, List[float]]:
+        """Look up stored embeddings for chunk texts that are already indexed"""
+        if not chunk_hashes:
+            return {}
+        results = self.store.get(
+            where={"chunk_hash": {"$in": list(set(chunk_hashes))}},
+            include=["embeddings", "metadatas"]
+        )
+        
+        embeddings = {}
+        for metadata, embedding in zip(results["metadatas"], results["embeddings"]):
+            embeddings[metadata["chunk_hash"]] = [float(x) for x in embedding]
+        
+        return embeddings
 
     
     def query_section(self, section_name: str, paper_id: Optional[str] = None) -> List[Dict]:
-        """Query ChromaDB for all chunks in a specific section."""
+        """Query the vector store for all chunks in a specific section."""
         where_filter = {"section": section_name}
         if paper_id:
             where_filter = {"$and": [{"section": section_name}, {"paper_id": paper_id}]}
             
         # We want all chunks in that section, so we use get() instead of query()
-        results = self.collection.get(
+        results = self.store.get(
             where=where_filter
         )
         
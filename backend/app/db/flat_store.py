@@ -0,0 +1,559 @@
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence
+import fcntl
+import json
+import os
+import sys
+import threading
+import numpy as np
+from app.db.vector_store import DEFAULT_INCLUDE, VectorStore
+
+CURRENT_FILE = "CURRENT"
+LOCK_FILE = ".lock"
+SNAPSHOT_FILES = ("vectors.npy", "table.npz", "texts.bin", "rows.jsonl")
+
+# Column storage per metadata value type, and the value marking "not set" on a row.
+# "str" columns hold codes into a per-column dictionary; "bytes" columns hold the
+# UTF-8 values themselves, fixed-width (0xff alone is never valid UTF-8)
+DTYPES = {"str": np.int32, "bytes": "S1", "int": np.int64, "float": np.float64}
+MISSING = {"str": -1, "bytes": b"\xff", "int": np.iinfo(np.int64).min, "float": np.nan}
+
+# A string column with more distinct values than this (and than half the rows),
+# such as a per-chunk hash, stops being dictionary-encoded
+DICTIONARY_MAX_VALUES = 1024
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return vectors / norms
+
+def _top_k(scores: np.ndarray, k: int):
+    """Indices and values of the k largest scores in each column, best first"""
+    k = min(k, len(scores))
+    top = np.argpartition(-scores, k - 1, axis=0)[:k]
+    top_scores = np.take_along_axis(scores, top, axis=0)
+    order = np.argsort(-top_scores, axis=0, kind="stable")
+    return np.take_along_axis(top, order, axis=0), np.take_along_axis(top_scores, order, axis=0)
+
+def _resized(array: np.ndarray, capacity: int, fill) -> np.ndarray:
+    grown = np.full(capacity, fill, dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+def _object_bytes(container) -> int:
+    """Heap size of a dict or list and the objects it holds (one level deep)"""
+    items = container.items() if isinstance(container, dict) else ((item,) for item in container)
+    return sys.getsizeof(container) + sum(sys.getsizeof(item) for pair in items for item in pair)
+
+class FlatVectorStore(VectorStore):
+    """
+    Exact cosine search over memory-mapped float32 vectors
+    
+    Embeddings are stored L2-normalized, one row per chunk, in an .npy file
+    that is memory-mapped rather than read, so processes serving the same
+    directory share its pages through the OS cache. Metadata is held as one
+    NumPy column per key (strings dictionary-encoded, or fixed-width bytes when
+    nearly every row has its own value), so filters are boolean masks and a
+    query is one matrix product over the matching rows followed by argpartition.
+    Chunk ids are a fixed-width bytes array looked up through an argsort of it.
+    Nothing in RAM is a Python object per row except texts and ids written
+    since the last snapshot. Exact search suits corpora up to a few hundred
+    thousand chunks.
+    
+    On disk, a generation is a snapshot (vectors-N.npy, table-N.npz with the
+    metadata columns and ids, texts-N.bin with the chunk texts) plus rows-N.jsonl,
+    an append-only log of upserts and deletes since the snapshot. CURRENT names
+    the live generation; compaction writes the next one and switches CURRENT, so
+    a crash leaves either generation intact. Upserts compact once the log passes
+    max_log_bytes, so its texts do not pile up in RAM during a long ingest. Writers hold an exclusive file lock;
+    every operation first replays log lines written by other processes.
+    """
+    
+    snapshot_files = SNAPSHOT_FILES
+    
+    def __init__(self, path: str, initial_capacity: int = 1024, compact_ratio: float = 0.25,
+                 max_log_bytes: int = 64 << 20):
+        self.path = path
+        self.initial_capacity = initial_capacity
+        # Deleted rows are dropped by compaction once they are this fraction of all rows
+        self.compact_ratio = compact_ratio
+        # Upserts fold the log (whose texts are held in RAM) into a snapshot past this size
+        self.max_log_bytes = max_log_bytes
+        os.makedirs(path, exist_ok=True)
+        self._lock = threading.RLock()
+        self._lock_file = open(os.path.join(path, LOCK_FILE), "a")
+        self.generation = -1
+        self._reset()
+        with self._lock, self._file_lock(fcntl.LOCK_SH):
+            self._sync()
+    
+    def _reset(self):
+        self.size = 0  # rows in use, deleted ones included
+        self.dead = 0
+        self.vectors: Optional[np.ndarray] = None
+        self._vectors_inode = None
+        self.ids = np.zeros(0, dtype="S1")  # row -> UTF-8 chunk id, deleted rows included
+        self.id_order = np.zeros(0, dtype=np.int32)  # the first len(id_order) rows, sorted by id
+        self.recent_ids: Dict[str, int] = {}  # chunk id -> row, for rows added since id_order was built
+        self.alive = np.zeros(0, dtype=bool)
+        self.kinds: Dict[str, str] = {}  # metadata key -> "str" / "bytes" / "int" / "float"
+        self.columns: Dict[str, np.ndarray] = {}
+        self.vocab: Dict[str, Dict[str, int]] = {}  # string column -> value -> code
+        self.values: Dict[str, List[str]] = {}  # string column -> code -> value
+        self.texts: Dict[int, str] = {}  # row -> text written since the snapshot (the rest are in its texts file)
+        self.text_blob: Optional[np.ndarray] = None
+        self.text_offsets = np.zeros(1, dtype=np.int64)
+        self._log_offset = 0
+    
+    def _file(self, name: str, generation: Optional[int] = None) -> str:
+        generation = self.generation if generation is None else generation
+        stem, extension = os.path.splitext(name)
+        return os.path.join(self.path, f"{stem}-{generation}{extension}")
+    
+    @contextmanager
+    def _file_lock(self, mode: int):
+        fcntl.flock(self._lock_file, mode)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+    
+    # Syncing with the files (callers hold self._lock and the file lock)
+    
+    def _current_generation(self) -> int:
+        try:
+            with open(os.path.join(self.path, CURRENT_FILE)) as f:
+                return int(f.read().strip() or 0)
+        except FileNotFoundError:
+            return 0
+    
+    def _sync(self):
+        """Catch up with changes made through other handles or processes"""
+        generation = self._current_generation()
+        if generation != self.generation:
+            self._load(generation)
+        else:
+            try:
+                inode = os.stat(self._file("vectors.npy")).st_ino
+            except FileNotFoundError:
+                inode = None
+            if inode != self._vectors_inode:
+                self._open_vectors()
+        
+        try:
+            with open(self._file("rows.jsonl"), "rb") as log:
+                log.seek(self._log_offset)
+                data = log.read()
+        except FileNotFoundError:
+            return
+        # Only complete lines; a writer that crashed mid-line leaves a partial one
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            self._apply(json.loads(line))
+        self._log_offset += end
+    
+    def _load(self, generation: int):
+        self._reset()
+        self.generation = generation
+        table_path = self._file("table.npz")
+        if os.path.exists(table_path):
+            with np.load(table_path, allow_pickle=False) as table:
+                self.ids = table["ids"]
+                self.id_order = table["id_order"]
+                self.kinds = json.loads(str(table["kinds"]))
+                for key, kind in self.kinds.items():
+                    self.columns[key] = table[f"column:{key}"]
+                    if kind == "str":
+                        self.values[key] = table[f"values:{key}"].tolist()
+                        self.vocab[key] = {value: code for code, value in enumerate(self.values[key])}
+                self.text_offsets = table["text_offsets"]
+            self.size = len(self.ids)
+            self.alive = np.ones(self.size, dtype=bool)
+            if self.text_offsets[-1] > 0:
+                self.text_blob = np.memmap(self._file("texts.bin"), dtype=np.uint8, mode="r")
+        self._open_vectors()
+    
+    def _open_vectors(self):
+        path = self._file("vectors.npy")
+        if os.path.exists(path):
+            self.vectors = np.load(path, mmap_mode="r+")
+            self._vectors_inode = os.stat(path).st_ino
+        else:
+            self.vectors, self._vectors_inode = None, None
+    
+    def _apply(self, record: Dict):
+        """Apply one log record to the in-memory table"""
+        if "delete" in record:
+            for row in record["delete"]:
+                if self.alive[row]:
+                    self.alive[row] = False
+                    self.dead += 1
+            return
+        
+        row = record["row"]
+        if row >= len(self.alive):
+            self._grow(row + 1)
+        if row >= self.size:
+            self._set_id(row, record["id"])
+            self.size = row + 1
+        self.texts[row] = record["document"]
+        self.alive[row] = True
+        for key, column in self.columns.items():
+            column[row] = MISSING[self.kinds[key]]
+        for key, value in record["metadata"].items():
+            self._set(key, row, value)
+    
+    def _grow(self, rows: int):
+        capacity = max(rows, 2 * len(self.alive), 64)
+        self.alive = _resized(self.alive, capacity, False)
+        self.ids = _resized(self.ids, capacity, b"")
+        for key, column in self.columns.items():
+            self.columns[key] = _resized(column, capacity, MISSING[self.kinds[key]])
+    
+    def _set_id(self, row: int, chunk_id: str):
+        encoded = chunk_id.encode("utf-8")
+        if len(encoded) > self.ids.dtype.itemsize:
+            self.ids = self.ids.astype(f"S{len(encoded)}")
+        self.ids[row] = encoded
+        self.recent_ids[chunk_id] = row
+        # Fold recent ids into the sorted order once the dictionary is a noticeable share of the rows
+        if len(self.recent_ids) > max(DICTIONARY_MAX_VALUES, row // 8):
+            self.id_order = np.argsort(self.ids[:row + 1], kind="stable").astype(np.int32)
+            self.recent_ids = {}
+    
+    def _lookup(self, ids: List[str]) -> np.ndarray:
+        """Live row of each chunk id, -1 for ids that are not stored"""
+        rows = np.full(len(ids), -1, dtype=np.int64)
+        width = self.ids.dtype.itemsize
+        encoded = [chunk_id.encode("utf-8") for chunk_id in ids]
+        if len(self.id_order):
+            keys = np.array([key if len(key) <= width else b"" for key in encoded], dtype=self.ids.dtype)
+            # A deleted id that was added again has several rows; stable sorting puts the newest last
+            indexed = self.ids[:len(self.id_order)]
+            positions = np.searchsorted(indexed, keys, side="right", sorter=self.id_order) - 1
+            candidates = self.id_order[np.maximum(positions, 0)]
+            found = (positions >= 0) & (indexed[candidates] == keys) & (keys != b"")
+            rows[found] = candidates[found]
+        for i, chunk_id in enumerate(ids):
+            row = self.recent_ids.get(chunk_id)
+            if row is not None:
+                rows[i] = row
+        stored = np.flatnonzero(rows >= 0)
+        rows[stored[~self.alive[rows[stored]]]] = -1
+        return rows
+    
+    def _set(self, key: str, row: int, value):
+        kind = self.kinds.get(key)
+        if kind is None:
+            kind = "str" if isinstance(value, str) else "float" if isinstance(value, float) else "int"
+            self.kinds[key] = kind
+            self.columns[key] = np.full(len(self.alive), MISSING[kind], dtype=DTYPES[kind])
+            if kind == "str":
+                self.vocab[key], self.values[key] = {}, []
+        if kind == "str":
+            value = str(value)
+            code = self.vocab[key].get(value)
+            if code is None:
+                code = self.vocab[key][value] = len(self.values[key])
+                self.values[key].append(value)
+                if code >= max(DICTIONARY_MAX_VALUES, self.size // 2):
+                    self._store_values(key)
+                    return self._set(key, row, value)
+            value = code
+        elif kind == "bytes":
+            value = str(value).encode("utf-8")
+            if len(value) > self.columns[key].dtype.itemsize:
+                self.columns[key] = self.columns[key].astype(f"S{len(value)}")
+        self.columns[key][row] = value
+    
+    def _store_values(self, key: str):
+        """Turn a dictionary-encoded column into one holding its values"""
+        values = np.array([value.encode("utf-8") for value in self.values[key]] + [MISSING["bytes"]])
+        self.columns[key] = values[self.columns[key]]  # code -1 (missing) picks the last entry
+        self.kinds[key] = "bytes"
+        del self.vocab[key], self.values[key]
+    
+    # Reading rows
+    
+    def _mask(self, where: Optional[Dict]) -> np.ndarray:
+        """Boolean mask over rows: live and matching the filter"""
+        mask = self.alive[:self.size].copy()
+        if where:
+            mask &= self._match(where)
+        return mask
+    
+    def _match(self, where: Dict) -> np.ndarray:
+        matched = np.ones(self.size, dtype=bool)
+        for key, condition in where.items():
+            if key == "$and":
+                for clause in condition:
+                    matched &= self._match(clause)
+            elif key == "$or":
+                matched &= np.logical_or.reduce([self._match(clause) for clause in condition])
+            else:
+                matched &= self._match_column(key, condition)
+        return matched
+    
+    def _match_column(self, key: str, condition) -> np.ndarray:
+        if isinstance(condition, dict):
+            (operator, value), = condition.items()
+            if operator not in ("$eq", "$in"):
+                raise ValueError(f"Unsupported filter operator: {operator}")
+            values = list(value) if operator == "$in" else [value]
+        else:
+            values = [condition]
+        
+        column = self.columns.get(key)
+        if column is None:
+            return np.zeros(self.size, dtype=bool)
+        if key in self.vocab:
+            values = [self.vocab[key][value] for value in values if value in self.vocab[key]]
+        elif self.kinds[key] == "bytes":
+            values = [value.encode("utf-8") for value in values if isinstance(value, str)]
+        if not values:
+            return np.zeros(self.size, dtype=bool)
+        return np.isin(column[:self.size], values)
+    
+    def _select(self, ids: Optional[List[str]], where: Optional[Dict]) -> np.ndarray:
+        mask = self._mask(where)
+        if ids is None:
+            return np.flatnonzero(mask)
+        rows = self._lookup(ids)
+        rows = rows[rows >= 0]
+        return rows[mask[rows]]
+    
+    def _document(self, row: int) -> str:
+        text = self.texts.get(row)
+        if text is None:
+            text = self.text_blob[self.text_offsets[row]:self.text_offsets[row + 1]].tobytes().decode("utf-8")
+        return text
+    
+    def _metadata(self, row: int) -> Dict:
+        metadata = {}
+        for key, column in self.columns.items():
+            value = column[row]
+            kind = self.kinds[key]
+            if kind == "str":
+                if value != MISSING["str"]:
+                    metadata[key] = self.values[key][value]
+            elif kind == "bytes":
+                if value != MISSING["bytes"]:
+                    metadata[key] = value.decode("utf-8")
+            elif kind == "int":
+                if value != MISSING["int"]:
+                    metadata[key] = int(value)
+            elif not np.isnan(value):
+                metadata[key] = float(value)
+        return metadata
+    
+    def _embeddings(self, rows: np.ndarray) -> np.ndarray:
+        if self.vectors is None:
+            return np.zeros((0, 0), dtype=np.float32)  # nothing stored yet, so no rows matched
+        return np.array(self.vectors[rows])
+    
+    def _result(self, rows: np.ndarray, include: Sequence[str]) -> Dict:
+        return {
+            "ids": [self.ids[row].decode("utf-8") for row in rows],
+            "documents": [self._document(row) for row in rows] if "documents" in include else None,
+            "metadatas": [self._metadata(row) for row in rows] if "metadatas" in include else None,
+            "embeddings": self._embeddings(rows) if "embeddings" in include else None,
+        }
+    
+    # VectorStore
+    
+    def count(self) -> int:
+        with self._lock, self._file_lock(fcntl.LOCK_SH):
+            self._sync()
+            return self.size - self.dead
+    
+    def get(self, ids=None, where=None, limit=None, offset=None, include=DEFAULT_INCLUDE):
+        with self._lock, self._file_lock(fcntl.LOCK_SH):
+            self._sync()
+            rows = self._select(ids, where)
+            if offset:
+                rows = rows[offset:]
+            if limit is not None:
+                rows = rows[:limit]
+            return self._result(rows, include)
+    
+    def query(self, query_embeddings, n_results=10, where=None):
+        queries = _normalize(np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32)))
+        while True:
+            with self._lock, self._file_lock(fcntl.LOCK_SH):
+                self._sync()
+                generation, state = self.generation, self._search_state()
+                mask = self._mask(where)
+            if self.vectors is not None and self.vectors.shape[1] != queries.shape[1]:
+                raise ValueError(f"Query embeddings have dimension {queries.shape[1]}, the store has {self.vectors.shape[1]}")
+            
+            # Search outside the lock: rows are only appended or rewritten in place, and
+            # compaction (which renumbers them) switches generation, so the result is rechecked
+            if not mask.any() or n_results < 1:
+                return {"ids": [[] for _ in queries], "documents": [[] for _ in queries],
+                        "metadatas": [[] for _ in queries], "distances": [[] for _ in queries]}
+            hits = self._search(queries, n_results, mask, state)
+            
+            with self._lock:
+                if self.generation != generation:
+                    continue
+                results = [self._result(rows, DEFAULT_INCLUDE) for rows, _ in hits]
+            return {
+                "ids": [result["ids"] for result in results],
+                "documents": [result["documents"] for result in results],
+                "metadatas": [result["metadatas"] for result in results],
+                "distances": [(1 - scores).tolist() for _, scores in hits],
+            }
+    
+    def resident_bytes(self) -> int:
+        """
+        RAM held by the table: ids, metadata columns and dictionaries, text
+        offsets, and what was replayed from the log. The memory-mapped vectors
+        and snapshot texts are not counted; they are paged in by the OS.
+        """
+        with self._lock:
+            arrays = [self.ids, self.id_order, self.alive, self.text_offsets, *self.columns.values()]
+            total = sum(array.nbytes for array in arrays)
+            total += _object_bytes(self.recent_ids) + _object_bytes(self.texts)
+            for key, vocab in self.vocab.items():
+                total += _object_bytes(vocab) + sys.getsizeof(self.values[key])  # values shares vocab's strings
+            return total
+    
+    def _search_state(self):
+        """What _search reads, taken under the lock"""
+        return self.vectors
+    
+    def _search(self, queries: np.ndarray, n_results: int, mask: np.ndarray, vectors) -> List:
+        """
+        Exact top n_results rows among those in mask, one matrix product for all queries
+        
+        Returns:
+            One (rows, cosine similarities) pair per query, best first
+        """
+        rows = None if mask.all() else np.flatnonzero(mask)
+        scores = (vectors[:len(mask)] if rows is None else vectors[rows]) @ queries.T
+        top, top_scores = _top_k(scores, n_results)
+        if rows is not None:
+            top = rows[top]
+        return [(top[:, q], top_scores[:, q]) for q in range(len(queries))]
+    
+    # Writing
+    
+    def upsert(self, ids, embeddings, documents, metadatas):
+        if not ids:
+            return
+        vectors = _normalize(np.asarray(embeddings, dtype=np.float32))
+        with self._lock, self._file_lock(fcntl.LOCK_EX):
+            self._sync()
+            rows, assigned, next_row = [], {}, self.size
+            for chunk_id, existing in zip(ids, self._lookup(ids).tolist()):
+                row = assigned.get(chunk_id, existing if existing >= 0 else None)
+                if row is None:
+                    row, next_row = next_row, next_row + 1
+                assigned[chunk_id] = row
+                rows.append(row)
+            self._reserve(next_row, vectors.shape[1])
+            
+            # Vectors first: a row is only visible once its log line is written
+            self.vectors[rows] = vectors
+            self.vectors.flush()
+            self._append([
+                {"row": row, "id": chunk_id, "document": document, "metadata": metadata or {}}
+                for row, chunk_id, document, metadata in zip(rows, ids, documents, metadatas)
+            ])
+            # Or past a quarter of the snapshot's texts, so a long ingest rewrites each row a bounded number of times
+            if self._log_offset > max(self.max_log_bytes, self.text_offsets[-1] // 4):
+                self._compact()
+    
+    def delete(self, ids=None, where=None):
+        if ids is None and where is None:
+            raise ValueError("delete() needs ids or a where filter")
+        with self._lock, self._file_lock(fcntl.LOCK_EX):
+            self._sync()
+            rows = self._select(ids, where)
+            if len(rows):
+                self._append([{"delete": rows.tolist()}])
+            if self.size >= self.initial_capacity and self.dead > self.compact_ratio * self.size:
+                self._compact()
+    
+    def save(self):
+        """Fold the log into a new snapshot, so the next start loads columns instead of replaying JSON"""
+        with self._lock, self._file_lock(fcntl.LOCK_EX):
+            self._sync()
+            if self._log_offset:
+                self._compact()
+    
+    def _reserve(self, rows: int, dim: int):
+        """Make room for rows vectors, doubling the file when it is full"""
+        if self.vectors is not None and self.vectors.shape[1] != dim:
+            raise ValueError(f"Embeddings have dimension {dim}, the store has {self.vectors.shape[1]}")
+        if self.vectors is None:
+            self._write_vectors(self._file("vectors.npy"), np.zeros((0, dim), dtype=np.float32), max(rows, self.initial_capacity))
+        elif rows > len(self.vectors):
+            self._write_vectors(self._file("vectors.npy"), self.vectors[:self.size], max(rows, 2 * len(self.vectors)))
+        else:
+            return
+        self._open_vectors()
+    
+    @staticmethod
+    def _write_vectors(path: str, vectors: np.ndarray, capacity: int):
+        tmp = f"{path}.tmp"
+        out = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.float32, shape=(capacity, vectors.shape[1]))
+        out[:len(vectors)] = vectors
+        out.flush()
+        del out
+        os.replace(tmp, path)
+    
+    def _append(self, records: List[Dict]):
+        data = "".join(json.dumps(record) + "\n" for record in records).encode("utf-8")
+        with open(self._file("rows.jsonl"), "ab") as log:
+            if log.tell() != self._log_offset:
+                log.truncate(self._log_offset)  # drop a partial line left by a crashed writer
+            log.write(data)
+        self._log_offset += len(data)
+        for record in records:
+            self._apply(record)
+    
+    def _write_snapshot(self, generation: int, keep: np.ndarray):
+        """Extra files of a new generation, written before it becomes current (none here)"""
+    
+    def _compact(self):
+        """Write live rows as the next generation's snapshot and switch to it"""
+        generation = self.generation + 1
+        keep = np.flatnonzero(self.alive[:self.size])
+        if self.vectors is not None:
+            self._write_vectors(self._file("vectors.npy", generation), self.vectors[keep], max(len(keep), self.initial_capacity))
+        
+        texts = [self._document(row).encode("utf-8") for row in keep]
+        offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(text) for text in texts])
+        with open(self._file("texts.bin", generation), "wb") as f:
+            f.write(b"".join(texts))
+        
+        ids = self.ids[keep]
+        arrays = {
+            "ids": ids,
+            "id_order": np.argsort(ids, kind="stable").astype(np.int32),
+            "kinds": np.array(json.dumps(self.kinds)),
+            "text_offsets": offsets,
+        }
+        for key, column in self.columns.items():
+            arrays[f"column:{key}"] = column[keep]
+        for key, values in self.values.items():
+            arrays[f"values:{key}"] = np.array(values, dtype=str)
+        with open(self._file("table.npz", generation), "wb") as f:
+            np.savez(f, **arrays)
+        open(self._file("rows.jsonl", generation), "wb").close()
+        self._write_snapshot(generation, keep)
+        
+        tmp = os.path.join(self.path, f"{CURRENT_FILE}.tmp")
+        with open(tmp, "w") as f:
+            f.write(str(generation))
+        os.replace(tmp, os.path.join(self.path, CURRENT_FILE))
+        
+        previous = self.generation
+        self._load(generation)
+        for name in self.snapshot_files:
+            try:
+                os.remove(self._file(name, previous))
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,245 @@
+from typing import List, Optional
+import fcntl
+import os
+import numpy as np
+from app.db.flat_store import SNAPSHOT_FILES, FlatVectorStore, _normalize, _top_k
+
+BLOCK_ROWS = 16384
+
+def _nearest(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Index of the most similar centroid for each row, in blocks to bound memory"""
+    labels = np.zeros(len(vectors), dtype=np.int32)
+    for i in range(0, len(vectors), BLOCK_ROWS):
+        labels[i:i + BLOCK_ROWS] = np.argmax(vectors[i:i + BLOCK_ROWS] @ centroids.T, axis=1)
+    return labels
+
+def _kmeans(vectors: np.ndarray, k: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """Spherical k-means: unit-length centroids, rows assigned by cosine similarity"""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), k, replace=False)].copy()
+    for _ in range(iterations):
+        labels = _nearest(vectors, centroids)
+        order = np.argsort(labels, kind="stable")
+        present, starts = np.unique(labels[order], return_index=True)
+        centroids[present] = np.add.reduceat(vectors[order], starts, axis=0)
+        # Clusters that lost all their rows restart from random rows
+        empty = np.setdiff1d(np.arange(k), present)
+        if len(empty):
+            centroids[empty] = vectors[rng.choice(len(vectors), len(empty), replace=False)]
+        centroids = _normalize(centroids)
+    return centroids
+
+class IVFVectorStore(FlatVectorStore):
+    """
+    Inverted-file index with int8 codes, for corpora too large to search exactly
+    
+    Rows are clustered by k-means into nlist lists and quantized to one int8
+    per dimension (per-dimension min/max scaling). The index adds dim + 8 bytes
+    per chunk to RAM (code, list entry, assignment) on top of FlatVectorStore's
+    table, which with the metadata ChromaDBManager.add_chunks writes is another
+    ~150 bytes per chunk (see resident_bytes); float32 vectors would be 4 * dim.
+    A query scores the nprobe lists whose centroids are closest, takes the
+    best `rescore` rows by their codes, and re-scores those exactly with the
+    float32 vectors, which stay in the memory-mapped file from FlatVectorStore.
+    Filters that match fewer rows than a probe would scan (e.g. one paper) are
+    searched exactly instead, so scoped queries lose no recall.
+    
+    Until the store holds min_train chunks every query is exact. The index is
+    then trained at compaction, retrained whenever the store has grown
+    retrain_growth-fold since, and otherwise updated incrementally: added rows
+    join the list of their nearest centroid and deleted rows are masked out.
+    """
+    
+    snapshot_files = SNAPSHOT_FILES + ("index.npz",)
+    
+    def __init__(self, path: str, nlist: int = 0, nprobe: int = 64, rescore: int = 200, min_train: int = 10000,
+                 retrain_growth: float = 4.0, **kwargs):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.rescore = rescore
+        self.min_train = min_train
+        self.retrain_growth = retrain_growth
+        super().__init__(path, **kwargs)
+    
+    def _reset(self):
+        super()._reset()
+        self.centroids: Optional[np.ndarray] = None
+        self.minimum: Optional[np.ndarray] = None
+        self.scale: Optional[np.ndarray] = None
+        self.assignments = np.zeros(0, dtype=np.int32)  # row -> list, -1 if not indexed
+        # Per list, its rows and their codes, contiguous so a probe scans without gathering
+        self.lists: List[np.ndarray] = []
+        self.list_codes: List[np.ndarray] = []
+        self.trained_size = 0
+        self._pending: List[int] = []
+    
+    @property
+    def trained(self) -> bool:
+        return self.centroids is not None
+    
+    # Keeping the index in step with the table
+    
+    def _load(self, generation: int):
+        super()._load(generation)
+        path = self._file("index.npz")
+        if not os.path.exists(path):
+            return
+        with np.load(path, allow_pickle=False) as index:
+            self.centroids = index["centroids"]
+            self.minimum, self.scale = index["minimum"], index["scale"]
+            self.assignments = index["assignments"]
+            rows, codes, bounds = index["rows"], index["codes"], index["bounds"]
+            self.trained_size = int(index["trained_size"])
+        self.lists = [rows[bounds[i]:bounds[i + 1]] for i in range(len(self.centroids))]
+        self.list_codes = [codes[bounds[i]:bounds[i + 1]] for i in range(len(self.centroids))]
+    
+    def _apply(self, record):
+        super()._apply(record)
+        if "row" in record:
+            self._pending.append(record["row"])
+    
+    def _sync(self):
+        super()._sync()
+        self._index_pending()
+    
+    def _append(self, records):
+        super()._append(records)
+        self._index_pending()
+    
+    def _index_pending(self):
+        """Encode rows added (or rewritten) since the last call and add them to their lists"""
+        rows, self._pending = np.unique(self._pending).astype(np.int32), []
+        if not self.trained or not len(rows):
+            return
+        labels, codes = self._encode(self.vectors[rows])
+        if rows[-1] >= len(self.assignments):
+            capacity = max(rows[-1] + 1, 2 * len(self.assignments))
+            self.assignments = np.concatenate([self.assignments, np.full(capacity - len(self.assignments), -1, dtype=np.int32)])
+        # A rewritten row stays in its old list too; searches skip list entries
+        # whose assignment has moved on, and compaction drops them
+        self.assignments[rows] = labels
+        for label in np.unique(labels):
+            self.list_codes[label] = np.concatenate([self.list_codes[label], codes[labels == label]])
+            self.lists[label] = np.concatenate([self.lists[label], rows[labels == label]])
+    
+    def _encode(self, vectors: np.ndarray):
+        """Nearest list and int8 code of each (normalized) vector"""
+        labels = _nearest(vectors, self.centroids)
+        codes = np.clip(np.rint((vectors - self.minimum) / self.scale) - 128, -128, 127).astype(np.int8)
+        return labels, codes
+    
+    def _train(self, vectors: np.ndarray, rows: np.ndarray):
+        """Fit centroids and the quantizer on a sample of rows"""
+        nlist = self.nlist or int(np.sqrt(len(rows)))
+        nlist = max(1, min(nlist, len(rows)))
+        rng = np.random.default_rng(0)
+        sample = np.sort(rng.choice(rows, min(len(rows), 64 * nlist), replace=False))
+        sample_vectors = np.asarray(vectors[sample], dtype=np.float32)
+        print(f"---TRAINING IVF INDEX: {nlist} LISTS ON {len(sample)} OF {len(rows)} CHUNKS---")
+        self.centroids = _kmeans(sample_vectors, nlist)
+        self.minimum = sample_vectors.min(axis=0)
+        self.scale = (sample_vectors.max(axis=0) - self.minimum) / 255
+        self.scale[self.scale == 0] = 1
+        self.trained_size = len(rows)
+    
+    def _write_snapshot(self, generation, keep):
+        if len(keep) >= self.min_train and (not self.trained or len(keep) >= self.retrain_growth * self.trained_size):
+            self._train(self.vectors, keep)
+            labels, codes = [], []
+            for i in range(0, len(keep), BLOCK_ROWS):
+                block_labels, block_codes = self._encode(np.asarray(self.vectors[keep[i:i + BLOCK_ROWS]]))
+                labels.append(block_labels)
+                codes.append(block_codes)
+            assignments, codes = np.concatenate(labels), np.concatenate(codes)
+            order = np.argsort(assignments, kind="stable").astype(np.int32)
+            rows, codes = order, codes[order]
+            bounds = np.searchsorted(assignments[order], np.arange(len(self.centroids) + 1))
+        elif self.trained:
+            # Same lists, without stale entries and renumbered to the compacted rows
+            renumber = np.full(self.size, -1, dtype=np.int32)
+            renumber[keep] = np.arange(len(keep), dtype=np.int32)
+            rows, codes, bounds = [], [], [0]
+            for label, (list_rows, list_codes) in enumerate(zip(self.lists, self.list_codes)):
+                current = (self.assignments[list_rows] == label) & (renumber[list_rows] >= 0)
+                rows.append(renumber[list_rows[current]])
+                codes.append(list_codes[current])
+                bounds.append(bounds[-1] + int(current.sum()))
+            rows, codes = np.concatenate(rows), np.concatenate(codes)
+            assignments = np.full(len(keep), -1, dtype=np.int32)
+            assignments[rows] = np.repeat(np.arange(len(self.lists), dtype=np.int32), np.diff(bounds))
+        else:
+            return
+        with open(self._file("index.npz", generation), "wb") as f:
+            np.savez(
+                f,
+                centroids=self.centroids,
+                minimum=self.minimum,
+                scale=self.scale,
+                assignments=assignments,
+                rows=rows,
+                codes=codes,
+                bounds=np.asarray(bounds),
+                trained_size=self.trained_size
+            )
+    
+    def upsert(self, ids, embeddings, documents, metadatas):
+        super().upsert(ids, embeddings, documents, metadatas)
+        if self._needs_training():
+            with self._lock, self._file_lock(fcntl.LOCK_EX):
+                self._sync()
+                if self._needs_training():
+                    self._compact()
+    
+    def _needs_training(self) -> bool:
+        live = self.size - self.dead
+        if not self.trained:
+            return live >= self.min_train
+        return live >= self.retrain_growth * self.trained_size
+    
+    def resident_bytes(self) -> int:
+        total = super().resident_bytes() + self.assignments.nbytes
+        if self.trained:
+            total += self.centroids.nbytes + self.minimum.nbytes + self.scale.nbytes
+            total += sum(rows.nbytes + codes.nbytes for rows, codes in zip(self.lists, self.list_codes))
+        return total
+    
+    # Search
+    
+    def _search_state(self):
+        if not self.trained:
+            return self.vectors, None
+        return self.vectors, (self.centroids, self.scale, self.assignments, list(self.lists), list(self.list_codes))
+    
+    def _search(self, queries, n_results, mask, state):
+        vectors, index = state
+        if index is None:
+            return super()._search(queries, n_results, mask, vectors)
+        centroids, scale, assignments, lists, list_codes = index
+        nprobe = min(self.nprobe, len(lists))
+        # A probe scans about nprobe / nlist of the rows; smaller filtered sets are scanned exactly
+        if mask.sum() <= max(self.rescore, nprobe * len(mask) / len(lists)):
+            return super()._search(queries, n_results, mask, vectors)
+        
+        hits = []
+        for query in queries:
+            probed = np.argpartition(-(centroids @ query), nprobe - 1)[:nprobe]
+            rows = np.concatenate([lists[label] for label in probed])
+            codes = np.concatenate([list_codes[label] for label in probed])
+            valid = (assignments[rows] == np.repeat(probed, [len(lists[label]) for label in probed])) & mask[rows]
+            if not valid.any():
+                hits.append((np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)))
+                continue
+            
+            # Dequantized x = (code + 128) * scale + minimum; the terms without the code
+            # are the same for every row, so ranking by code . (scale * query) is enough
+            weights = scale * query
+            approx = np.concatenate([
+                codes[i:i + BLOCK_ROWS].astype(np.float32) @ weights for i in range(0, len(codes), BLOCK_ROWS)
+            ])
+            approx[~valid] = -np.inf
+            candidates, _ = _top_k(approx[:, None], min(self.rescore, int(valid.sum())))
+            candidates = np.sort(rows[candidates[:, 0]])  # sorted reads from the memory map
+            
+            top, top_scores = _top_k((vectors[candidates] @ query)[:, None], n_results)
+            hits.append((candidates[top[:, 0]].astype(np.int64), top_scores[:, 0]))
+        return hits
@@ -0,0 +1,330 @@
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+import base64
+import os
+import sqlite3
+import threading
+from app.core.config import settings
+
+COLUMNS = [
+    "paper_id", "filename", "status", "file_hash", "source_id", "file_size",
+    "total_pages", "chunks_count", "text_chars", "created_at", "updated_at"
+]
+
+class PaperRegistry:
+    """
+    SQLite table with one row per paper, written at ingest time
+    
+    Listing reads one index range per page (keyset pagination on created_at,
+    paper_id), so its cost does not depend on the number of papers or chunks.
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._conn_lock = threading.Lock()
+        self._lock = threading.Lock()
+    
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """The SQLite connection, opened (creating the file and tables) on first use"""
+        if self._conn is None:
+            with self._conn_lock:
+                if self._conn is None:
+                    self._conn = self._connect()
+        return self._conn
+    
+    def _connect(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        with conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS papers (
+                    paper_id TEXT PRIMARY KEY,
+                    filename TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'ready',
+                    file_hash TEXT,
+                    source_id TEXT,
+                    file_size INTEGER NOT NULL DEFAULT 0,
+                    total_pages INTEGER NOT NULL DEFAULT 0,
+                    chunks_count INTEGER NOT NULL DEFAULT 0,
+                    text_chars INTEGER NOT NULL DEFAULT 0,
+                    created_at TEXT NOT NULL,
+                    updated_at TEXT NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_papers_created ON papers (created_at DESC, paper_id DESC)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_papers_status_created ON papers (status, created_at DESC, paper_id DESC)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_papers_source ON papers (source_id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_papers_hash ON papers (file_hash)")
+            # Concept graph computed at ingest (app.core.concepts.ConceptCounter.to_graph). Concepts are
+            # stored by frequency rank and edges keyed on their lower-ranked end, so the graph of the
+            # top N concepts is two index range reads.
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS paper_concepts ("
+                "paper_id TEXT NOT NULL, rank INTEGER NOT NULL, concept TEXT NOT NULL, frequency INTEGER NOT NULL, "
+                "PRIMARY KEY (paper_id, rank)) WITHOUT ROWID"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS paper_edges ("
+                "paper_id TEXT NOT NULL, target INTEGER NOT NULL, source INTEGER NOT NULL, weight INTEGER NOT NULL, "
+                "PRIMARY KEY (paper_id, target, source)) WITHOUT ROWID"
+            )
+            # Corpus graph: a global concept vocabulary and, per paper, the concept ids of each chunk
+            # as CSR row pointers and column indices (int32 bytes)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS concept_vocabulary ("
+                "concept_id INTEGER PRIMARY KEY, concept TEXT NOT NULL UNIQUE)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS paper_incidence ("
+                "paper_id TEXT PRIMARY KEY, indptr BLOB NOT NULL, indices BLOB NOT NULL)"
+            )
+            # Headings detected by the layout parser, in document order
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS paper_outline ("
+                "paper_id TEXT NOT NULL, position INTEGER NOT NULL, page_number INTEGER NOT NULL, "
+                "level INTEGER NOT NULL, heading TEXT NOT NULL, section TEXT NOT NULL, "
+                "PRIMARY KEY (paper_id, position)) WITHOUT ROWID"
+            )
+        return conn
+    
+    def upsert(self, paper_id: str, **fields):
+        """Insert a paper or update the given fields; created_at is kept from the first insert"""
+        unknown = set(fields) - set(COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown registry fields: {sorted(unknown)}")
+        now = datetime.now(timezone.utc).isoformat()
+        created_at = fields.pop("created_at", now)
+        fields["updated_at"] = now
+        insert = {"filename": f"{paper_id}.pdf", **fields, "created_at": created_at}
+        
+        columns = ["paper_id", *insert]
+        updates = ", ".join(f"{column} = excluded.{column}" for column in fields)
+        with self._lock, self.conn:
+            self.conn.execute(
+                f"INSERT INTO papers ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)}) "
+                f"ON CONFLICT(paper_id) DO UPDATE SET {updates}",
+                [paper_id, *insert.values()]
+            )
+    
+    def get(self, paper_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self.conn.execute("SELECT * FROM papers WHERE paper_id = ?", (paper_id,)).fetchone()
+        return dict(row) if row else None
+    
+    def find_by_hash(self, file_hash: str, status: str = "ready") -> Optional[str]:
+        """Id of a paper whose stored file has this SHA-256, among papers with the given status"""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT paper_id FROM papers WHERE file_hash = ? AND status = ? LIMIT 1", (file_hash, status)
+            ).fetchone()
+        return row[0] if row else None
+    
+    def delete(self, paper_id: str):
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM papers WHERE paper_id = ?", (paper_id,))
+            self.conn.execute("DELETE FROM paper_incidence WHERE paper_id = ?", (paper_id,))
+            self.conn.execute("DELETE FROM paper_outline WHERE paper_id = ?", (paper_id,))
+            self._delete_graph(paper_id)
+    
+    def save_graph(self, paper_id: str, graph: Dict):
+        """Replace the stored concept graph of a paper"""
+        with self._lock, self.conn:
+            self._delete_graph(paper_id)
+            self.conn.executemany(
+                "INSERT INTO paper_concepts (paper_id, rank, concept, frequency) VALUES (?, ?, ?, ?)",
+                [(paper_id, rank, concept, frequency) for rank, (concept, frequency) in enumerate(graph["concepts"])]
+            )
+            self.conn.executemany(
+                "INSERT INTO paper_edges (paper_id, source, target, weight) VALUES (?, ?, ?, ?)",
+                [(paper_id, i, j, weight) for i, j, weight in graph["edges"]]
+            )
+    
+    def get_graph(self, paper_id: str, limit: Optional[int] = None) -> Optional[Dict]:
+        """
+        Stored concept graph, restricted to the limit most frequent concepts
+        
+        Returns:
+            {concepts, edges} as produced by ConceptCounter.to_graph, or None
+        """
+        limit = -1 if limit is None else limit
+        with self._lock:
+            concepts = self.conn.execute(
+                "SELECT concept, frequency FROM paper_concepts WHERE paper_id = ? ORDER BY rank LIMIT ?",
+                (paper_id, limit)
+            ).fetchall()
+            if not concepts:
+                return None
+            edges = self.conn.execute(
+                "SELECT source, target, weight FROM paper_edges WHERE paper_id = ? AND target < ? "
+                "ORDER BY weight DESC, source, target",
+                (paper_id, len(concepts))
+            ).fetchall()
+        return {"concepts": [list(row) for row in concepts], "edges": [list(row) for row in edges]}
+    
+    def save_outline(self, paper_id: str, outline: List[Dict]):
+        """Replace the stored headings of a paper ({page_number, level, heading, section} each)"""
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM paper_outline WHERE paper_id = ?", (paper_id,))
+            self.conn.executemany(
+                "INSERT INTO paper_outline (paper_id, position, page_number, level, heading, section) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (paper_id, position, entry["page_number"], entry["level"], entry["heading"], entry["section"])
+                    for position, entry in enumerate(outline)
+                ]
+            )
+    
+    def get_outline(self, paper_id: str) -> List[Dict]:
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT page_number, level, heading, section FROM paper_outline WHERE paper_id = ? ORDER BY position",
+                (paper_id,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+    
+    def list(
+        self,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        status: Optional[str] = None,
+        source_id: Optional[str] = None,
+        filename: Optional[str] = None
+    ) -> Tuple[List[Dict], Optional[str]]:
+        """
+        One page of papers, newest first
+        
+        Returns:
+            (papers, cursor for the next page or None)
+        """
+        clauses, params = [], []
+        if cursor:
+            created_at, paper_id = self.decode_cursor(cursor)
+            clauses.append("(created_at, paper_id) < (?, ?)")
+            params.extend([created_at, paper_id])
+        if status:
+            clauses.append("status = ?")
+            params.append(status)
+        if source_id:
+            clauses.append("source_id = ?")
+            params.append(source_id)
+        if filename:
+            clauses.append("filename LIKE ? ESCAPE '\\'")
+            params.append("%" + filename.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT * FROM papers {where} ORDER BY created_at DESC, paper_id DESC LIMIT ?",
+                [*params, limit + 1]
+            ).fetchall()
+        
+        papers = [dict(row) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = papers[-1]
+            next_cursor = self.encode_cursor(last["created_at"], last["paper_id"])
+        return papers, next_cursor
+    
+    def count(self, status: Optional[str] = None) -> int:
+        with self._lock:
+            if status:
+                return self.conn.execute("SELECT COUNT(*) FROM papers WHERE status = ?", (status,)).fetchone()[0]
+            return self.conn.execute("SELECT COUNT(*) FROM papers").fetchone()[0]
+    
+    def backfill(self, chroma_db, upload_dir: str) -> int:
+        """
+        Register papers that predate the registry from chunk metadata
+        
+        Reads metadata only, in pages, and is a no-op once every stored paper
+        has a row. Returns the number of papers added.
+        """
+        found: Dict[str, Dict] = {}
+        offset = 0
+        while True:
+            results = chroma_db.store.get(include=["metadatas"], limit=5000, offset=offset)
+            if not results["ids"]:
+                break
+            for metadata in results["metadatas"]:
+                paper = found.setdefault(metadata["paper_id"], {"chunks_count": 0, "total_pages": 0})
+                paper["chunks_count"] += 1
+                paper["total_pages"] = max(paper["total_pages"], metadata.get("page_number") or 0)
+                paper.setdefault("file_hash", metadata.get("file_hash"))
+                paper.setdefault("source_id", metadata.get("source_id"))
+            offset += len(results["ids"])
+        
+        added = 0
+        for paper_id, fields in found.items():
+            if self.get(paper_id) is not None:
+                continue
+            path = os.path.join(upload_dir, f"{paper_id}.pdf")
+            if os.path.exists(path):
+                fields["file_size"] = os.path.getsize(path)
+                fields["created_at"] = datetime.fromtimestamp(os.path.getmtime(path), timezone.utc).isoformat()
+            self.upsert(paper_id, filename=f"{paper_id}.pdf", **fields)
+            added += 1
+        return added
+    
+    def concept_ids(self, concepts: List[str]) -> Dict[str, int]:
+        """Vocabulary ids for concepts, adding the ones not seen before"""
+        ids = {}
+        with self._lock, self.conn:
+            # Stay well under SQLite's bound-parameter limit
+            for start in range(0, len(concepts), 500):
+                batch = concepts[start:start + 500]
+                self.conn.executemany("INSERT OR IGNORE INTO concept_vocabulary (concept) VALUES (?)", [(c,) for c in batch])
+                rows = self.conn.execute(
+                    f"SELECT concept, concept_id FROM concept_vocabulary WHERE concept IN ({', '.join('?' for _ in batch)})",
+                    batch
+                ).fetchall()
+                ids.update((concept, concept_id) for concept, concept_id in rows)
+        return ids
+    
+    def vocabulary(self) -> Dict[int, str]:
+        with self._lock:
+            return dict(self.conn.execute("SELECT concept_id, concept FROM concept_vocabulary").fetchall())
+    
+    def save_incidence(self, paper_id: str, indptr: bytes, indices: bytes):
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO paper_incidence (paper_id, indptr, indices) VALUES (?, ?, ?)",
+                (paper_id, indptr, indices)
+            )
+    
+    def load_incidence(self) -> Dict[str, Tuple[bytes, bytes]]:
+        with self._lock:
+            rows = self.conn.execute("SELECT paper_id, indptr, indices FROM paper_incidence").fetchall()
+        return {paper_id: (indptr, indices) for paper_id, indptr, indices in rows}
+    
+    def papers_without_incidence(self) -> List[str]:
+        """Ready papers ingested before the corpus graph was kept"""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT paper_id FROM papers WHERE status = 'ready' "
+                "AND paper_id NOT IN (SELECT paper_id FROM paper_incidence)"
+            ).fetchall()
+        return [row[0] for row in rows]
+    
+    def _delete_graph(self, paper_id: str):
+        self.conn.execute("DELETE FROM paper_concepts WHERE paper_id = ?", (paper_id,))
+        self.conn.execute("DELETE FROM paper_edges WHERE paper_id = ?", (paper_id,))
+    
+    @staticmethod
+    def encode_cursor(created_at: str, paper_id: str) -> str:
+        return base64.urlsafe_b64encode(f"{created_at}|{paper_id}".encode()).decode()
+    
+    @staticmethod
+    def decode_cursor(cursor: str) -> Tuple[str, str]:
+        try:
+            created_at, paper_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+        except Exception:
+            raise ValueError("Invalid cursor")
+        return created_at, paper_id
+
+# Singleton instance
+paper_registry = PaperRegistry(settings.PAPER_REGISTRY_PATH)
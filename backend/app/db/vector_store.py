@@ -0,0 +1,76 @@
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Sequence
+import os
+
+DEFAULT_INCLUDE = ("documents", "metadatas")
+
+class VectorStore(ABC):
+    """
+    Storage behind ChromaDBManager
+    
+    Every backend takes and returns Chroma's shapes, so the manager formats
+    results the same way whichever store is configured:
+      get()   -> {"ids", "documents", "metadatas", "embeddings"} (lists, None if not included)
+      query() -> the same with one list per query embedding, plus "distances" (cosine distance)
+    where filters: {key: value}, {key: {"$in": [...]}} and {"$and": [...]}.
+    """
+    
+    @abstractmethod
+    def count(self) -> int:
+        """Number of stored chunks"""
+    
+    @abstractmethod
+    def upsert(self, ids: List[str], embeddings: List[List[float]], documents: List[str], metadatas: List[Dict]):
+        """Add chunks, overwriting any with the same id"""
+    
+    @abstractmethod
+    def query(self, query_embeddings: List[List[float]], n_results: int = 10, where: Optional[Dict] = None) -> Dict:
+        """The n_results nearest chunks to each embedding among those matching where"""
+    
+    @abstractmethod
+    def get(self, ids: Optional[List[str]] = None, where: Optional[Dict] = None, limit: Optional[int] = None,
+            offset: Optional[int] = None, include: Sequence[str] = DEFAULT_INCLUDE) -> Dict:
+        """Chunks by id and/or filter, in insertion order"""
+    
+    @abstractmethod
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict] = None):
+        """Delete chunks by id and/or filter"""
+    
+    def save(self):
+        """Persist anything held in memory (no-op for stores that write through)"""
+
+class ChromaVectorStore(VectorStore):
+    """A persistent ChromaDB collection (HNSW index, cosine space)"""
+    
+    def __init__(self, persist_dir: str, collection_name: str):
+        import chromadb
+        from chromadb.config import Settings as ChromaSettings
+        
+        # Create persist directory if it doesn't exist
+        os.makedirs(persist_dir, exist_ok=True)
+        
+        self.client = chromadb.PersistentClient(
+            path=persist_dir,
+            settings=ChromaSettings(anonymized_telemetry=False)
+        )
+        
+        # Get or create collection
+        self.collection = self.client.get_or_create_collection(
+            name=collection_name,
+            metadata={"hnsw:space": "cosine"}
+        )
+    
+    def count(self) -> int:
+        return self.collection.count()
+    
+    def upsert(self, ids, embeddings, documents, metadatas):
+        self.collection.upsert(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+    
+    def query(self, query_embeddings, n_results=10, where=None):
+        return self.collection.query(query_embeddings=query_embeddings, n_results=n_results, where=where)
+    
+    def get(self, ids=None, where=None, limit=None, offset=None, include=DEFAULT_INCLUDE):
+        return self.collection.get(ids=ids, where=where, limit=limit, offset=offset, include=list(include))
+    
+    def delete(self, ids=None, where=None):
+        self.collection.delete(ids=ids, where=where)
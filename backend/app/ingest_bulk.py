@@ -0,0 +1,296 @@
+"""
+Bulk ingestion of a directory or zip archive of PDFs
+
+Usage:
+    python -m app.ingest_bulk <dir|zip> [--workers N] [--batch-size N] [--manifest PATH]
+
+PDFs are parsed and chunked across a process pool, embedded in large batches by a
+single embedding stage in the main process, and written to ChromaDB in large
+batches. Every fully stored paper is appended to a JSONL manifest so an
+interrupted run can be resumed by re-running the same command.
+"""
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, Iterator, List, Set, Tuple
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+import uuid
+import zipfile
+
+from app.core.pdf_parser import PDFParser
+from app.core.chunking import SemanticChunker
+from app.core.concepts import ConceptCounter
+from app.core.hashing import sha256_file
+from app.core.config import settings
+
+
+def parse_and_chunk(pdf_path: str, paper_id: str, chunk_size: int, overlap: int,
+                    max_concepts: int = 200) -> Tuple[str, str, int, List[Dict], Dict]:
+    """
+    Worker: hash, parse, chunk and count concepts for one PDF (runs in a child process; loads the chunker's tokenizer but not the embedding or reranking models)
+    
+    Returns:
+        (paper_id, file_hash, pages, chunks, extras) where extras is {graph, chunk_concepts, outline}
+    """
+    file_hash = sha256_file(pdf_path)
+    chunker = SemanticChunker(chunk_size=chunk_size, overlap=overlap)
+    chunks = []
+    outline = []
+    pages = 0
+    for page_data in PDFParser.iter_pages(pdf_path):
+        pages += 1
+        outline.extend(page_data["headings"])
+        ordinal = 0
+        for segment in page_data["segments"]:
+            if PDFParser.should_skip_section(segment["section"]):
+                continue
+            segment_chunks = chunker.chunk_text(
+                text=segment["text"],
+                page_number=page_data["page_number"],
+                section=segment["section"],
+                paper_id=paper_id,
+                first_ordinal=ordinal
+            )
+            ordinal += len(segment_chunks)
+            for chunk in segment_chunks:
+                chunk["heading"] = segment["heading"]
+            chunks.extend(segment_chunks)
+    concepts = ConceptCounter()
+    for chunk in chunks:
+        chunk["file_hash"] = file_hash
+        concepts.add_text(chunk["text"])
+    return paper_id, file_hash, pages, chunks, {
+        "graph": concepts.to_graph(max_concepts),
+        "chunk_concepts": concepts.chunks,
+        "outline": outline
+    }
+
+
+def load_manifest(manifest_path: str) -> Set[str]:
+    """Return the source keys of files that were already fully ingested"""
+    done = set()
+    if not os.path.exists(manifest_path):
+        return done
+    with open(manifest_path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                done.add(json.loads(line)["source"])
+    return done
+
+
+def iter_sources(source: str) -> Iterator[Tuple[str, object]]:
+    """
+    Yield (source_key, item) for every PDF under a directory or inside a zip
+    
+    item is a file path for directories and a ZipInfo for archive members, which
+    the caller extracts lazily so the whole archive never has to be unpacked.
+    """
+    if zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            for info in archive.infolist():
+                if info.is_dir() or not info.filename.lower().endswith(".pdf"):
+                    continue
+                key = f"{os.path.basename(source)}:{info.filename}:{info.file_size}"
+                yield key, info
+        return
+    
+    for root, _, files in os.walk(source):
+        for name in sorted(files):
+            if not name.lower().endswith(".pdf"):
+                continue
+            path = os.path.join(root, name)
+            key = f"{os.path.relpath(path, source)}:{os.path.getsize(path)}"
+            yield key, path
+
+
+def run(source: str, workers: int, batch_size: int, manifest_path: str) -> Dict:
+    done_sources = load_manifest(manifest_path)
+    os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
+    
+    # Spawned children import the parser and chunker (and its tokenizer), never the embedding or reranking models
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    
+    from app.core.ingestion import detect_source_id, embed_chunks
+    from app.db.chroma import chroma_db
+    from app.db.registry import paper_registry
+    from app.core.corpus_graph import corpus_graph
+    
+    extract_dir = tempfile.mkdtemp(prefix="ingest_bulk_")
+    archive = zipfile.ZipFile(source) if zipfile.is_zipfile(source) else None
+    
+    stats = {"files": 0, "skipped": 0, "duplicates": 0, "failed": 0, "pages": 0, "chunks": 0, "reused": 0}
+    seen_hashes: Dict[str, str] = {}  # file_hash -> paper_id for files ingested in this run
+    papers: Dict[str, Dict] = {}  # paper_id -> {source, path, filename, pages, remaining}
+    buffer: List[Dict] = []
+    in_flight = {}
+    started = time.perf_counter()
+    
+    def flush():
+        if not buffer:
+            return
+        for start in range(0, len(buffer), batch_size):
+            batch = buffer[start:start + batch_size]
+            embeddings, reused = embed_chunks(batch)
+            chroma_db.add_chunks(batch, embeddings)
+            stats["chunks"] += len(batch)
+            stats["reused"] += reused
+            for chunk in batch:
+                papers[chunk["paper_id"]]["remaining"] -= 1
+        buffer.clear()
+        finish_completed()
+    
+    def finish_completed():
+        with open(manifest_path, "a") as manifest:
+            for paper_id in [pid for pid, p in papers.items() if p["remaining"] == 0]:
+                paper = papers.pop(paper_id)
+                if paper.get("duplicate_of"):
+                    paper_id = paper["duplicate_of"]
+                else:
+                    final_path = os.path.join(settings.UPLOAD_DIR, f"{paper_id}.pdf")
+                    shutil.copyfile(paper["path"], final_path)
+                    paper_registry.upsert(
+                        paper_id,
+                        filename=paper["filename"],
+                        status="ready",
+                        file_hash=paper["file_hash"],
+                        source_id=paper["source_id"],
+                        file_size=os.path.getsize(final_path),
+                        total_pages=paper["pages"],
+                        chunks_count=paper["chunks"],
+                        text_chars=paper["text_chars"]
+                    )
+                    paper_registry.save_graph(paper_id, paper["extras"]["graph"])
+                    corpus_graph.update_paper(paper_id, paper["extras"]["chunk_concepts"])
+                    paper_registry.save_outline(paper_id, paper["extras"]["outline"])
+                    stats["files"] += 1
+                discard_extracted(paper["path"])
+                manifest.write(json.dumps({
+                    "source": paper["source"],
+                    "paper_id": paper_id,
+                    "filename": paper["filename"],
+                    "pages": paper["pages"],
+                    "chunks": paper["chunks"]
+                }) + "\n")
+    
+    def discard_extracted(path):
+        if archive is not None and os.path.exists(path):
+            os.remove(path)
+    
+    def collect(futures):
+        for future in futures:
+            paper_id = in_flight.pop(future)
+            try:
+                _, file_hash, pages, chunks, extras = future.result()
+            except Exception as e:
+                print(f"Failed to parse {papers[paper_id]['filename']}: {e}")
+                discard_extracted(papers.pop(paper_id)["path"])
+                stats["failed"] += 1
+                continue
+            existing_id = seen_hashes.get(file_hash) or paper_registry.find_by_hash(file_hash)
+            if existing_id:
+                # Identical file already indexed: record it in the manifest without any work
+                papers[paper_id].update(pages=pages, remaining=0, duplicate_of=existing_id)
+                stats["duplicates"] += 1
+                continue
+            seen_hashes[file_hash] = paper_id
+            # Tagged like API uploads, so a later vN upload of the same paper is matched as a revision
+            source_id = papers[paper_id]["source_id"]
+            for chunk in chunks:
+                chunk["source_id"] = source_id
+            papers[paper_id].update(
+                pages=pages,
+                chunks=len(chunks),
+                remaining=len(chunks),
+                file_hash=file_hash,
+                text_chars=sum(len(chunk["text"]) for chunk in chunks),
+                extras=extras
+            )
+            stats["pages"] += pages
+            buffer.extend(chunks)
+            if len(buffer) >= batch_size:
+                flush()
+        finish_completed()
+    
+    try:
+        for key, item in iter_sources(source):
+            if key in done_sources:
+                stats["skipped"] += 1
+                continue
+            
+            if archive is not None:
+                path = archive.extract(item, extract_dir)
+                filename = os.path.basename(item.filename)
+            else:
+                path = item
+                filename = os.path.basename(item)
+            
+            paper_id = str(uuid.uuid4())
+            # remaining stays -1 until the worker reports how many chunks to expect
+            papers[paper_id] = {
+                "source": key,
+                "path": path,
+                "filename": filename,
+                "source_id": detect_source_id(filename),
+                "pages": 0,
+                "chunks": 0,
+                "remaining": -1
+            }
+            future = pool.submit(
+                parse_and_chunk, path, paper_id, settings.CHUNK_SIZE, settings.CHUNK_OVERLAP, settings.GRAPH_MAX_CONCEPTS
+            )
+            in_flight[future] = paper_id
+            
+            # Keep a bounded number of parsed documents waiting for the embedder
+            if len(in_flight) >= workers * 2:
+                finished, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+                collect(finished)
+        
+        while in_flight:
+            finished, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+            collect(finished)
+        flush()
+    except BaseException:
+        # Papers that were only partly written are not in the manifest and will be
+        # re-ingested under a new id on resume, so drop their stored chunks now
+        for paper_id, paper in papers.items():
+            if 0 < paper["remaining"] < paper["chunks"]:
+                chroma_db.delete_paper(paper_id)
+        raise
+    finally:
+        pool.shutdown()
+        chroma_db.save()
+        if archive is not None:
+            archive.close()
+        shutil.rmtree(extract_dir, ignore_errors=True)
+    
+    stats["elapsed"] = time.perf_counter() - started
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-ingest a directory or zip archive of PDFs")
+    parser.add_argument("source", help="Directory or .zip archive containing PDFs")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Parse/chunk processes (default: CPU count)")
+    parser.add_argument("--batch-size", type=int, default=settings.BULK_EMBED_BATCH_SIZE, help="Chunks per embedding/write batch")
+    parser.add_argument("--manifest", default=settings.BULK_MANIFEST_PATH, help="JSONL manifest of already-ingested files")
+    args = parser.parse_args()
+    
+    if not os.path.exists(args.source):
+        parser.error(f"{args.source} does not exist")
+    
+    stats = run(args.source, args.workers, args.batch_size, args.manifest)
+    
+    elapsed = max(stats["elapsed"], 1e-9)
+    print(f"Ingested {stats['files']} files ({stats['skipped']} already in manifest, "
+          f"{stats['duplicates']} duplicates, {stats['failed']} failed)")
+    print(f"{stats['pages']} pages, {stats['chunks']} chunks ({stats['reused']} reused embeddings) in {elapsed:.1f}s")
+    print(f"Throughput: {stats['pages'] / elapsed:.1f} pages/s, {stats['chunks'] / elapsed:.1f} chunks/s")
+
+
+if __name__ == "__main__":
+    main()
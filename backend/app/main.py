@@ -1,9 +1,42 @@
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from contextlib import asynccontextmanager
+import asyncio
 from fastapi.middleware.cors import CORSMiddleware
 from app.api import ingest, chat, papers, graph
 from app.core.config import settings
+from app.core.embeddings import embedding_model
+from app.db.chroma import chroma_db
+from app.core.retrieval_cache import retrieval_cache
+from app.core.term_neighbors import term_neighbors
+from app.core.warmup import warmup, register_existing_papers
+from app.core.executors import install_default_executor, run_db
 
-app = FastAPI(title="Research RAG Assistant", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    install_default_executor()
+    if settings.WARMUP_ON_STARTUP:
+        # In the background, so the server answers /health while models load; see /ready
+        warmup.start()
+    else:
+        asyncio.ensure_future(run_db(register_existing_papers))
+    checkpointer = None
+    if settings.CHECKPOINTER == "sqlite":
+        from app.agents.sqlite_checkpointer import open_sqlite_checkpointer
+        from app.agents import graph as agent_graph
+        checkpointer = await open_sqlite_checkpointer(
+            settings.CHECKPOINT_DB_PATH,
+            max_threads=settings.CHECKPOINT_MAX_THREADS,
+            max_checkpoints=settings.CHECKPOINT_MAX_PER_THREAD,
+            ttl_seconds=settings.CHECKPOINT_TTL_SECONDS
+        )
+        agent_graph.use_checkpointer(checkpointer)
+    yield
+    chroma_db.save()
+    if checkpointer is not None:
+        await checkpointer.conn.close()
+
+app = FastAPI(title="Research RAG Assistant", version="1.0.0", lifespan=lifespan)
 
 
 from fastapi.staticfiles import StaticFiles
@@ -20,6 +53,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 
@@ -35,3 +69,27 @@ async def root():
 @app.get("/health")
 async def health():
     return {"status": "healthy"}
+
+@app.get("/ready")
+async def ready():
+    """Whether models, the vector store and the agent graph are loaded (503 until they are)"""
+    report = warmup.report()
+    return JSONResponse(report, status_code=200 if report["ready"] else 503)
+
+@app.post("/warmup")
+async def warm_up():
+    """Load every component now, in parallel, and wait for it"""
+    return await warmup.start()
+
+@app.get("/stats")
+async def stats():
+    """Cache hit/miss counters"""
+    from app.agents import graph as agent_graph
+    
+    return {
+        "embedding_cache": embedding_model.cache_stats(),
+        "retrieval_cache": retrieval_cache.stats(),
+        "checkpoints": agent_graph.memory.stats(),
+        "sparse_index": chroma_db.bm25.stats(),
+        "term_index": term_neighbors.stats()
+    }
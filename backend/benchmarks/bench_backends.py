@@ -0,0 +1,95 @@
+"""
+Throughput and latency of the embedding model and the reranker per inference backend
+
+Usage:
+    python -m benchmarks.bench_backends [--backends torch onnx onnx-int8] [--repeat 20]
+        [--embedding-model NAME_OR_PATH] [--reranker-model NAME_OR_PATH]
+
+For each backend: embedding throughput over a batch of chunk-sized texts,
+single-query embedding latency, and the latency of reranking one retrieval's
+candidates (TOP_K_RETRIEVAL pairs), i.e. the per-query CPU cost. Scores are
+compared with the torch backend: max absolute difference, minimum cosine
+similarity of embeddings, and whether the reranked top TOP_K_RERANKED agree.
+The first run of an ONNX backend exports the model into ONNX_CACHE_DIR; that
+one-off cost is reported separately as load time.
+"""
+import argparse
+import random
+import statistics
+import time
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.onnx_backend import BACKENDS, load_model
+
+WORDS = ("transformer attention gradient embedding dataset benchmark convolutional regularization "
+         "hyperparameter baseline ablation accuracy model training evaluation results we the of in").split()
+
+
+def synthetic_texts(count, words, seed=0):
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(words)) + "." for _ in range(count)]
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+    return f"p50 {statistics.median(ordered) * 1000:8.1f} ms  p95 {p95 * 1000:8.1f} ms"
+
+
+def timed(fn, repeat):
+    fn()  # warm up
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--embedding-model", default=settings.EMBEDDING_MODEL)
+    parser.add_argument("--reranker-model", default=settings.RERANKER_MODEL)
+    parser.add_argument("--chunks", type=int, default=256, help="texts per embedding throughput batch")
+    parser.add_argument("--chunk-words", type=int, default=180)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    
+    chunks = synthetic_texts(args.chunks, args.chunk_words)
+    query = "which optimizer and learning rate were used for training"
+    pairs = [(query, chunk) for chunk in chunks[:settings.TOP_K_RETRIEVAL]]
+    
+    reference = {}
+    print(f"{args.chunks} chunks of {args.chunk_words} words, {len(pairs)} rerank pairs per query")
+    for backend in args.backends:
+        started = time.perf_counter()
+        embedder = load_model("sentence_transformer", args.embedding_model, backend, settings.ONNX_CACHE_DIR, settings.ONNX_THREADS)
+        reranker = load_model("cross_encoder", args.reranker_model, backend, settings.ONNX_CACHE_DIR, settings.ONNX_THREADS)
+        load_time = time.perf_counter() - started
+        
+        embeddings = np.asarray(embedder.encode(chunks, batch_size=32, convert_to_numpy=True, show_progress_bar=False))
+        scores = np.asarray(reranker.predict(pairs, batch_size=32, show_progress_bar=False))
+        batch = timed(lambda: embedder.encode(chunks, batch_size=32, convert_to_numpy=True, show_progress_bar=False), max(1, args.repeat // 5))
+        single = timed(lambda: embedder.encode([query], convert_to_numpy=True, show_progress_bar=False), args.repeat)
+        rerank = timed(lambda: reranker.predict(pairs, batch_size=32, show_progress_bar=False), args.repeat)
+        
+        print(f"\n{backend} (loaded in {load_time:.1f} s)")
+        print(f"  embed batch   {args.chunks / statistics.median(batch):8.1f} texts/s")
+        print(f"  embed query   {summarize(single)}")
+        print(f"  rerank        {summarize(rerank)}")
+        if "torch" in reference and backend != "torch":
+            expected_embeddings, expected_scores = reference["torch"]
+            cosine = (embeddings * expected_embeddings).sum(axis=1) / (
+                np.linalg.norm(embeddings, axis=1) * np.linalg.norm(expected_embeddings, axis=1))
+            top = settings.TOP_K_RERANKED
+            same_top = set(np.argsort(-scores)[:top]) == set(np.argsort(-expected_scores)[:top])
+            print(f"  vs torch      embedding cosine min {cosine.min():.5f}  "
+                  f"score max diff {np.abs(scores - expected_scores).max():.5f}  same top {top}: {same_top}")
+        reference[backend] = (embeddings, scores)
+
+
+if __name__ == "__main__":
+    main()
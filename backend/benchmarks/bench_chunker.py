@@ -0,0 +1,124 @@
+"""
+Chunking throughput and chunk sizes: previous word-count chunker versus SemanticChunker
+
+Usage:
+    python -m benchmarks.bench_chunker [--pdf paper.pdf] [--pages 50] [--repeat 3]
+
+Chunks the pages of a PDF (or synthetic dense pages) with both implementations
+and reports time per page, chunk counts and how many chunks exceed the
+embedding model's max sequence length, i.e. would be silently truncated.
+"""
+import argparse
+import random
+import re
+import statistics
+import time
+
+from app.core.chunking import SemanticChunker, get_token_counter
+from app.core.config import settings
+
+
+class WordCountChunker:
+    """The chunker as it was before token-based sizing, kept here for comparison"""
+    
+    def __init__(self, create_chunk, chunk_size: int = 400, overlap: int = 50):
+        self.create_chunk = create_chunk
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+    
+    def chunk_text(self, text, page_number, section, paper_id):
+        sentences = [s.strip() for s in re.split(r'(?<=[.!?])\s+', text.replace('\n', ' ')) if s.strip()]
+        chunks = []
+        current_chunk = []
+        current_length = 0
+        for sentence in sentences:
+            sentence_length = len(sentence.split())
+            if current_length + sentence_length > self.chunk_size and current_chunk:
+                chunks.append(self.create_chunk(" ".join(current_chunk), page_number, section, paper_id, len(chunks)))
+                overlap_sentences = []
+                total_words = 0
+                for previous in reversed(current_chunk):
+                    word_count = len(previous.split())
+                    if total_words + word_count > self.overlap:
+                        break
+                    overlap_sentences.insert(0, previous)
+                    total_words += word_count
+                current_chunk = overlap_sentences + [sentence]
+                current_length = sum(len(s.split()) for s in current_chunk)
+            else:
+                current_chunk.append(sentence)
+                current_length += sentence_length
+        if current_chunk:
+            chunks.append(self.create_chunk(" ".join(current_chunk), page_number, section, paper_id, len(chunks)))
+        return chunks
+
+
+def synthetic_pages(count, words_per_page, sentence_words=60, seed=0):
+    rng = random.Random(seed)
+    vocabulary = ["transformer", "attention", "gradient", "embedding", "BLEU-4", "state-of-the-art", "e.g.",
+                  "convolutional", "regularization", "O(n log n)", "ResNet-50", "hyperparameter", "we", "the", "of"]
+    pages = []
+    for _ in range(count):
+        words = []
+        while len(words) < words_per_page:
+            sentence = [rng.choice(vocabulary) for _ in range(rng.randint(min(4, sentence_words), sentence_words))]
+            words.extend(sentence[:-1] + [sentence[-1] + "."])
+        pages.append(" ".join(words))
+    return pages
+
+
+def pdf_pages(path, limit):
+    from app.core.pdf_parser import PDFParser
+    pages = []
+    for page in PDFParser.iter_pages(path):
+        pages.append(page["text"])
+        if len(pages) >= limit:
+            break
+    return pages
+
+
+def measure(chunk_page, pages, repeat):
+    samples = []
+    chunks = []
+    for _ in range(repeat):
+        chunks = []
+        started = time.perf_counter()
+        for number, page in enumerate(pages, start=1):
+            chunks.extend(chunk_page(page, number))
+        samples.append((time.perf_counter() - started) / len(pages))
+    return statistics.median(samples), chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf", help="chunk the pages of this PDF instead of synthetic text")
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--words-per-page", type=int, default=1500)
+    parser.add_argument("--sentence-words", type=int, default=60, help="longest synthetic sentence")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    
+    pages = pdf_pages(args.pdf, args.pages) if args.pdf else synthetic_pages(args.pages, args.words_per_page, args.sentence_words)
+    counter = get_token_counter(settings.EMBEDDING_MODEL)
+    limit = settings.EMBEDDING_MAX_TOKENS - 2
+    
+    current = SemanticChunker(chunk_size=settings.CHUNK_SIZE, overlap=settings.CHUNK_OVERLAP)
+    legacy = WordCountChunker(current._create_chunk, chunk_size=400, overlap=settings.CHUNK_OVERLAP)
+    counter.counts(["warm up"])
+    
+    results = [
+        ("word-count (400 words)", *measure(lambda page, n: legacy.chunk_text(page, n, "Body", "bench"), pages, args.repeat)),
+        (f"token ({current.chunk_size} tokens)", *measure(lambda page, n: current.chunk_text(page, n, "Body", "bench"), pages, args.repeat)),
+    ]
+    
+    tokenizer = "model tokenizer" if counter.tokenizer is not None else "approximate token counts"
+    print(f"{len(pages)} pages, limit {limit} tokens ({tokenizer})")
+    for name, per_page, chunks in results:
+        lengths = counter.counts([chunk["text"] for chunk in chunks])
+        over = sum(1 for length in lengths if length > limit)
+        print(f"{name:24s} {per_page * 1000:8.2f} ms/page  {len(chunks):6d} chunks  "
+              f"max {max(lengths):5d} tokens  {over:6d} over limit")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Latency of the routed fast path versus the full planner graph
+
+Usage:
+    python -m benchmarks.bench_query_router --paper-id <id> [--queries queries.txt] [--repeat 3]
+
+Runs each simple retrieval question through both paths against the configured
+models and vector store, and reports router overhead, per-path latency
+(mean / p50 / p95) and LLM calls per query. Needs a populated ChromaDB and
+working LLM credentials, exactly like the API.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+DEFAULT_QUERIES = [
+    "What dataset is used for evaluation?",
+    "What does section 3 say about the loss function?",
+    "Which optimizer and learning rate were used?",
+    "What are the main limitations mentioned by the authors?",
+    "How is the model architecture described in the methods section?",
+]
+
+
+class LLMCallCounter(BaseCallbackHandler):
+    def __init__(self):
+        self.calls = 0
+    
+    def on_chat_model_start(self, *args, **kwargs):
+        self.calls += 1
+    
+    def on_llm_start(self, *args, **kwargs):
+        self.calls += 1
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+    return f"mean {statistics.mean(ordered) * 1000:8.1f} ms  p50 {statistics.median(ordered) * 1000:8.1f} ms  p95 {p95 * 1000:8.1f} ms"
+
+
+async def run(queries, paper_id, repeat):
+    from app.agents.graph import app as agent_app
+    from app.agents.router import query_router
+    from app.api.chat import ChatRequest, build_initial_state, build_config
+    from app.core.retrieval import retrieve
+    from app.core.answer_synthesis import answer_synthesizer
+    from app.core.config import settings
+    
+    # Measure end-to-end work, not cache hits from the previous repetition
+    settings.RETRIEVAL_CACHE_ENABLED = False
+    
+    route_times, fast_times, agent_times, agent_calls = [], [], [], []
+    for _ in range(repeat):
+        for query in queries:
+            request = ChatRequest(query=query, paper_ids=[paper_id])
+            
+            started = time.perf_counter()
+            decision = query_router.route(query, request.paper_ids)
+            route_times.append(time.perf_counter() - started)
+            if decision["route"] != "fast":
+                print(f"note: router sends {query!r} to the agent ({decision['reason']})")
+            
+            started = time.perf_counter()
+            chunks_with_scores = await retrieve(query, request.paper_ids)
+            await answer_synthesizer.synthesize(query, chunks_with_scores)
+            fast_times.append(time.perf_counter() - started)
+            
+            counter = LLMCallCounter()
+            config = {**build_config(str(uuid.uuid4())), "callbacks": [counter]}
+            started = time.perf_counter()
+            await agent_app.ainvoke(build_initial_state(request), config=config)
+            agent_times.append(time.perf_counter() - started)
+            agent_calls.append(counter.calls)
+    
+    print(f"{len(queries)} queries x {repeat} runs")
+    print(f"router       {summarize(route_times)}")
+    print(f"fast path    {summarize(fast_times)}  LLM calls/query 1")
+    print(f"agent graph  {summarize(agent_times)}  LLM calls/query {statistics.mean(agent_calls):.1f}")
+    print(f"speedup      {statistics.mean(agent_times) / statistics.mean(fast_times):.2f}x (mean)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare fast-path and agent-graph latency")
+    parser.add_argument("--paper-id", required=True, help="Indexed paper to ask about")
+    parser.add_argument("--queries", help="Text file with one question per line")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    
+    queries = DEFAULT_QUERIES
+    if args.queries:
+        with open(args.queries) as f:
+            queries = [line.strip() for line in f if line.strip()]
+    
+    asyncio.run(run(queries, args.paper_id, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
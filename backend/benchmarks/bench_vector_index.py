@@ -0,0 +1,161 @@
+"""
+Recall, latency and memory of the vector store backends behind ChromaDBManager.query
+
+Usage:
+    python -m benchmarks.bench_vector_index [--chunks 200000] [--dim 384] [--queries 200]
+        [--stores chroma flat ivf] [--nprobe 8 16 32 64] [--embeddings vectors.npy]
+
+Builds each store from the same vectors (synthetic clustered unit vectors, or
+an .npy of real embeddings), then times ChromaDBManager.query for every query
+and reports recall@k against exact search, p50/p95 latency, and bytes per
+vector: what the store keeps in RAM to answer queries, and its size on disk.
+Chunks carry the metadata ChromaDBManager.add_chunks writes (paper id, page,
+section, heading, chunk and file hashes). RAM for the flat and IVF stores is
+their resident_bytes() (ids, metadata, IVF codes and lists) after reopening;
+the flat store also counts its float32 vectors, since every query reads all of
+them. The Chroma figure is an estimate (float32 vector plus HNSW links at
+M=16, metadata left in SQLite). The IVF store is measured once per --nprobe
+value.
+"""
+import argparse
+import hashlib
+import os
+import statistics
+import tempfile
+import time
+import uuid
+
+import numpy as np
+
+from app.db.chroma import ChromaDBManager
+from app.db.flat_store import FlatVectorStore
+from app.db.ivf_store import IVFVectorStore
+from app.db.vector_store import ChromaVectorStore
+
+BATCH = 5000
+HNSW_M = 16
+
+
+def synthetic_vectors(count, dim, clusters, spread, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, count)] + spread * rng.normal(size=(count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def exact_top(vectors, queries, k):
+    scores = vectors @ queries.T
+    return [set(np.argsort(-scores[:, q])[:k].tolist()) for q in range(len(queries))]
+
+
+def directory_bytes(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def resident_bytes(store, dim):
+    if isinstance(store, IVFVectorStore):
+        return store.resident_bytes()
+    if isinstance(store, FlatVectorStore):
+        return store.resident_bytes() + store.count() * dim * 4
+    return store.count() * (dim * 4 + 2 * HNSW_M * 4)
+
+
+def chunk_metadata(row, papers):
+    """Metadata shaped like ChromaDBManager.add_chunks writes"""
+    paper = row % papers
+    return {
+        "page_number": row // papers // 20 + 1,
+        "section": ("abstract", "introduction", "methods", "results", "discussion")[row // papers % 5],
+        "paper_id": str(uuid.uuid5(uuid.NAMESPACE_URL, f"paper-{paper}")),
+        "chunk_hash": hashlib.sha256(f"chunk {row}".encode()).hexdigest(),
+        "file_hash": hashlib.sha256(f"file {paper}".encode()).hexdigest(),
+        "heading": f"{row // papers // 8 + 1}. Heading"
+    }
+
+
+def open_store(name, path, args):
+    if name == "chroma":
+        return ChromaVectorStore(path, "benchmark")
+    if name == "flat":
+        return FlatVectorStore(path)
+    return IVFVectorStore(path, nlist=args.nlist, rescore=args.rescore, min_train=min(args.chunks, 10000))
+
+
+def build(name, path, vectors, args):
+    store = open_store(name, path, args)
+    started = time.perf_counter()
+    for i in range(0, len(vectors), BATCH):
+        rows = range(i, min(i + BATCH, len(vectors)))
+        store.upsert(
+            ids=[f"{row:036d}" for row in rows],  # as long as the uuids ingestion uses
+            embeddings=vectors[i:i + BATCH].tolist(),
+            documents=[f"chunk {row}" for row in rows],
+            metadatas=[chunk_metadata(row, args.papers) for row in rows]
+        )
+    store.save()
+    seconds = time.perf_counter() - started
+    # Reopen, so RAM is measured as a restarted server would hold it
+    return open_store(name, path, args), seconds
+
+
+def measure(manager, queries, truth, k):
+    latencies, recalls = [], []
+    manager.query(queries[0].tolist(), top_k=k)  # warm up
+    for query, expected in zip(queries, truth):
+        started = time.perf_counter()
+        chunks = manager.query(query.tolist(), top_k=k)
+        latencies.append(time.perf_counter() - started)
+        recalls.append(len(expected & {int(chunk["chunk_id"]) for chunk in chunks}) / k)
+    ordered = sorted(latencies)
+    p95 = ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+    return statistics.mean(recalls), statistics.median(ordered), p95
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stores", nargs="+", default=["chroma", "flat", "ivf"], choices=["chroma", "flat", "ivf"])
+    parser.add_argument("--chunks", type=int, default=200000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=1000, help="centers of the synthetic vectors")
+    parser.add_argument("--spread", type=float, default=1.5, help="noise around the centers, relative to their scale")
+    parser.add_argument("--papers", type=int, default=500)
+    parser.add_argument("--embeddings", help=".npy of real embeddings to use instead of synthetic vectors")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--nlist", type=int, default=0)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[8, 16, 32, 64])
+    parser.add_argument("--rescore", type=int, default=200)
+    args = parser.parse_args()
+
+    if args.embeddings:
+        vectors = np.load(args.embeddings).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        args.chunks, args.dim = vectors.shape
+    else:
+        vectors = synthetic_vectors(args.chunks, args.dim, args.clusters, args.spread)
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(len(vectors), args.queries, replace=False)]
+    queries = queries + rng.normal(size=queries.shape).astype(np.float32) / np.sqrt(args.dim)
+    truth = exact_top(vectors, queries, args.k)
+
+    print(f"{args.chunks} vectors of dim {args.dim}, {args.queries} queries, recall@{args.k} against exact search")
+    print(f"{'store':<16}{'recall':>8}{'p50 ms':>9}{'p95 ms':>9}{'RAM B/vec':>11}{'disk B/vec':>12}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for name in args.stores:
+            store, seconds = build(name, os.path.join(workdir, name), vectors, args)
+            manager = ChromaDBManager()
+            manager._store = store
+            ram = resident_bytes(store, args.dim) / args.chunks
+            disk = directory_bytes(os.path.join(workdir, name)) / args.chunks
+            print(f"({name} built in {seconds:.1f} s)")
+            for nprobe in args.nprobe if name == "ivf" else [None]:
+                label = name
+                if nprobe is not None:
+                    store.nprobe = nprobe
+                    label = f"ivf nprobe={nprobe}"
+                recall, p50, p95 = measure(manager, queries, truth, args.k)
+                print(f"{label:<16}{recall:>8.3f}{p50 * 1000:>9.2f}{p95 * 1000:>9.2f}{ram:>11.0f}{disk:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+
+import os
+from app.db.bm25 import BM25Index, tokenize
+from app.core.retrieval import reciprocal_rank_fusion
+
+def build_index(path=None):
+    index = BM25Index(path)
+    index.add([
+        {"chunk_id": "c1", "paper_id": "p1", "text": "We evaluate on SQuAD v2 and report F1."},
+        {"chunk_id": "c2", "paper_id": "p1", "text": "The model is trained with a contrastive objective."},
+        {"chunk_id": "c3", "paper_id": "p2", "text": "Results on SQuAD improve over GPT-4 baselines."},
+    ])
+    return index
+
+def test_compound_terms_match_whole_and_in_parts():
+    assert tokenize("GPT-4 on SQuAD") == ["gpt-4", "gpt", "4", "squad"]
+    
+    index = build_index()
+    
+    assert index.search("gpt-4")[0][0] == "c3"
+    assert {chunk_id for chunk_id, _ in index.search("SQuAD")} == {"c1", "c3"}
+    assert [chunk_id for chunk_id, _ in index.search("SQuAD", paper_ids=["p2"])] == ["c3"]
+
+def test_incremental_updates_and_persistence(tmp_path):
+    path = str(tmp_path / "bm25.pkl")
+    index = build_index(path)
+    index.remove_paper("p1")
+    index.add([{"chunk_id": "c3", "paper_id": "p2", "text": "Rewritten chunk about ResNet-50."}])
+    index.save()
+    
+    loaded = BM25Index.load(path)
+    
+    assert len(loaded) == 1
+    assert loaded.search("squad") == []
+    assert loaded.search("resnet-50")[0][0] == "c3"
+    assert loaded.total_length == index.total_length
+    assert loaded.paper_docs == {"p2": {"c3"}}
+
+def test_saves_append_deltas_and_merge_other_processes(tmp_path):
+    path = str(tmp_path / "bm25.pkl")
+    api = BM25Index(path, compact_ratio=10)
+    api.add([
+        {"chunk_id": "c1", "paper_id": "p1", "text": "We evaluate on SQuAD v2 and report F1."},
+        {"chunk_id": "c2", "paper_id": "p1", "text": "The model is trained with a contrastive objective."},
+    ])
+    api.compact()
+    snapshot = os.stat(path).st_ino
+    bulk = BM25Index.load(path)
+    bulk.compact_ratio = 10
+    
+    bulk.add([{"chunk_id": "c4", "paper_id": "p3", "text": "Bulk ingested chunk about ViT."}])
+    bulk.save()
+    api.remove(["c2"])
+    api.save()
+    
+    assert os.stat(path).st_ino == snapshot  # only the log was written
+    assert api.search("vit")[0][0] == "c4"
+    assert bulk.search("contrastive") == []
+    assert sorted(BM25Index.load(path).doc_terms) == ["c1", "c4"]
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    dense = [{"chunk_id": "a"}, {"chunk_id": "b"}, {"chunk_id": "c"}]
+    keyword = [{"chunk_id": "b"}, {"chunk_id": "c"}]
+    
+    fused = reciprocal_rank_fusion([dense, keyword], k=60, limit=2)
+    
+    assert [chunk["chunk_id"] for chunk in fused] == ["b", "c"]
+    assert fused[0]["rrf_score"] > fused[1]["rrf_score"]
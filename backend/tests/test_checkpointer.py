@@ -0,0 +1,74 @@
+
+import asyncio
+import operator
+from typing import Annotated, List, TypedDict
+from unittest.mock import patch
+from langgraph.graph import StateGraph, START, END
+from app.agents.checkpointer import BoundedMemorySaver
+
+class CounterState(TypedDict):
+    steps: Annotated[List[int], operator.add]
+
+def build_graph(checkpointer):
+    workflow = StateGraph(CounterState)
+    workflow.add_node("a", lambda state: {"steps": [1]})
+    workflow.add_node("b", lambda state: {"steps": [2]})
+    workflow.add_edge(START, "a")
+    workflow.add_edge("a", "b")
+    workflow.add_edge("b", END)
+    return workflow.compile(checkpointer=checkpointer)
+
+def run(graph, thread_id):
+    return graph.invoke({"steps": []}, config={"configurable": {"thread_id": thread_id}})
+
+def test_threads_are_isolated_and_history_is_capped():
+    saver = BoundedMemorySaver(max_checkpoints=2)
+    graph = build_graph(saver)
+    
+    for _ in range(3):
+        run(graph, "t1")
+    assert run(graph, "t2") == {"steps": [1, 2]}
+    
+    assert len(saver.storage["t1"][""]) == 2
+    # Still resumable: the latest state accumulates across turns of the same thread
+    assert run(graph, "t1")["steps"] == [1, 2] * 4
+    # Only blobs that the remaining checkpoints reference are kept
+    referenced = {
+        ("t1", "", channel, version)
+        for saved, _, _ in saver.storage["t1"][""].values()
+        for channel, version in saver.serde.loads_typed(saved)["channel_versions"].items()
+    }
+    assert {key for key in saver.blobs if key[0] == "t1"} <= referenced
+
+def test_lru_and_ttl_eviction():
+    saver = BoundedMemorySaver(max_threads=2, ttl_seconds=60)
+    graph = build_graph(saver)
+    for thread_id in ("t1", "t2", "t3"):
+        run(graph, thread_id)
+    
+    assert set(saver.storage) == {"t2", "t3"}
+    assert not any(key[0] == "t1" for key in list(saver.blobs) + list(saver.writes))
+    
+    with patch("app.agents.checkpointer.time.monotonic", return_value=saver.last_used["t3"] + 61):
+        assert graph.get_state({"configurable": {"thread_id": "t3"}}).values == {}
+    assert "t3" not in saver.storage
+    assert saver.stats()["evicted_threads"] == 2
+
+def test_sqlite_checkpointer_prunes(tmp_path):
+    from app.agents.sqlite_checkpointer import open_sqlite_checkpointer
+    
+    async def scenario():
+        saver = await open_sqlite_checkpointer(str(tmp_path / "checkpoints.sqlite3"), max_checkpoints=2, max_threads=1)
+        graph = build_graph(saver)
+        config = {"configurable": {"thread_id": "t1"}}
+        for _ in range(2):
+            await graph.ainvoke({"steps": []}, config=config)
+        saver._last_sweep = 0.0
+        await graph.ainvoke({"steps": []}, config={"configurable": {"thread_id": "t2"}})
+        
+        async with saver.conn.execute("SELECT thread_id, COUNT(*) FROM checkpoints GROUP BY thread_id") as cursor:
+            counts = dict(await cursor.fetchall())
+        await saver.conn.close()
+        return counts
+    
+    assert asyncio.run(scenario()) == {"t2": 2}
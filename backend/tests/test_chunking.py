@@ -0,0 +1,38 @@
+
+from app.core.chunking import SemanticChunker, TokenCounter
+
+def make_chunker(chunk_size=20, overlap=10):
+    return SemanticChunker(chunk_size=chunk_size, overlap=overlap, max_tokens=30, token_counter=TokenCounter())
+
+def token_count(text):
+    return TokenCounter().counts([text])[0]
+
+def test_chunks_fit_the_token_budget_and_overlap():
+    text = " ".join(f"Sentence number {i} has a few words in it." for i in range(40))
+    
+    chunks = make_chunker().chunk_text(text, page_number=1, section="Methods", paper_id="p1")
+    
+    assert len(chunks) > 1
+    assert all(token_count(chunk["text"]) <= 20 for chunk in chunks)
+    for previous, current in zip(chunks, chunks[1:]):
+        last_sentence = previous["text"].split(". ")[-1]
+        assert current["text"].startswith(last_sentence)
+    assert chunks[-1]["text"].endswith("Sentence number 39 has a few words in it.")
+
+def test_long_sentence_is_split_at_token_boundaries():
+    text = "Intro. " + " ".join(f"word{i}" for i in range(100)) + " end."
+    
+    chunks = make_chunker(chunk_size=25, overlap=0).chunk_text(text, page_number=2, section="Results", paper_id="p1")
+    
+    assert all(token_count(chunk["text"]) <= 25 for chunk in chunks)
+    joined = " ".join(chunk["text"] for chunk in chunks)
+    assert joined.split() == text.split()
+
+def test_budget_is_capped_at_model_length_and_ids_are_stable():
+    chunker = SemanticChunker(chunk_size=1000, overlap=50, max_tokens=30, token_counter=TokenCounter())
+    assert chunker.chunk_size == 30
+    
+    first = chunker.chunk_text("A short page. Another sentence.", 1, "Abstract", "p1")
+    second = chunker.chunk_text("A short page. Another sentence.", 1, "Abstract", "p1")
+    assert [c["chunk_id"] for c in first] == [c["chunk_id"] for c in second]
+    assert chunker.chunk_text("   ", 1, "Abstract", "p1") == []
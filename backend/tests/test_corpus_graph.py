@@ -0,0 +1,71 @@
+
+from app.core.concepts import ConceptCounter
+from app.core.corpus_graph import CorpusGraph
+from app.db.registry import PaperRegistry
+
+PAPERS = {
+    "p1": ["BLEU and beam-search", "BLEU with self-attention", "beam-search only"],
+    "p2": ["BLEU and self-attention", "self-attention with beam-search and BLEU"],
+}
+
+def make_graph(tmp_path):
+    registry = PaperRegistry(str(tmp_path / "papers.sqlite3"))
+    graph = CorpusGraph(registry)
+    for paper_id, texts in PAPERS.items():
+        concepts = ConceptCounter()
+        for text in texts:
+            concepts.add_text(text)
+        graph.update_paper(paper_id, concepts.chunks)
+    return registry, graph
+
+def edge_weights(result):
+    return {frozenset((edge["source"], edge["target"])): edge["weight"] for edge in result["edges"]}
+
+def test_cooccurrence_across_papers_matches_chunk_counts(tmp_path):
+    _, graph = make_graph(tmp_path)
+    
+    result = graph.build()
+    
+    sizes = {node["id"]: (node["size"], node["papers"]) for node in result["nodes"]}
+    assert sizes == {"BLEU": (4, 2), "beam-search": (3, 2), "self-attention": (3, 2)}
+    assert edge_weights(result) == {
+        frozenset(("BLEU", "beam-search")): 2,
+        frozenset(("BLEU", "self-attention")): 3,
+        frozenset(("beam-search", "self-attention")): 1,
+    }
+    assert (result["papers"], result["chunks"]) == (2, 5)
+
+def test_filter_top_k_and_min_weight(tmp_path):
+    _, graph = make_graph(tmp_path)
+    
+    only_p1 = graph.build(["p1"])
+    assert edge_weights(only_p1) == {frozenset(("BLEU", "beam-search")): 1, frozenset(("BLEU", "self-attention")): 1}
+    
+    top_two = graph.build(top_k=2)
+    assert [node["id"] for node in top_two["nodes"]] == ["BLEU", "beam-search"]
+    assert edge_weights(top_two) == {frozenset(("BLEU", "beam-search")): 2}
+    assert graph.build(min_weight=3)["edges"] == [{"source": "BLEU", "target": "self-attention", "weight": 3}]
+
+def test_reloads_from_registry_and_drops_removed_papers(tmp_path):
+    registry, graph = make_graph(tmp_path)
+    assert graph.build(["p1", "p2"]) is graph.build(["p2", "p1"])
+    
+    registry.delete("p2")
+    graph.remove_paper("p2")
+    reloaded = CorpusGraph(registry)
+    
+    assert reloaded.build() == graph.build()
+    assert reloaded.build()["papers"] == 1
+
+def test_unknown_paper_graph_request_writes_nothing(tmp_path):
+    from unittest.mock import patch
+    from app.api import graph as graph_api
+    
+    registry, graph = make_graph(tmp_path)
+    with patch.object(graph_api, "chroma_db") as chroma_db, \
+            patch.object(graph_api, "paper_registry", registry), \
+            patch.object(graph_api, "corpus_graph", graph):
+        chroma_db.get_paper_chunks.return_value = []
+        assert graph_api.index_stored_paper("not-a-paper") is None
+    
+    assert "not-a-paper" not in registry.load_incidence()
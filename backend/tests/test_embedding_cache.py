@@ -0,0 +1,57 @@
+
+import numpy as np
+from app.core.embedding_cache import EmbeddingCache
+
+def test_roundtrip_and_counters(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"), model_name="model-a")
+    
+    assert cache.get_many(["hello"]) == [None]
+    cache.put_many(["hello"], [np.array([1.0, 2.0, 3.0])])
+    
+    vector = cache.get_many(["hello"])[0]
+    assert np.allclose(vector, [1.0, 2.0, 3.0])
+    assert vector.dtype == np.float32
+    
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["memory_hits"] == 1
+
+def test_persists_across_instances_and_isolates_models(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    EmbeddingCache(path, model_name="model-a").put_many(["hello"], [[0.5, 0.5]])
+    
+    reopened = EmbeddingCache(path, model_name="model-a")
+    assert np.allclose(reopened.get_many(["hello"])[0], [0.5, 0.5])
+    assert reopened.stats()["memory_hits"] == 0  # served from disk
+    
+    other_model = EmbeddingCache(path, model_name="model-b")
+    assert other_model.get_many(["hello"]) == [None]
+
+def test_evicts_least_recently_used(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = EmbeddingCache(path, model_name="m", max_entries=2, memory_entries=1)
+    cache.put_many(["a"], [[1.0]])
+    cache.put_many(["b"], [[2.0]])
+    cache.get_many(["a"])  # touch "a" so "b" is the oldest
+    cache.put_many(["c"], [[3.0]])
+    
+    assert cache.stats()["disk_entries"] == 2
+    fresh = EmbeddingCache(path, model_name="m")
+    a, b, c = fresh.get_many(["a", "b", "c"])
+    assert a is not None and c is not None
+    assert b is None
+
+def test_memory_hits_protect_entries_from_eviction(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = EmbeddingCache(path, model_name="m", max_entries=2)
+    cache.put_many(["a", "b"], [[1.0], [2.0]])
+    cache.put_many(["b"], [[2.0]])  # already stored: rewritten, not counted twice
+    assert cache.get_many(["a"])[0] is not None and cache.stats()["memory_hits"] == 1
+    cache.put_many(["c"], [[3.0]])
+    
+    fresh = EmbeddingCache(path, model_name="m")
+    a, b, c = fresh.get_many(["a", "b", "c"])
+    assert a is not None and c is not None
+    assert b is None
+    assert cache.stats()["disk_entries"] == fresh.stats()["disk_entries"] == 2
@@ -0,0 +1,31 @@
+import asyncio
+import threading
+from typing import TypedDict
+from langgraph.graph import StateGraph, START, END
+from app.core.executors import install_default_executor, run_db, run_model
+
+def test_blocking_work_runs_on_its_own_pool():
+    async def main():
+        return await run_model(lambda: threading.current_thread().name), await run_db(lambda: threading.current_thread().name)
+    
+    model_thread, db_thread = asyncio.run(main())
+    assert model_thread.startswith("model") and db_thread.startswith("db")
+
+def test_sync_graph_nodes_run_on_the_llm_pool():
+    class State(TypedDict):
+        thread: str
+    
+    def node(state: State):
+        return {"thread": threading.current_thread().name}
+    
+    workflow = StateGraph(State)
+    workflow.add_node("node", node)
+    workflow.add_edge(START, "node")
+    workflow.add_edge("node", END)
+    graph = workflow.compile()
+    
+    async def main():
+        install_default_executor()
+        return await graph.ainvoke({"thread": ""})
+    
+    assert asyncio.run(main())["thread"].startswith("llm")
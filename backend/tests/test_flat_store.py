@@ -0,0 +1,114 @@
+import numpy as np
+import pytest
+from app.db import flat_store
+from app.db.flat_store import FlatVectorStore
+
+def make_chunks(count, paper_id, dim=8, seed=0):
+    rng = np.random.default_rng(seed)
+    ids = [f"{paper_id}-{i}" for i in range(count)]
+    embeddings = rng.normal(size=(count, dim)).astype(np.float32)
+    documents = [f"chunk {i} of {paper_id} ü" for i in range(count)]
+    metadatas = [{"paper_id": paper_id, "page_number": i // 3 + 1, "section": "methods" if i % 2 else "results"} for i in range(count)]
+    return ids, embeddings, documents, metadatas
+
+def exact_top(embeddings, query, k):
+    normalized = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return list(np.argsort(-(normalized @ (query / np.linalg.norm(query))))[:k])
+
+def test_query_is_exact_cosine_top_k_within_the_filter(tmp_path):
+    store = FlatVectorStore(str(tmp_path), initial_capacity=4)
+    ids_a, embeddings_a, documents_a, metadatas_a = make_chunks(30, "a", seed=1)
+    ids_b, embeddings_b, documents_b, metadatas_b = make_chunks(20, "b", seed=2)
+    store.upsert(ids_a, embeddings_a.tolist(), documents_a, metadatas_a)
+    store.upsert(ids_b, embeddings_b.tolist(), documents_b, metadatas_b)
+    query = np.random.default_rng(3).normal(size=8).astype(np.float32)
+    
+    everything = store.query([query.tolist()], n_results=5)
+    expected = exact_top(np.vstack([embeddings_a, embeddings_b]), query, 5)
+    assert everything["ids"][0] == [(ids_a + ids_b)[i] for i in expected]
+    assert everything["distances"][0] == sorted(everything["distances"][0])
+    
+    only_b = store.query([query.tolist(), (-query).tolist()], n_results=3, where={"paper_id": {"$in": ["b"]}})
+    assert only_b["ids"][0] == [ids_b[i] for i in exact_top(embeddings_b, query, 3)]
+    assert only_b["ids"][1] == [ids_b[i] for i in exact_top(embeddings_b, -query, 3)]
+    assert only_b["metadatas"][0][0]["paper_id"] == "b" and only_b["documents"][0][0].endswith("of b ü")
+    
+    methods = store.get(where={"$and": [{"paper_id": "a"}, {"section": "methods"}]}, include=["metadatas"])
+    assert methods["ids"] == ids_a[1::2] and methods["documents"] is None
+    assert store.query([query.tolist()], n_results=5, where={"paper_id": "missing"})["ids"] == [[]]
+
+def test_upsert_delete_and_reopen(tmp_path):
+    store = FlatVectorStore(str(tmp_path), initial_capacity=8)
+    ids, embeddings, documents, metadatas = make_chunks(12, "a")
+    store.upsert(ids, embeddings.tolist(), documents, metadatas)
+    store.upsert(ids[:1], [embeddings[5].tolist()], ["rewritten"], [{"paper_id": "a", "page_number": 9, "chunk_hash": "h"}])
+    store.delete(ids=ids[10:])
+    assert store.count() == 10
+    
+    rewritten = store.get(ids=[ids[0]], include=["documents", "metadatas", "embeddings"])
+    assert rewritten["documents"] == ["rewritten"]
+    assert rewritten["metadatas"] == [{"paper_id": "a", "page_number": 9, "chunk_hash": "h"}]
+    np.testing.assert_allclose(rewritten["embeddings"][0], embeddings[5] / np.linalg.norm(embeddings[5]), rtol=1e-6)
+    
+    # Replayed from the log, then from a compacted snapshot
+    for _ in range(2):
+        reopened = FlatVectorStore(str(tmp_path), initial_capacity=8)
+        assert reopened.count() == 10
+        assert reopened.get(where={"chunk_hash": "h"})["ids"] == [ids[0]]
+        assert reopened.get(limit=3, offset=8, include=[])["ids"] == ids[8:10]
+        assert reopened.query([embeddings[3].tolist()], n_results=1)["ids"] == [[ids[3]]]
+        store.save()
+    assert (tmp_path / "CURRENT").read_text() == "1"
+
+def test_other_handles_see_writes_and_compaction(tmp_path):
+    writer = FlatVectorStore(str(tmp_path), initial_capacity=16)
+    reader = FlatVectorStore(str(tmp_path), initial_capacity=16)
+    ids, embeddings, documents, metadatas = make_chunks(40, "a")
+    writer.upsert(ids, embeddings.tolist(), documents, metadatas)
+    assert reader.query([embeddings[7].tolist()], n_results=1)["ids"] == [[ids[7]]]
+    
+    # Deleting most rows compacts the store into a new generation
+    writer.delete(where={"page_number": {"$in": list(range(1, 11))}})
+    assert writer.generation == 1 and writer.count() == 10
+    assert reader.count() == 10
+    assert reader.get(include=["documents"])["documents"] == documents[30:]
+    assert reader.query([embeddings[35].tolist()], n_results=2)["ids"][0][0] == ids[35]
+    
+    with pytest.raises(ValueError):
+        writer.upsert(["x"], [[1.0, 2.0]], ["wrong dimension"], [{"paper_id": "x"}])
+
+def test_high_cardinality_columns_and_id_lookup(tmp_path, monkeypatch):
+    monkeypatch.setattr(flat_store, "DICTIONARY_MAX_VALUES", 4)
+    store = FlatVectorStore(str(tmp_path), initial_capacity=8)
+    ids, embeddings, documents, metadatas = make_chunks(20, "a")
+    for i, metadata in enumerate(metadatas):
+        metadata["chunk_hash"] = f"hash-{i}"
+    store.upsert(ids, embeddings.tolist(), documents, metadatas)
+    assert store.kinds["chunk_hash"] == "bytes" and store.kinds["paper_id"] == "str"
+    
+    # A deleted id written again resolves to its new row, before and after the ids are re-sorted
+    store.delete(ids=[ids[3]])
+    store.upsert([ids[3]], [embeddings[3].tolist()], ["again"], [{"paper_id": "a", "chunk_hash": "hash-3"}])
+    store.upsert(["x" * 50], [embeddings[0].tolist()], ["long id"], [{"paper_id": "b"}])
+    for handle in (store, FlatVectorStore(str(tmp_path), initial_capacity=8)):
+        assert handle.get(ids=[ids[3], "missing"])["documents"] == ["again"]
+        assert handle.get(where={"chunk_hash": {"$in": ["hash-7", "hash-99"]}})["ids"] == [ids[7]]
+        assert handle.get(ids=["x" * 50], include=["metadatas"])["metadatas"] == [{"paper_id": "b"}]
+        assert handle.count() == 21
+        handle.save()
+    assert not store.texts and not store.recent_ids and store.resident_bytes() > 0
+
+def test_empty_store_returns_no_embeddings(tmp_path):
+    store = FlatVectorStore(str(tmp_path))
+    result = store.get(where={"chunk_hash": {"$in": ["h"]}}, include=["embeddings", "metadatas"])
+    assert result["ids"] == [] and result["metadatas"] == [] and len(result["embeddings"]) == 0
+
+def test_long_ingest_compacts_once_the_log_is_large(tmp_path):
+    store = FlatVectorStore(str(tmp_path), initial_capacity=8, max_log_bytes=2000)
+    for paper in range(10):
+        ids, embeddings, documents, metadatas = make_chunks(5, f"p{paper}", seed=paper)
+        store.upsert(ids, embeddings.tolist(), documents, metadatas)
+    
+    assert store.generation > 0 and store._log_offset <= 2000 and len(store.texts) < 50
+    assert store.count() == 50
+    assert FlatVectorStore(str(tmp_path)).get(ids=["p0-0", "p9-4"])["documents"] == ["chunk 0 of p0 ü", "chunk 4 of p9 ü"]
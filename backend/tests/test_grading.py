@@ -0,0 +1,51 @@
+
+import json
+from unittest.mock import MagicMock, patch
+from langchain_core.messages import HumanMessage, ToolMessage
+from app.agents.graph import grade_documents
+
+def retrieval_state(items):
+    tool_message = ToolMessage(content=json.dumps(items), tool_call_id="call-1", name="retrieve_tool", id="msg-1")
+    return {"messages": [HumanMessage(content="What optimizer is used?"), tool_message], "question": "What optimizer is used?"}
+
+def chunk(chunk_id, content, rerank_score=0.0):
+    return {"content": content, "chunk_id": chunk_id, "page_number": 1, "section": "Methods", "paper_id": "p1", "score": 0.5, "rerank_score": rerank_score}
+
+def test_irrelevant_chunks_are_dropped_not_the_whole_retrieval():
+    items = [chunk("c1", "We train with Adam."), chunk("c2", "Related work on vision."), chunk("c3", "Learning rate 3e-4 with AdamW.")]
+    
+    with patch("app.agents.graph.retrieval_grader") as mock_grader:
+        mock_grader.batch.return_value = [MagicMock(binary_score=grade) for grade in ("yes", "no", "yes")]
+        result = grade_documents(retrieval_state(items))
+    
+    inputs = mock_grader.batch.call_args.args[0]
+    assert [entry["document"] for entry in inputs] == [item["content"] for item in items]
+    assert mock_grader.batch.call_args.kwargs["config"]["max_concurrency"] > 1
+    
+    assert result["is_relevant"] is True
+    assert [doc.metadata["chunk_id"] for doc in result["documents"]] == ["c1", "c3"]
+    # The tool result is replaced in place so the agent only sees the relevant chunks
+    replacement = result["messages"][0]
+    assert replacement.id == "msg-1"
+    assert [item["chunk_id"] for item in json.loads(replacement.content)] == ["c1", "c3"]
+
+def test_rewrite_only_when_no_chunk_is_relevant():
+    items = [chunk("c1", "Unrelated."), chunk("c2", "Also unrelated.")]
+    
+    with patch("app.agents.graph.retrieval_grader") as mock_grader:
+        mock_grader.batch.return_value = [MagicMock(binary_score="no"), MagicMock(binary_score="no")]
+        result = grade_documents(retrieval_state(items))
+    
+    assert result == {"is_relevant": False}
+
+def test_confident_reranker_scores_skip_the_llm_grader():
+    items = [chunk("c1", "We train with Adam.", rerank_score=7.5), chunk("c2", "Adam betas are 0.9/0.999.", rerank_score=4.0)]
+    
+    with patch("app.agents.graph.settings.GRADER_SCORE_THRESHOLD", 3.0), \
+         patch("app.agents.graph.retrieval_grader") as mock_grader:
+        result = grade_documents(retrieval_state(items))
+    
+    mock_grader.batch.assert_not_called()
+    assert result["is_relevant"] is True
+    assert len(result["documents"]) == 2
+    assert "messages" not in result
@@ -0,0 +1,41 @@
+
+from app.core.concepts import ConceptCounter, extract_concepts_from_text, top_graph
+from app.db.registry import PaperRegistry
+
+TEXTS = [
+    "Neural Machine Translation uses self-attention. BLEU improves.",
+    "Neural Machine Translation with BLEU and beam-search.",
+    "BLEU and beam-search are compared.",
+]
+
+def test_counts_chunk_cooccurrence_once_per_pair():
+    concepts = ConceptCounter()
+    for text in TEXTS:
+        concepts.add_text(text)
+    
+    graph = concepts.to_graph(max_concepts=10)
+    names = [concept for concept, _ in graph["concepts"]]
+    assert names[0] == "BLEU" and dict(graph["concepts"])["BLEU"] == 3
+    weights = {frozenset((names[i], names[j])): weight for i, j, weight in graph["edges"]}
+    assert weights[frozenset(("BLEU", "beam-search"))] == 2
+    assert weights[frozenset(("BLEU", "Neural Machine Translation"))] == 2
+    assert frozenset(("self-attention", "beam-search")) not in weights
+
+def test_top_graph_keeps_edges_among_top_concepts_only():
+    graph = {"concepts": [["BLEU", 3], ["beam-search", 2], ["self-attention", 1]], "edges": [[0, 1, 2], [0, 2, 1]]}
+    
+    result = top_graph(graph, limit=2)
+    
+    assert [node["id"] for node in result["nodes"]] == ["BLEU", "beam-search"]
+    assert result["edges"] == [{"source": "BLEU", "target": "beam-search", "weight": 2}]
+
+def test_graph_is_stored_with_the_paper(tmp_path):
+    registry = PaperRegistry(str(tmp_path / "papers.sqlite3"))
+    concepts = ConceptCounter()
+    concepts.add_text(TEXTS[0])
+    registry.upsert("p1", filename="a.pdf")
+    registry.save_graph("p1", concepts.to_graph())
+    
+    assert registry.get_graph("p1")["concepts"][0][0] in extract_concepts_from_text(TEXTS[0])
+    registry.delete("p1")
+    assert registry.get_graph("p1") is None
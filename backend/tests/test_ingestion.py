@@ -0,0 +1,128 @@
+import asyncio
+import io
+import numpy as np
+import pytest
+from unittest.mock import patch
+from fastapi import UploadFile
+from app.api import ingest
+from app.core import ingestion
+from app.core.corpus_graph import CorpusGraph
+from app.db.bm25 import BM25Index
+from app.db.chroma import ChromaDBManager
+from app.db.flat_store import FlatVectorStore
+from app.db.registry import PaperRegistry
+from tests.test_pdf_parser import BODY, write_pdf
+
+def fake_embed_batch(texts, **kwargs):
+    rng = np.random.default_rng(len(texts))
+    return rng.normal(size=(len(texts), 8)).astype(np.float32).tolist()
+
+@pytest.fixture
+def flat_db(tmp_path):
+    """A ChromaDBManager over a fresh FlatVectorStore, in place of the app's"""
+    manager = ChromaDBManager()
+    manager._store = FlatVectorStore(str(tmp_path / "flat"))
+    manager._bm25 = BM25Index(str(tmp_path / "bm25.pkl"))
+    with patch.object(ingestion, "chroma_db", manager), \
+            patch.object(ingestion.embedding_model, "embed_batch", side_effect=fake_embed_batch):
+        yield manager
+
+def test_first_paper_is_stored_in_an_empty_flat_store(tmp_path, flat_db):
+    path = tmp_path / "paper.pdf"
+    write_pdf(path, [[("1 Introduction", 14, True), (BODY, 10, False)], [("2 Method", 14, True), (BODY, 10, False)]])
+    
+    result = ingestion.process_paper(str(path), "p1", file_hash="f1")
+    
+    assert result["total_pages"] == 2 and result["total_chunks"] > 0
+    assert flat_db.store.count() == len(flat_db.get_chunk_ids("p1")) == result["total_chunks"]
+    assert flat_db.find_paper(file_hash="f1") == "p1"
+
+def sentences(word, count):
+    return [(f"The {word} model number {i} is trained on text.", 10, False) for i in range(count)]
+
+def test_progress_counts_advance_page_by_page(tmp_path, flat_db):
+    path = tmp_path / "paper.pdf"
+    write_pdf(path, [[("1 Introduction", 14, True), *sentences("first", 8)], sentences("second", 8), sentences("third", 8)])
+    job = ingestion.IngestionJob("p1", "paper.pdf", str(path))
+    progress = []
+    
+    def embed_batch(texts, **kwargs):
+        progress.append((job.pages_done, job.chunks_total, job.chunks_embedded))
+        return fake_embed_batch(texts)
+    
+    with patch.object(ingestion.settings, "CHUNK_SIZE", 30), patch.object(ingestion.settings, "EMBED_BATCH_SIZE", 2), \
+            patch.object(ingestion.embedding_model, "embed_batch", side_effect=embed_batch):
+        result = ingestion.process_paper(str(path), "p1", job=job)
+    
+    assert job.total_pages == job.pages_done == 3
+    assert job.chunks_total == job.chunks_embedded == result["total_chunks"] == flat_db.store.count()
+    # Embedding starts before the later pages are parsed, and the counts only move forward
+    assert progress[0][0] == 0 and progress[0][1] == 2
+    assert progress == sorted(progress) and all(embedded < total for _, total, embedded in progress)
+
+def test_text_running_across_a_page_break_is_chunked_per_page(tmp_path, flat_db):
+    path = tmp_path / "paper.pdf"
+    write_pdf(path, [[("2 Method", 14, True), *sentences("first", 6)], sentences("second", 6)])
+    
+    with patch.object(ingestion.settings, "CHUNK_SIZE", 30):
+        ingestion.process_paper(str(path), "p1")
+    
+    chunks = flat_db.get_paper_chunks("p1")
+    assert {chunk["page_number"] for chunk in chunks} == {1, 2}
+    # The section continues onto the next page, but no chunk mixes text from both pages
+    assert {chunk["section"] for chunk in chunks} == {"Methods"}
+    for chunk in chunks:
+        assert ("first" in chunk["text"]) != ("second" in chunk["text"])
+        assert ("first" in chunk["text"]) == (chunk["page_number"] == 1)
+    assert len({chunk["chunk_id"] for chunk in chunks}) == len(chunks)
+
+@pytest.fixture
+def upload(tmp_path, flat_db):
+    """Upload a PDF through the API and wait for its ingestion job"""
+    registry = PaperRegistry(str(tmp_path / "papers.sqlite3"))
+    graph = CorpusGraph(registry)
+    jobs = ingestion.IngestionJobManager(max_workers=1)
+    (tmp_path / "uploads").mkdir()
+    
+    def upload_pdf(path, filename):
+        with open(path, "rb") as f:
+            response = asyncio.run(ingest.upload_paper(UploadFile(f, filename=filename), None))
+        jobs.executor.submit(lambda: None).result()  # the single worker has finished the job
+        job = jobs.get(response["job_id"]) if response["job_id"] else None
+        return response, job
+    
+    with patch.object(ingest, "UPLOAD_DIR", str(tmp_path / "uploads")), \
+            patch.object(ingest, "ingestion_jobs", jobs), \
+            patch.object(ingest, "chroma_db", flat_db), \
+            patch.object(ingest, "paper_registry", registry), \
+            patch.object(ingestion, "paper_registry", registry), \
+            patch.object(ingest, "corpus_graph", graph), \
+            patch.object(ingestion, "corpus_graph", graph):
+        yield upload_pdf
+
+def test_uploading_the_same_file_twice_returns_the_existing_paper(tmp_path, flat_db, upload):
+    path = tmp_path / "paper.pdf"
+    write_pdf(path, [[("1 Introduction", 14, True), *sentences("first", 4)]])
+    
+    first, job = upload(path, "paper.pdf")
+    assert job.status == "completed" and job.chunks_embedded > 0
+    count = flat_db.store.count()
+    
+    second, job = upload(path, "renamed.pdf")
+    assert second == {"job_id": None, "paper_id": first["paper_id"], "filename": "renamed.pdf", "status": "duplicate"}
+    assert flat_db.store.count() == count
+
+def test_new_arxiv_version_reuses_unchanged_vectors(tmp_path, flat_db, upload):
+    v1, v2 = tmp_path / "2301.12345v1.pdf", tmp_path / "2301.12345v2.pdf"
+    write_pdf(v1, [[("1 Introduction", 14, True), *sentences("first", 4)], sentences("second", 4)])
+    write_pdf(v2, [[("1 Introduction", 14, True), *sentences("first", 4)], sentences("revised", 4)])
+    
+    first, job = upload(v1, v1.name)
+    unchanged = len([chunk for chunk in flat_db.get_paper_chunks(first["paper_id"]) if chunk["page_number"] == 1])
+    
+    second, job = upload(v2, v2.name)
+    assert second["revision"] and second["paper_id"] == first["paper_id"]
+    assert job.status == "completed" and job.chunks_reused == unchanged < job.chunks_embedded
+    chunks = flat_db.get_paper_chunks(first["paper_id"])
+    assert flat_db.store.count() == len(chunks) == job.chunks_embedded
+    assert not any("second" in chunk["text"] for chunk in chunks)
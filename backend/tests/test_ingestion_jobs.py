@@ -0,0 +1,132 @@
+import asyncio
+import io
+import threading
+import pytest
+from unittest.mock import patch
+from fastapi import UploadFile
+from app.core.ingestion import IngestionJob, IngestionJobManager
+
+RESULT = {"total_pages": 1, "total_chunks": 1, "text_chars": 4, "graph": {}, "chunk_concepts": {}, "outline": []}
+
+def test_job_status_moves_from_queued_to_completed(tmp_path):
+    manager = IngestionJobManager(max_workers=1, max_pending=2)
+    release = threading.Event()
+    seen = []
+    
+    def process_paper(file_path, paper_id, job, **kwargs):
+        seen.append(job.status)
+        release.wait(5)
+        return RESULT
+    
+    uploads = []
+    for name in ("a", "b"):
+        upload = tmp_path / f"{name}.upload"
+        upload.write_bytes(b"%PDF")
+        uploads.append(upload)
+    with patch("app.core.ingestion.chroma_db"), \
+            patch("app.core.ingestion.paper_registry") as paper_registry, \
+            patch("app.core.ingestion.corpus_graph"), \
+            patch("app.core.ingestion.process_paper", side_effect=process_paper):
+        first = manager.submit(str(uploads[0]), "a", "a.pdf", final_path=str(tmp_path / "a.pdf"), file_hash="ha")
+        second = manager.submit(str(uploads[1]), "b", "b.pdf", final_path=str(tmp_path / "b.pdf"), file_hash="hb")
+        # One worker: the second job waits while the first runs, and the queue is now full
+        while first.status == "queued":
+            release.wait(0.01)
+        assert (first.status, second.status) == ("running", "queued")
+        assert manager.find_active("hb") is second and manager.pending_count() == 2
+        with pytest.raises(RuntimeError):
+            manager.submit(str(uploads[0]), "c", "c.pdf")
+        
+        release.set()
+        manager.executor.shutdown(wait=True)
+    
+    assert seen == ["running", "running"]
+    assert [job.status for job in (first, second)] == ["completed", "completed"]
+    assert first.stage == "done" and first.finished_at and manager.get(first.job_id) is first
+    assert manager.find_active("ha") is None and manager.pending_count() == 0
+    assert (tmp_path / "a.pdf").exists() and not uploads[0].exists()
+    statuses = [call.kwargs["status"] for call in paper_registry.upsert.call_args_list if call.args[0] == "a"]
+    assert statuses == ["processing", "ready"]
+
+def test_failed_new_paper_is_rolled_back(tmp_path):
+    upload = tmp_path / "paper.upload"
+    upload.write_bytes(b"%PDF")
+    job = IngestionJob("p", "paper.pdf", str(upload), final_path=str(tmp_path / "p.pdf"), file_hash="h")
+    
+    with patch("app.core.ingestion.chroma_db") as chroma_db, \
+            patch("app.core.ingestion.paper_registry") as paper_registry, \
+            patch("app.core.ingestion.corpus_graph") as corpus_graph, \
+            patch("app.core.ingestion.process_paper", side_effect=RuntimeError("bad PDF")):
+        IngestionJobManager(max_workers=1)._run(job)
+    
+    assert (job.status, job.error) == ("failed", "bad PDF") and job.finished_at
+    chroma_db.delete_paper.assert_called_once_with("p")
+    paper_registry.delete.assert_called_once_with("p")
+    corpus_graph.remove_paper.assert_called_once_with("p")
+    assert not upload.exists() and not (tmp_path / "p.pdf").exists()
+
+def test_concurrent_upload_of_the_same_file_joins_the_active_job(tmp_path):
+    from app.api import ingest
+    
+    manager = IngestionJobManager(max_workers=1)
+    manager.executor.submit = lambda *args: None  # keep submitted jobs queued
+    with patch.object(ingest, "UPLOAD_DIR", str(tmp_path)), \
+            patch.object(ingest, "ingestion_jobs", manager), \
+            patch.object(ingest, "paper_registry") as paper_registry:
+        paper_registry.find_by_hash.return_value = None
+        first = asyncio.run(ingest.upload_paper(UploadFile(io.BytesIO(b"%PDF same"), filename="paper.pdf"), None))
+        second = asyncio.run(ingest.upload_paper(UploadFile(io.BytesIO(b"%PDF same"), filename="copy.pdf"), None))
+    
+    assert first["status"] == "queued"
+    assert second == {"job_id": first["job_id"], "paper_id": first["paper_id"], "filename": "copy.pdf", "status": "duplicate"}
+    assert sorted(path.name for path in tmp_path.iterdir()) == [f"{first['paper_id']}.pdf"]
+
+def test_failed_revision_drops_only_the_new_chunks(tmp_path):
+    upload = tmp_path / "revision.upload"
+    upload.write_bytes(b"%PDF")
+    job = IngestionJob("p", "2301.12345v2.pdf", str(upload), final_path=str(tmp_path / "p.pdf"), file_hash="new", revision=True)
+    stored = ["old-1", "old-2"]
+    
+    def process_paper(*args, **kwargs):
+        stored.append("new-1")
+        raise RuntimeError("embedding failed")
+    
+    with patch("app.core.ingestion.chroma_db") as chroma_db, \
+            patch("app.core.ingestion.paper_registry") as paper_registry, \
+            patch("app.core.ingestion.process_paper", side_effect=process_paper):
+        chroma_db.get_chunk_ids.side_effect = lambda paper_id: list(stored)
+        IngestionJobManager(max_workers=1)._run(job)
+    
+    assert job.status == "failed"
+    chroma_db.delete_chunks.assert_called_once_with(["new-1"])
+    chroma_db.delete_paper.assert_not_called()
+    paper_registry.delete.assert_not_called()
+    assert not upload.exists()
+
+def test_bulk_ingest_tags_arxiv_papers_with_their_source_id(tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+    from app import ingest_bulk
+    
+    source = tmp_path / "papers"
+    source.mkdir()
+    (source / "2301.12345v1.pdf").write_bytes(b"%PDF arxiv")
+    (source / "notes.pdf").write_bytes(b"%PDF other")
+    
+    def parse_and_chunk(pdf_path, paper_id, *args):
+        chunk = {"chunk_id": f"{paper_id}-0", "paper_id": paper_id, "text": "text", "chunk_hash": pdf_path}
+        return paper_id, pdf_path, 1, [chunk], {"graph": {}, "chunk_concepts": {}, "outline": []}
+    
+    with patch.object(ingest_bulk, "ProcessPoolExecutor", lambda max_workers, mp_context: ThreadPoolExecutor(max_workers)), \
+            patch.object(ingest_bulk, "parse_and_chunk", parse_and_chunk), \
+            patch.object(ingest_bulk.settings, "UPLOAD_DIR", str(tmp_path / "uploads")), \
+            patch("app.core.ingestion.embed_chunks", side_effect=lambda chunks: ([[0.0]] * len(chunks), 0)), \
+            patch("app.db.chroma.chroma_db") as chroma_db, \
+            patch("app.db.registry.paper_registry") as paper_registry, \
+            patch("app.core.corpus_graph.corpus_graph"):
+        paper_registry.find_by_hash.return_value = None
+        ingest_bulk.run(str(source), workers=1, batch_size=10, manifest_path=str(tmp_path / "manifest.jsonl"))
+    
+    stored = {chunk["chunk_hash"]: chunk.get("source_id") for call in chroma_db.add_chunks.call_args_list for chunk in call.args[0]}
+    assert stored == {str(source / "2301.12345v1.pdf"): "arxiv:2301.12345", str(source / "notes.pdf"): None}
+    registered = {call.kwargs["filename"]: call.kwargs["source_id"] for call in paper_registry.upsert.call_args_list}
+    assert registered == {"2301.12345v1.pdf": "arxiv:2301.12345", "notes.pdf": None}
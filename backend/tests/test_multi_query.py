@@ -0,0 +1,34 @@
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+from app.core import retrieval
+
+def chunk(chunk_id):
+    return {"chunk_id": chunk_id, "text": f"text {chunk_id}", "page_number": 1, "section": "Methods", "paper_id": "p1", "distance": 0.1}
+
+def test_variants_share_one_embedding_batch_one_search_and_one_rerank():
+    variants = ["what optimizer is used", "which optimizer trains the model", "optimizer choice"]
+    query_batch = MagicMock(return_value=[[chunk("a"), chunk("b")], [chunk("b"), chunk("c")], [chunk("b")]])
+    embed_batch = MagicMock(return_value=[[0.1, 0.2]] * 3)
+    rerank = MagicMock(side_effect=lambda query, chunks, top_k: [(c, 1.0) for c in chunks][:top_k])
+    
+    with patch.object(retrieval.settings, "MULTI_QUERY_ENABLED", True), \
+         patch.object(retrieval.settings, "RETRIEVAL_MODE", "dense"), \
+         patch.object(retrieval.settings, "RETRIEVAL_CACHE_ENABLED", False), \
+         patch.object(retrieval.query_expander, "expand_query", AsyncMock(return_value=variants)), \
+         patch.object(retrieval.embedding_model, "embed_batch", embed_batch), \
+         patch.object(retrieval.chroma_db, "query_batch", query_batch), \
+         patch.object(retrieval.reranker, "rerank", rerank):
+        results = asyncio.run(retrieval.retrieve("what optimizer is used", ["p1"]))
+    
+    embed_batch.assert_called_once()
+    assert embed_batch.call_args.args[0] == variants
+    query_batch.assert_called_once()
+    assert len(query_batch.call_args.kwargs["query_embeddings"]) == 3
+    
+    rerank.assert_called_once()
+    assert rerank.call_args.kwargs["query"] == "what optimizer is used"
+    reranked_ids = [c["chunk_id"] for c in rerank.call_args.kwargs["chunks"]]
+    assert reranked_ids[0] == "b"  # found by every variant, so it fuses highest
+    assert sorted(reranked_ids) == ["a", "b", "c"]  # deduplicated by chunk_id
+    assert len(results) == 3
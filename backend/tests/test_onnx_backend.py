@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("onnxruntime")
+pytest.importorskip("onnx")
+
+from app.core.onnx_backend import load_model, load_onnx_model
+
+TEXTS = [
+    "the model is trained on a large corpus of text",
+    "short",
+    "attention transformer query document relevant score " * 4,
+    "a",
+]
+WORDS = "a the model is trained on large corpus of text short attention transformer query document relevant score".split()
+
+@pytest.fixture(scope="module")
+def tiny_models(tmp_path_factory):
+    """A randomly initialised two-layer BERT as an embedder and as a cross-encoder, built offline"""
+    import torch
+    from sentence_transformers import models, SentenceTransformer
+    from transformers import BertConfig, BertForSequenceClassification, BertModel, BertTokenizerFast
+
+    root = tmp_path_factory.mktemp("models")
+    (root / "vocab.txt").write_text("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + WORDS))
+    tokenizer = BertTokenizerFast(vocab_file=str(root / "vocab.txt"))
+    config = dict(vocab_size=len(WORDS) + 5, hidden_size=32, num_hidden_layers=2, num_attention_heads=2,
+                  intermediate_size=64, max_position_embeddings=64)
+    torch.manual_seed(0)
+
+    BertModel(BertConfig(**config)).save_pretrained(root / "bert")
+    tokenizer.save_pretrained(root / "bert")
+    transformer = models.Transformer(str(root / "bert"), max_seq_length=64)
+    SentenceTransformer(modules=[transformer, models.Pooling(32, "mean"), models.Normalize()]).save(str(root / "embedder"))
+
+    BertForSequenceClassification(BertConfig(num_labels=1, **config)).save_pretrained(root / "cross_encoder")
+    tokenizer.save_pretrained(root / "cross_encoder")
+    return str(root / "embedder"), str(root / "cross_encoder"), str(root / "onnx")
+
+def test_embedding_backends_match_torch(tiny_models):
+    embedder, _, cache_dir = tiny_models
+    expected = load_model("sentence_transformer", embedder).encode(TEXTS, convert_to_numpy=True)
+
+    onnx = load_onnx_model("sentence_transformer", embedder, "onnx", cache_dir).encode(TEXTS, batch_size=3)
+    int8 = load_onnx_model("sentence_transformer", embedder, "onnx-int8", cache_dir).encode(TEXTS, batch_size=3)
+
+    assert onnx.shape == expected.shape
+    np.testing.assert_allclose(onnx, expected, atol=1e-4)
+    # Normalized embeddings, so the row-wise dot product is the cosine similarity
+    assert (int8 * expected).sum(axis=1).min() > 0.99
+
+def test_reranker_backends_match_torch(tiny_models):
+    _, cross_encoder, cache_dir = tiny_models
+    pairs = [("which model is trained", text) for text in TEXTS]
+    expected = np.asarray(load_model("cross_encoder", cross_encoder).predict(pairs))
+
+    onnx = load_onnx_model("cross_encoder", cross_encoder, "onnx", cache_dir).predict(pairs, batch_size=3)
+    int8 = load_onnx_model("cross_encoder", cross_encoder, "onnx-int8", cache_dir).predict(pairs, batch_size=3)
+
+    assert onnx.shape == expected.shape
+    np.testing.assert_allclose(onnx, expected, atol=1e-4)
+    np.testing.assert_allclose(int8, expected, atol=0.02)
+
+def test_export_is_cached(tiny_models, monkeypatch):
+    embedder, _, cache_dir = tiny_models
+    load_onnx_model("sentence_transformer", embedder, "onnx-int8", cache_dir)
+
+    def export_again(*args, **kwargs):
+        raise AssertionError("exported twice")
+
+    monkeypatch.setattr("app.core.onnx_backend.export_model", export_again)
+    monkeypatch.setattr("app.core.onnx_backend.quantize_model", export_again)
+    assert load_onnx_model("sentence_transformer", embedder, "onnx-int8", cache_dir).encode(["a"]).shape == (1, 32)
+    with pytest.raises(ValueError):
+        load_onnx_model("sentence_transformer", embedder, "tensorrt", cache_dir)
@@ -0,0 +1,64 @@
+import fitz
+from app.core.pdf_parser import PDFParser, classify_heading
+from app.db.registry import PaperRegistry
+
+BODY = "The model is trained on a large corpus of text."
+
+def write_pdf(path, pages):
+    """pages: list of [(text, fontsize, bold), ...] lines"""
+    doc = fitz.open()
+    for lines in pages:
+        page = doc.new_page()
+        y = 72
+        for text, size, bold in lines:
+            page.insert_text((72, y), text, fontsize=size, fontname="hebo" if bold else "helv")
+            y += size * 2.5
+    doc.save(str(path))
+    doc.close()
+
+def test_classify_heading_strips_numbering():
+    assert classify_heading("3.2 Experimental Setup") == "Results"
+    assert classify_heading("II. RELATED WORK") == "Background"
+    assert classify_heading("References") == "References"
+    assert classify_heading("Notation") is None
+
+def test_sections_change_mid_page_from_font_size(tmp_path):
+    path = tmp_path / "paper.pdf"
+    write_pdf(path, [
+        [("1 Introduction", 14, True), (BODY, 10, False), (BODY, 10, False),
+         ("2 Method", 14, True), (BODY, 10, False), (BODY, 10, False)],
+        [(BODY, 10, False), ("2.1 Training Details", 12, True), (BODY, 10, False),
+         ("References", 14, True), ("[1] A. Author. A paper. 2020.", 10, False)],
+    ])
+    
+    pages = list(PDFParser.iter_pages(str(path), mode="layout"))
+    
+    assert [segment["section"] for segment in pages[0]["segments"]] == ["Introduction", "Methods"]
+    assert pages[0]["segments"][1]["heading"] == "2 Method"
+    # A subsection keeps the enclosing section but starts a new segment under its own heading
+    assert [(s["section"], s["heading"]) for s in pages[1]["segments"]] == [
+        ("Methods", "2 Method"), ("Methods", "2.1 Training Details"), ("References", "References")
+    ]
+    assert [(h["level"], h["heading"]) for h in pages[1]["headings"]] == [(2, "2.1 Training Details"), (1, "References")]
+
+def test_keyword_mode_keeps_one_section_per_page(tmp_path):
+    path = tmp_path / "paper.pdf"
+    write_pdf(path, [[("Abstract", 14, True), (BODY, 10, False)]])
+    
+    pages = list(PDFParser.iter_pages(str(path), mode="keyword"))
+    
+    assert pages[0]["section"] == "Abstract"
+    assert len(pages[0]["segments"]) == 1 and pages[0]["headings"] == []
+
+def test_outline_is_stored_with_the_paper(tmp_path):
+    registry = PaperRegistry(str(tmp_path / "papers.sqlite3"))
+    outline = [
+        {"page_number": 1, "level": 1, "heading": "1 Introduction", "section": "Introduction"},
+        {"page_number": 2, "level": 2, "heading": "1.1 Scope", "section": "Introduction"},
+    ]
+    registry.upsert("p1", filename="a.pdf")
+    registry.save_outline("p1", outline)
+    
+    assert registry.get_outline("p1") == outline
+    registry.delete("p1")
+    assert registry.get_outline("p1") == []
@@ -0,0 +1,73 @@
+
+import asyncio
+from unittest.mock import AsyncMock, patch
+from app.core.query_expansion import QueryExpander
+from app.core.term_neighbors import TermNeighborIndex
+from app.db.bm25 import BM25Index
+
+VECTORS = {
+    "optimizer": [1.0, 0.0, 0.0, 0.0],
+    "adam": [0.9, 0.1, 0.0, 0.0],
+    "sgd": [0.8, 0.3, 0.0, 0.0],
+    "dataset": [0.0, 1.0, 0.0, 0.0],
+    "corpus": [0.0, 0.95, 0.1, 0.0],
+    "learning": [0.0, 0.0, 1.0, 0.0],
+}
+
+def fake_embed(texts):
+    return [VECTORS.get(text, [0.0, 0.0, 0.0, 1.0]) for text in texts]
+
+def build_index(tmp_path):
+    bm25 = BM25Index()
+    texts = ["adam optimizer dataset", "sgd optimizer corpus", "adam corpus learning", "sgd dataset learning"]
+    bm25.add({"chunk_id": str(i), "text": text, "paper_id": "p1"} for i, text in enumerate(texts))
+    index = TermNeighborIndex(path=str(tmp_path / "terms.npz"), min_similarity=0.6, embed=fake_embed)
+    index.refresh(bm25)
+    return index, bm25
+
+def test_local_expansion_swaps_terms_for_corpus_neighbours(tmp_path):
+    index, _ = build_index(tmp_path)
+    
+    variants = index.expand("Which optimizer is used?", num_variants=2)
+    
+    assert variants == ["Which optimizer is used?", "Which adam is used?", "Which sgd is used?"]
+    assert index.expand("nothing related", num_variants=2) == ["nothing related"]
+
+def test_refresh_embeds_only_new_terms_and_persists(tmp_path):
+    index, bm25 = build_index(tmp_path)
+    calls = []
+    index._embed = lambda texts: calls.append(list(texts)) or fake_embed(texts)
+    
+    bm25.add([{"chunk_id": "4", "text": "momentum dataset", "paper_id": "p2"}, {"chunk_id": "5", "text": "momentum corpus", "paper_id": "p2"}])
+    index.refresh(bm25)
+    
+    assert calls == [["momentum"]]
+    reloaded = TermNeighborIndex(path=index.path, embed=fake_embed)
+    assert reloaded.stats() == {"terms": len(index.terms)}
+    assert "momentum" in index.terms
+
+def test_llm_mode_is_cached_per_normalized_query():
+    expander = QueryExpander(mode="llm", cache_size=1)
+    llm = AsyncMock(return_value=["q", "v1"])
+    
+    with patch.object(expander, "expand_with_llm", llm):
+        first = asyncio.run(expander.expand_query("What is  BERT", 1))
+        second = asyncio.run(expander.expand_query("what is bert", 1))
+        asyncio.run(expander.expand_query("another question", 1))
+        asyncio.run(expander.expand_query("what is bert", 1))
+    
+    assert first == second == ["q", "v1"]
+    assert llm.await_count == 3
+
+def test_expansion_refreshes_only_after_the_corpus_changes(tmp_path):
+    index, bm25 = build_index(tmp_path)
+    calls = []
+    index._embed = lambda texts: calls.append(list(texts)) or fake_embed(texts)
+    
+    index.refresh_if_changed(bm25)
+    assert calls == []
+    
+    bm25.add([{"chunk_id": "4", "text": "momentum dataset", "paper_id": "p2"}, {"chunk_id": "5", "text": "momentum corpus", "paper_id": "p2"}])
+    index.refresh_if_changed(bm25)
+    index.refresh_if_changed(bm25)
+    assert calls == [["momentum"]]
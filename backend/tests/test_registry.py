@@ -0,0 +1,61 @@
+
+from unittest.mock import MagicMock
+import pytest
+from app.db.registry import PaperRegistry
+
+def make_registry(tmp_path, count=5):
+    registry = PaperRegistry(str(tmp_path / "papers.sqlite3"))
+    for i in range(count):
+        registry.upsert(
+            f"p{i}",
+            filename=f"paper_{i}.pdf",
+            status="ready" if i % 2 == 0 else "processing",
+            created_at=f"2026-01-0{i + 1}T00:00:00+00:00",
+            chunks_count=10 * i
+        )
+    return registry
+
+def test_cursor_pagination_walks_all_papers_newest_first(tmp_path):
+    registry = make_registry(tmp_path)
+    
+    pages, cursor = [], None
+    while True:
+        papers, cursor = registry.list(limit=2, cursor=cursor)
+        pages.append([paper["paper_id"] for paper in papers])
+        if cursor is None:
+            break
+    
+    assert pages == [["p4", "p3"], ["p2", "p1"], ["p0"]]
+    with pytest.raises(ValueError):
+        registry.list(cursor="not a cursor")
+
+def test_filters_and_upsert_keeps_created_at(tmp_path):
+    registry = make_registry(tmp_path)
+    
+    registry.upsert("p1", status="ready", chunks_count=42)
+    papers, _ = registry.list(status="ready")
+    assert [paper["paper_id"] for paper in papers] == ["p4", "p2", "p1", "p0"]
+    record = registry.get("p1")
+    assert record["chunks_count"] == 42 and record["filename"] == "paper_1.pdf"
+    assert record["created_at"] == "2026-01-02T00:00:00+00:00"
+    
+    papers, _ = registry.list(filename="paper_3")
+    assert [paper["paper_id"] for paper in papers] == ["p3"]
+    registry.delete("p3")
+    assert registry.get("p3") is None and registry.count() == 4
+
+def test_backfill_counts_chunks_from_metadata(tmp_path):
+    registry = PaperRegistry(str(tmp_path / "papers.sqlite3"))
+    chroma_db = MagicMock()
+    metadatas = [{"paper_id": "a", "page_number": 1}, {"paper_id": "a", "page_number": 3}, {"paper_id": "b", "page_number": 2}]
+    chroma_db.store.get.side_effect = [{"ids": ["1", "2", "3"], "metadatas": metadatas}, {"ids": [], "metadatas": []}]
+    
+    assert registry.backfill(chroma_db, str(tmp_path)) == 2
+    assert registry.get("a")["chunks_count"] == 2 and registry.get("a")["total_pages"] == 3
+
+def test_find_by_hash_only_matches_ready_papers(tmp_path):
+    registry = PaperRegistry(str(tmp_path / "papers.sqlite3"))
+    registry.upsert("a", status="processing", file_hash="h")
+    assert registry.find_by_hash("h") is None
+    registry.upsert("a", status="ready")
+    assert registry.find_by_hash("h") == "a" and registry.find_by_hash("other") is None
@@ -0,0 +1,53 @@
+
+import threading
+from app.core.reranker import RerankBatcher
+
+class FakeCrossEncoder:
+    """Scores a pair by the length of its text and records every forward pass"""
+    tokenizer = None
+    
+    def __init__(self):
+        self.calls = []
+    
+    def predict(self, pairs, batch_size=32, show_progress_bar=False):
+        self.calls.append(list(pairs))
+        return [float(len(text)) for _, text in pairs]
+
+def test_concurrent_requests_share_one_forward_pass():
+    model = FakeCrossEncoder()
+    batcher = RerankBatcher(model, window_ms=200, max_pairs=1000)
+    requests = {
+        "a": [("q1", "xxx"), ("q1", "x")],
+        "b": [("q2", "xxxxx")],
+        "c": [("q3", "xx"), ("q3", "xxxx"), ("q3", "")],
+    }
+    results = {}
+    
+    def worker(name):
+        results[name] = batcher.score(requests[name])
+    
+    threads = [threading.Thread(target=worker, args=(name,)) for name in requests]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    # Every caller gets its own scores back in its own order
+    for name, pairs in requests.items():
+        assert results[name] == [float(len(text)) for _, text in pairs]
+    
+    assert len(model.calls) == 1
+    lengths = [len(query) + len(text) for query, text in model.calls[0]]
+    assert lengths == sorted(lengths)  # pairs are length-sorted to minimise padding
+
+def test_errors_reach_every_waiter():
+    class BrokenCrossEncoder(FakeCrossEncoder):
+        def predict(self, pairs, batch_size=32, show_progress_bar=False):
+            raise RuntimeError("model failed")
+    
+    batcher = RerankBatcher(BrokenCrossEncoder(), window_ms=0)
+    try:
+        batcher.score([("q", "text")])
+        assert False, "expected the model error to propagate"
+    except RuntimeError as e:
+        assert "model failed" in str(e)
@@ -0,0 +1,49 @@
+
+from unittest.mock import patch
+from app.core.retrieval_cache import RetrievalCache
+
+def test_normalized_queries_share_an_entry():
+    cache = RetrievalCache()
+    key = cache.make_key("What is  BERT?", None, top_k=20)
+    cache.set(key, [{"chunk_id": "c1"}])
+    
+    assert cache.get(cache.make_key("what is bert", None, top_k=20)) == [{"chunk_id": "c1"}]
+    assert cache.get(cache.make_key("what is bert", None, top_k=10)) is None
+
+def test_invalidation_is_scoped_to_the_paper():
+    cache = RetrievalCache()
+    scoped_a = cache.make_key("q", ["paper-a"], top_k=20)
+    scoped_b = cache.make_key("q", ["paper-b"], top_k=20)
+    unscoped = cache.make_key("q", None, top_k=20)
+    for key in (scoped_a, scoped_b, unscoped):
+        cache.set(key, ["result"])
+    
+    cache.invalidate_paper("paper-a")
+    
+    assert cache.get(scoped_a) is None
+    assert cache.get(unscoped) is None  # corpus-wide results may now include paper-a
+    assert cache.get(scoped_b) == ["result"]
+
+def test_ttl_and_lru_bounds():
+    cache = RetrievalCache(max_entries=2, ttl_seconds=60)
+    key = cache.make_key("q", None)
+    with patch("app.core.retrieval_cache.time.monotonic", return_value=1000.0):
+        cache.set(key, ["result"])
+    with patch("app.core.retrieval_cache.time.monotonic", return_value=1061.0):
+        assert cache.get(key) is None
+    
+    cache = RetrievalCache(max_entries=2)
+    keys = [cache.make_key(f"q{i}", None) for i in range(3)]
+    for key in keys:
+        cache.set(key, ["result"])
+    assert cache.get(keys[0]) is None
+    assert cache.stats()["entries"] == 2
+
+def test_results_computed_before_invalidation_are_not_stored():
+    cache = RetrievalCache()
+    generation = cache.generation
+    cache.invalidate_paper("paper-a")
+    
+    key = cache.make_key("q", None)
+    cache.set(key, ["stale"], generation=generation)
+    assert cache.get(key) is None
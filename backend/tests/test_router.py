@@ -0,0 +1,71 @@
+import asyncio
+import json
+
+from unittest.mock import AsyncMock, patch
+from app.agents.router import QueryRouter
+
+def test_simple_questions_take_the_fast_path():
+    router = QueryRouter(embedding_threshold=None)
+    
+    decision = router.route("What does section 3 say about the loss function?", ["paper-1"])
+    
+    assert decision == {"route": "fast", "reason": "simple_retrieval"}
+
+def test_tool_heavy_and_multi_step_requests_use_the_agent():
+    router = QueryRouter(embedding_threshold=None)
+    cases = {
+        "Find related papers on arXiv": "external_search",
+        "Plot the accuracy numbers from table 2": "computation",
+        "Compare the two methods": "multi_step",
+        "What is the dataset? How big is it?": "multi_part_question",
+    }
+    for query, reason in cases.items():
+        assert router.route(query, ["paper-1"]) == {"route": "agent", "reason": reason}
+    
+    assert router.route("What is the dataset?", [])["reason"] == "no_papers_selected"
+    assert router.route("What is the dataset?", ["paper-1"], execution_mode="python")["reason"] == "python_mode"
+    assert router.route("What is the dataset?", ["paper-1"], thread_id="t1")["reason"] == "conversation_followup"
+
+def test_embedding_similarity_catches_paraphrased_tool_requests():
+    router = QueryRouter(embedding_threshold=0.6)
+    
+    with patch.object(router, "similarity_to_exemplars", return_value=0.8):
+        assert router.route("Anything newer on this?", ["paper-1"])["reason"] == "similar_to_tool_request"
+    with patch.object(router, "similarity_to_exemplars", return_value=0.2):
+        assert router.route("What is the batch size?", ["paper-1"])["route"] == "fast"
+
+def test_fast_path_turn_is_saved_to_the_thread():
+    from langgraph.checkpoint.memory import MemorySaver
+    from app.agents.graph import workflow
+    from app.api.chat import ChatRequest, build_config, save_fast_turn
+    
+    agent_app = workflow.compile(checkpointer=MemorySaver())
+    config = build_config("t1")
+    asyncio.run(save_fast_turn(agent_app, ChatRequest(query="What is the batch size?", paper_ids=["paper-1"]), "It is 32.", config))
+    
+    state = agent_app.get_state(config)
+    assert [message.content for message in state.values["messages"]] == ["What is the batch size?", "It is 32."]
+    assert state.next == ()
+
+def test_fast_path_streams_one_token_event_per_delta():
+    from app.api import chat
+    
+    async def deltas(query, chunks_with_scores):
+        for text in ["It is ", "32", " [Source 1]."]:
+            yield text
+    
+    async def collect():
+        response = await chat.stream_query(chat.ChatRequest(query="What is the batch size?", paper_ids=["paper-1"]))
+        return [event async for event in response.body_iterator]
+    
+    chunk = {"text": "batch size 32", "paper_id": "paper-1", "page_number": 3, "section": "methods", "chunk_id": "c1"}
+    with patch.object(chat, "route_request", AsyncMock(return_value={"route": "fast", "reason": "simple"})), \
+            patch.object(chat, "retrieve", AsyncMock(return_value=[(chunk, 0.9)])), \
+            patch.object(chat.answer_synthesizer, "astream", deltas), \
+            patch.object(chat, "save_fast_turn", AsyncMock()) as save:
+        events = asyncio.run(collect())
+    
+    tokens = [json.loads(event.split("data: ", 1)[1]) for event in events if event.startswith("event: token")]
+    assert [token["text"] for token in tokens] == ["It is ", "32", " [Source 1]."]
+    assert save.await_args.args[2] == "It is 32 [Source 1]."
+    assert json.loads(events[-1].split("data: ", 1)[1])["answer"] == "It is 32 [Source 1]."
@@ -0,0 +1,53 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+from langchain_core.messages import AIMessage
+from langgraph.graph import StateGraph, START, END
+from langgraph.prebuilt import ToolNode
+from app.agents import tools
+from app.agents.state import AgentState
+from app.core import retrieval
+from app.db.chroma import ChromaDBManager
+
+def chunk(chunk_id, paper_id, distance):
+    return {"chunk_id": chunk_id, "text": chunk_id, "page_number": 1, "section": "Methods", "paper_id": paper_id, "distance": distance}
+
+def test_paper_filter_uses_in_for_several_papers():
+    assert ChromaDBManager._paper_filter(None) is None
+    assert ChromaDBManager._paper_filter(["p1"]) == {"paper_id": "p1"}
+    assert ChromaDBManager._paper_filter(["p1", "p2"]) == {"paper_id": {"$in": ["p1", "p2"]}}
+
+def test_several_papers_are_one_query_with_a_per_paper_cap():
+    # p1 is nearest everywhere; without the cap it would take every candidate
+    ranking = [chunk(f"a{i}", "p1", 0.1 + i / 100) for i in range(6)] + [chunk("b0", "p2", 0.5), chunk("c0", "p3", 0.6)]
+    query_batch = MagicMock(return_value=[ranking])
+    
+    with patch.object(retrieval.settings, "TOP_K_RETRIEVAL", 2), \
+         patch.object(retrieval.chroma_db, "query_batch", query_batch):
+        rankings = asyncio.run(retrieval.dense_search([[0.1, 0.2]], ["p1", "p2", "p3"], per_paper=2))
+    
+    query_batch.assert_called_once()
+    assert query_batch.call_args.kwargs["paper_ids"] == ["p1", "p2", "p3"]
+    assert query_batch.call_args.kwargs["top_k"] == 12
+    assert [c["chunk_id"] for c in rankings[0]] == ["a0", "a1", "b0", "c0"]
+
+def run_tools(state):
+    workflow = StateGraph(AgentState)
+    workflow.add_node("tools", ToolNode([tools.retrieve_tool]))
+    workflow.add_edge(START, "tools")
+    workflow.add_edge("tools", END)
+    return asyncio.run(workflow.compile().ainvoke(state))
+
+def test_retrieve_tool_searches_the_papers_selected_in_state():
+    retrieve = AsyncMock(return_value=[(chunk("a0", "p1", 0.1), 0.9)])
+    message = AIMessage(content="", tool_calls=[{"name": "retrieve_tool", "args": {"query": "optimizer"}, "id": "call-1"}])
+    
+    with patch.object(tools, "retrieve", retrieve):
+        result = run_tools({"messages": [message], "paper_ids": ["p1", "p2"]})
+        
+        assert retrieve.call_args.args[1] == ["p1", "p2"]
+        assert "a0" in result["messages"][-1].content
+        
+        # A paper outside the selection does not widen the search
+        message.tool_calls[0]["args"] = {"query": "optimizer", "paper_id": "p9"}
+        run_tools({"messages": [message], "paper_ids": ["p1", "p2"]})
+        assert retrieve.call_args.args[1] == ["p1", "p2"]
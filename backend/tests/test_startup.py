@@ -0,0 +1,81 @@
+import asyncio
+import os
+import subprocess
+import sys
+from unittest.mock import patch
+from app.core import warmup as warmup_module
+from app.core.warmup import Warmup
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORT_BUDGET_SECONDS = 3.0
+HEAVY_MODULES = ["sentence_transformers", "torch", "transformers", "chromadb", "langgraph", "langchain_openai"]
+
+def test_importing_the_app_is_fast_and_loads_no_models(tmp_path):
+    code = (
+        "import sys, time\n"
+        "started = time.perf_counter()\n"
+        "import app.main\n"
+        "elapsed = time.perf_counter() - started\n"
+        f"print(elapsed, [m for m in {HEAVY_MODULES!r} if m in sys.modules], sep='|')\n"
+    )
+    # A fresh interpreter, so modules imported by other tests do not count; run from a
+    # temporary directory so any relative path it creates stays out of the tree
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=tmp_path,
+        env={**os.environ, "OPENAI_API_KEY": "test-key", "PYTHONPATH": BACKEND_DIR},
+        capture_output=True,
+        text=True,
+        timeout=120
+    )
+    assert result.returncode == 0, result.stderr
+    seconds, heavy = result.stdout.strip().splitlines()[-1].split("|")
+    
+    assert heavy == "[]"
+    assert float(seconds) < IMPORT_BUDGET_SECONDS
+    # SQLite files (registry, embedding cache) are only created on first use
+    assert not (tmp_path / "cache").exists()
+
+def test_existing_papers_are_registered_once_without_warmup():
+    with patch.object(warmup_module, "paper_registry") as paper_registry, \
+            patch.object(warmup_module, "chroma_db") as chroma_db, \
+            patch.object(warmup_module, "_registry_checked", False):
+        paper_registry.count.return_value = 0
+        chroma_db.store.count.return_value = 3
+        warmup_module.register_existing_papers()
+        warmup_module.register_existing_papers()
+    paper_registry.backfill.assert_called_once()
+
+def test_warmup_loads_every_component_and_reports_failures():
+    loaded = set()
+    warmup = Warmup()
+    
+    async def run_inline(fn):
+        return fn()
+    
+    def fail():
+        raise RuntimeError("no model")
+    
+    warmup.components = {
+        "embedding_model": (run_inline, lambda: loaded.add("embedding_model"), lambda: "embedding_model" in loaded),
+        "reranker": (run_inline, fail, lambda: False),
+    }
+    assert warmup.report()["components"]["embedding_model"]["status"] == "pending"
+    
+    report = asyncio.run(warmup.run())
+    
+    assert not report["ready"]
+    assert report["components"]["embedding_model"]["status"] == "ready"
+    assert report["components"]["reranker"] == {"status": "failed", "seconds": None, "error": "no model"}
+    
+    warmup.components["reranker"] = (run_inline, lambda: loaded.add("reranker"), lambda: "reranker" in loaded)
+    assert asyncio.run(warmup.run())["ready"]
+
+def test_agent_graph_is_ready_only_after_warmup_loads_it():
+    import app.agents.graph  # noqa: F401  imported elsewhere, but not by the warmup
+    warmup = Warmup()
+    warmup.components = {"agent_graph": warmup.components["agent_graph"]}
+    
+    with patch.object(warmup_module, "_agent_graph_loaded", False):
+        assert warmup.status("agent_graph") == "pending"
+        assert asyncio.run(warmup.run())["ready"]
@@ -24,21 +24,37 @@ interface SidebarProps {
 export function Sidebar({ selectedPaper, onSelectPaper, collapsed, onToggleCollapse }: SidebarProps) {
   const [papers, setPapers] = useState<Paper[]>([])
   const [uploading, setUploading] = useState(false)
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
+  const [loadingMore, setLoadingMore] = useState(false)
 
   useEffect(() => {
     fetchPapers()
   }, [])
 
-  const fetchPapers = async () => {
+  // The list is paginated: load the first page, then the next one on request (X-Next-Cursor)
+  const fetchPapers = async (cursor?: string) => {
     try {
-      const response = await fetch("http://localhost:8000/api/papers/list")
-      const data = await response.json()
-      setPapers(data)
+      const url = new URL("http://localhost:8000/api/papers/list")
+      if (cursor) url.searchParams.set("cursor", cursor)
+      const response = await fetch(url)
+      const page: Paper[] = await response.json()
+      setPapers((current) => (cursor ? [...current, ...page] : page))
+      setNextCursor(response.headers.get("X-Next-Cursor"))
     } catch (error) {
       console.error("[v0] Failed to fetch papers:", error)
     }
   }
 
+  const loadMore = async () => {
+    if (!nextCursor) return
+    setLoadingMore(true)
+    try {
+      await fetchPapers(nextCursor)
+    } finally {
+      setLoadingMore(false)
+    }
+  }
+
   const handleUpload = async (event: React.ChangeEvent<HTMLInputElement>) => {
     const file = event.target.files?.[0]
     if (!file) return
@@ -160,6 +176,11 @@ export function Sidebar({ selectedPaper, onSelectPaper, collapsed, onToggleColla
               </div>
             ))
           )}
+          {nextCursor && (
+            <Button variant="ghost" size="sm" className="w-full" disabled={loadingMore} onClick={loadMore}>
+              {loadingMore ? "Loading..." : "Load more"}
+            </Button>
+          )}
         </div>
       </ScrollArea>
 